@@ -1,10 +1,70 @@
+from asgiref.sync import sync_to_async
+from rest_framework.exceptions import AuthenticationFailed
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import get_md5_hash_password
 from django.conf import settings
+from django.http import JsonResponse
+from django.utils.translation import gettext_lazy as _
+import functools
 import logging
 
+from .user_cache import get_cached_user
+
 logger = logging.getLogger(__name__)
 
+# Attribute holding the RequestJWT on the underlying HttpRequest
+JWT_STATE_ATTR = '_jwt_state'
+
+
+class RequestJWT:
+    """
+    The access token of one request, decoded once. Built by
+    JWTAuthMiddleware (or on first use when the middleware did not run)
+    and reused by CookieJWTAuthentication, so a request costs a single
+    decode and at most one user lookup.
+    """
+
+    def __init__(self, token=None, error=None, new_access_token=None):
+        self.token = token
+        self.error = error
+        # Set when the access cookie was expired and got refreshed
+        self.new_access_token = new_access_token
+        self.user_loaded = False
+        self.user = None
+
+
+def resolve_request_jwt(request, refresh=False):
+    """
+    Return the request's RequestJWT, decoding the ``access_token`` cookie
+    on first call. With ``refresh``, an invalid access token is replaced
+    by one minted from the ``refresh_token`` cookie; a refresh token that
+    is invalid too raises TokenError.
+    """
+    http_request = getattr(request, '_request', request)
+    state = getattr(http_request, JWT_STATE_ATTR, None)
+    if state is not None:
+        return state
+
+    access_token = http_request.COOKIES.get('access_token')
+    refresh_token = http_request.COOKIES.get('refresh_token')
+    state = RequestJWT()
+    if access_token:
+        try:
+            state.token = JWTAuthentication().get_validated_token(access_token)
+        except InvalidToken as e:
+            state.error = e
+
+    if state.error is not None and refresh and refresh_token:
+        # التوكن انتهى → نجدد باستخدام الـ refresh_token
+        token = RefreshToken(refresh_token).access_token
+        state = RequestJWT(token=token, new_access_token=str(token))
+
+    setattr(http_request, JWT_STATE_ATTR, state)
+    return state
+
 
 class CookieJWTAuthentication(JWTAuthentication):
     """
@@ -14,24 +74,45 @@ class CookieJWTAuthentication(JWTAuthentication):
 
     def authenticate(self, request):
         """
-        Override authenticate to read token from cookies.
+        Authenticate from the access token decoded by JWTAuthMiddleware.
         """
-        # Get token from cookie
-        access_token = request.COOKIES.get('access_token')
+        state = resolve_request_jwt(request)
+        if state.error is not None:
+            raise state.error
+        if state.token is None:
+            return None
 
-        if not access_token:
+        if not state.user_loaded:
+            try:
+                state.user = self.get_user(state.token)
+            except Exception as e:
+                logger.warning(f"Failed to get user from token: {e}")
+            state.user_loaded = True
+        if state.user is None:
             return None
 
-        # Validate the token
-        validated_token = self.get_validated_token(access_token)
+        return (state.user, state.token)
 
+    def get_user(self, validated_token):
+        """
+        Same checks as JWTAuthentication.get_user, but the user comes from
+        apps.accounts.user_cache instead of a query per request.
+        """
         try:
-            user = self.get_user(validated_token)
-        except Exception as e:
-            logger.warning(f"Failed to get user from token: {e}")
-            return None
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
 
-        return (user, validated_token)
+        user = get_cached_user(user_id)
+        if user is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+        return user
 
     def authenticate_header(self, request):
         """
@@ -39,3 +120,21 @@ class CookieJWTAuthentication(JWTAuthentication):
         header in a `401 Unauthenticated` response.
         """
         return 'Bearer realm="api"'
+
+
+def async_jwt_required(view):
+    """
+    Authenticate a plain async view with CookieJWTAuthentication, the
+    way DRF does for API views, and answer 401 without a valid token.
+    """
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            result = await sync_to_async(CookieJWTAuthentication().authenticate)(request)
+        except (InvalidToken, TokenError, AuthenticationFailed):
+            result = None
+        if result is None:
+            return JsonResponse({"detail": "Authentication credentials were not provided."}, status=401)
+        request.user, request.auth = result
+        return await view(request, *args, **kwargs)
+    return wrapper
@@ -0,0 +1,21 @@
+"""
+Factories shared by the apps' test modules.
+"""
+import itertools
+
+from .models import User
+
+_sequence = itertools.count(1)
+
+
+def make_user(**fields):
+    """
+    Create a user with unique username, email, phone and national id.
+    """
+    n = next(_sequence)
+    values = {
+        'username': f'user{n}', 'email': f'user{n}@example.com', 'password': 'x',
+        'full_name': f'User {n}', 'phone_number': f'010{n:08d}', 'national_id': f'29{n:012d}',
+    }
+    values.update(fields)
+    return User.objects.create_user(**values)
@@ -0,0 +1,64 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from apps.accounts.authentication import CookieJWTAuthentication
+from apps.accounts.middleware import JWTAuthMiddleware
+from apps.accounts.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure per-request JWT authentication overhead: the former pipeline (middleware '
+        'decode, header copy, authentication decode + user query) against the single-decode one '
+        'with the cached user.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=2000)
+        parser.add_argument('--email', help='User to mint the tokens for (default: first active user)')
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(is_active=True)
+        if options['email']:
+            users = users.filter(email=options['email'])
+        user = users.order_by('date_joined').first()
+        if user is None:
+            raise CommandError('No matching active user to authenticate as')
+
+        refresh = RefreshToken.for_user(user)
+        factory = RequestFactory()
+        factory.cookies['access_token'] = str(refresh.access_token)
+        factory.cookies['refresh_token'] = str(refresh)
+        iterations = options['iterations']
+
+        self.stdout.write(f"{'pipeline':>10} {'us/request':>11} {'queries/request':>16}")
+        for label, run in (('former', self.former), ('single', self.single)):
+            requests = [factory.get('/api/') for _ in range(iterations)]
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                for request in requests:
+                    run(request)
+                elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"{label:>10} {elapsed * 1e6 / iterations:>11.1f} {len(queries) / iterations:>16.2f}"
+            )
+
+    def former(self, request):
+        # AutoRefreshTokenMiddleware
+        AccessToken(request.COOKIES['access_token'])
+        # JWTAuthFromCookieMiddleware
+        request.META['HTTP_AUTHORIZATION'] = f"Bearer {request.COOKIES['access_token']}"
+        # CookieJWTAuthentication before it reused the middleware's token
+        authentication = JWTAuthentication()
+        validated_token = authentication.get_validated_token(request.COOKIES['access_token'])
+        return authentication.get_user(validated_token)
+
+    def single(self, request):
+        JWTAuthMiddleware(lambda request: None).process_request(request)
+        return CookieJWTAuthentication().authenticate(request)
@@ -1,40 +1,36 @@
-from rest_framework_simplejwt.tokens import RefreshToken, AccessToken
 from rest_framework_simplejwt.exceptions import TokenError
 from django.http import JsonResponse
 from django.utils.deprecation import MiddlewareMixin
 
-class AutoRefreshTokenMiddleware(MiddlewareMixin):
-    def process_request(self, request):
-        access_token = request.COOKIES.get("access_token")
-        refresh_token = request.COOKIES.get("refresh_token")
+from .authentication import JWT_STATE_ATTR, resolve_request_jwt
+
+
+class JWTAuthMiddleware(MiddlewareMixin):
+    """
+    Single JWT pipeline: decodes the access cookie once per request (see
+    apps.accounts.authentication.RequestJWT), refreshes it from the
+    refresh cookie when it has expired, and writes the new access cookie
+    on the way out. CookieJWTAuthentication reuses the decoded token.
+    """
 
-        if not access_token or not refresh_token:
+    def process_request(self, request):
+        if not request.COOKIES.get("access_token") or not request.COOKIES.get("refresh_token"):
             return None  # مفيش توكنات، تجاهل
 
         try:
-            token = AccessToken(access_token)
-            # لو التوكن صالح، كمل الطلب عادي
-            return None
+            resolve_request_jwt(request, refresh=True)
         except TokenError:
-            # التوكن انتهى → نجرب نجدد باستخدام الـ refresh_token
-            try:
-                refresh = RefreshToken(refresh_token)
-                new_access_token = str(refresh.access_token)
-
-                # ضيف الهيدر الجديد علشان باقي الكود يشتغل بيه
-                request.META["HTTP_AUTHORIZATION"] = f"Bearer {new_access_token}"
-                request.new_access_token = new_access_token
-                return None
-            except TokenError:
-                # لو حتى الـ refresh_token انتهى → لازم المستخدم يسجل دخول تاني
-                return JsonResponse({"detail": "Session expired, please login again."}, status=401)
+            # لو حتى الـ refresh_token انتهى → لازم المستخدم يسجل دخول تاني
+            return JsonResponse({"detail": "Session expired, please login again."}, status=401)
+        return None
 
     def process_response(self, request, response):
         # لو حصل تجديد للتوكن نحفظه في الكوكي
-        if hasattr(request, "new_access_token"):
+        state = getattr(request, JWT_STATE_ATTR, None)
+        if state is not None and state.new_access_token:
             response.set_cookie(
                 "access_token",
-                request.new_access_token,
+                state.new_access_token,
                 httponly=True,
                 secure=True,
                 samesite="None",
@@ -54,6 +54,10 @@ class UserRole(models.Model):
 
 
 class ResidentProfile(models.Model):
+    # A resident the building took in: the building approval flow sets
+    # 'accepted', the account approval endpoints set 'approved'
+    ACCEPTED_STATUSES = ('accepted', 'approved')
+
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     unit = models.ForeignKey('buildings.Unit', on_delete=models.CASCADE, null=True, blank=True)
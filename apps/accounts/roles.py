@@ -0,0 +1,75 @@
+"""
+Role resolution for users.
+
+Roles are resolved once per request (memoized on the user instance) and
+shared between requests through the Django cache, so a permission check on
+a warm cache costs no queries. The cached entry is dropped by the handlers
+in ``apps.accounts.signals`` once a UserRole, ResidentProfile or Building
+write that can change the result is committed.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+ROLE_CACHE_TIMEOUT = getattr(settings, 'ROLE_CACHE_TIMEOUT', 60 * 15)
+
+# Attribute used to memoize the roles on the user instance. ``request.user``
+# is the same object for the whole request, so this is request-scoped.
+_MEMO_ATTR = '_resolved_roles'
+
+
+def _cache_key(user_id):
+    return f"user_roles:{user_id}"
+
+
+def compute_user_roles(user):
+    """
+    Compute the roles of a user straight from the database, including the
+    roles implied by a resident profile or by heading a building.
+    """
+    from apps.accounts.models import ResidentProfile
+    from apps.buildings.models import Building
+
+    roles = list(user.userrole_set.values_list('role__name', flat=True))
+
+    if 'resident' not in roles and ResidentProfile.objects.filter(user=user).exists():
+        roles.append('resident')
+    if 'union_head' not in roles and Building.objects.filter(union_head=user).exists():
+        roles.append('union_head')
+
+    return roles
+
+
+def resolve_user_roles(user):
+    """
+    Return the roles of a user, using the request memo first, then the
+    shared cache, and only then the database.
+    """
+    if not user or not user.is_authenticated:
+        return []
+
+    roles = getattr(user, _MEMO_ATTR, None)
+    if roles is None:
+        key = _cache_key(user.pk)
+        roles = cache.get(key)
+        if roles is None:
+            roles = compute_user_roles(user)
+            cache.set(key, roles, ROLE_CACHE_TIMEOUT)
+        setattr(user, _MEMO_ATTR, roles)
+
+    return list(roles)
+
+
+def invalidate_user_roles(*users):
+    """
+    Drop the cached roles of the given users (instances or ids).
+    """
+    keys = []
+    for user in users:
+        if user is None:
+            continue
+        if hasattr(user, 'pk'):
+            user.__dict__.pop(_MEMO_ATTR, None)
+            user = user.pk
+        keys.append(_cache_key(user))
+    if keys:
+        cache.delete_many(keys)
@@ -3,7 +3,7 @@ from django.contrib.auth import get_user_model
 from django.core.validators import MinLengthValidator, RegexValidator
 from django.core.exceptions import ValidationError
 from .models import ResidentProfile, Role
-from apps.buildings.models import Building
+from .roles import resolve_user_roles
 import logging
 
 User = get_user_model()
@@ -73,18 +73,7 @@ class UserSerializer(serializers.ModelSerializer):
         return user
 
     def get_roles(self, obj):
-        # Get roles from userrole_set
-        assigned_roles = [ur.role.name for ur in obj.userrole_set.all()]
-
-        # Check for implied roles based on profiles
-        if ResidentProfile.objects.filter(user=obj).exists():
-            if 'resident' not in assigned_roles:
-                assigned_roles.append('resident')
-        if Building.objects.filter(union_head=obj).exists():
-            if 'union_head' not in assigned_roles:
-                assigned_roles.append('union_head')
-
-        return assigned_roles
+        return resolve_user_roles(obj)
 
 
 
@@ -0,0 +1,73 @@
+from django.db import transaction as db_transaction
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver
+
+from .models import User, UserRole, ResidentProfile
+from .roles import invalidate_user_roles
+from .user_cache import bump_user_version
+
+
+def _cached_or_id(instance, field_name):
+    """
+    Prefer the already-loaded related user (so its request memo is cleared
+    too) and fall back to the raw id without issuing a query.
+    """
+    descriptor = getattr(type(instance), field_name)
+    if descriptor.is_cached(instance):
+        return getattr(instance, field_name)
+    return getattr(instance, f"{field_name}_id")
+
+
+def _on_commit(func, *users):
+    """
+    Run ``func(*users)`` once the current transaction commits. Run earlier,
+    a concurrent request could still read the old rows and cache them
+    again after the invalidation.
+    """
+    db_transaction.on_commit(lambda: func(*users))
+
+
+@receiver(post_save, sender=UserRole)
+@receiver(post_delete, sender=UserRole)
+@receiver(post_save, sender=ResidentProfile)
+@receiver(post_delete, sender=ResidentProfile)
+def invalidate_roles_on_profile_change(sender, instance, **kwargs):
+    """
+    Assigned roles and resident profiles both feed get_user_roles.
+    """
+    user = _cached_or_id(instance, 'user')
+    _on_commit(invalidate_user_roles, user)
+    _on_commit(bump_user_version, user)
+
+
+@receiver(pre_save, sender='buildings.Building')
+def remember_previous_union_head(sender, instance, **kwargs):
+    """
+    Keep the union head the building had before this save, so that a change
+    of union head invalidates both the old and the new one.
+    """
+    instance._previous_union_head_id = None
+    if not instance._state.adding:
+        instance._previous_union_head_id = (
+            sender.objects.filter(pk=instance.pk).values_list('union_head_id', flat=True).first()
+        )
+
+
+@receiver(post_save, sender='buildings.Building')
+@receiver(post_delete, sender='buildings.Building')
+def invalidate_roles_on_building_change(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous_union_head_id', None)
+    if previous == instance.union_head_id:
+        previous = None
+    union_head = _cached_or_id(instance, 'union_head')
+    _on_commit(invalidate_user_roles, union_head, previous)
+    _on_commit(bump_user_version, union_head, previous)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def bump_user_on_change(sender, instance, **kwargs):
+    """
+    Profile, password and activation changes all go through User.save.
+    """
+    _on_commit(bump_user_version, instance)
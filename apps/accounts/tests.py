@@ -0,0 +1,109 @@
+import json
+from datetime import timedelta
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.http import JsonResponse
+from django.test import RequestFactory, TestCase
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from .authentication import async_jwt_required
+from .models import Role, User, UserRole
+from .roles import resolve_user_roles
+from .factories import make_user
+from .user_cache import get_cached_user
+
+
+class UserCacheTests(TestCase):
+    def test_cached_user_is_refreshed_once_the_change_commits(self):
+        user = make_user()
+        self.assertEqual(get_cached_user(user.pk).full_name, user.full_name)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            user.full_name = 'Renamed'
+            user.save(update_fields=['full_name'])
+            # Not committed yet: other requests keep the committed row
+            self.assertNotEqual(get_cached_user(user.pk).full_name, 'Renamed')
+
+        self.assertEqual(get_cached_user(user.pk).full_name, 'Renamed')
+
+
+class RoleCacheTests(TestCase):
+    def test_cached_roles_are_dropped_once_the_change_commits(self):
+        user = make_user()
+        self.assertEqual(resolve_user_roles(User.objects.get(pk=user.pk)), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            UserRole.objects.create(user=user, role=Role.objects.create(name='technician'))
+            # Not committed yet: other requests keep the committed roles
+            self.assertEqual(resolve_user_roles(User.objects.get(pk=user.pk)), [])
+
+        self.assertEqual(resolve_user_roles(User.objects.get(pk=user.pk)), ['technician'])
+
+
+def expired_access_token(user):
+    token = AccessToken.for_user(user)
+    token.set_exp(lifetime=-timedelta(minutes=1))
+    return str(token)
+
+
+class JWTAuthMiddlewareTests(TestCase):
+    url = '/api/payments/wallets/me/'
+
+    def setUp(self):
+        self.user = make_user()
+
+    def get(self, access_token, refresh_token=None):
+        self.client.cookies['access_token'] = access_token
+        if refresh_token is not None:
+            self.client.cookies['refresh_token'] = refresh_token
+        return self.client.get(self.url)
+
+    def test_access_token_is_decoded_once_per_request(self):
+        validate = JWTAuthentication.get_validated_token
+        with mock.patch.object(
+            JWTAuthentication, 'get_validated_token', autospec=True, side_effect=validate,
+        ) as decode:
+            response = self.get(str(AccessToken.for_user(self.user)), str(RefreshToken.for_user(self.user)))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(decode.call_count, 1)
+        self.assertNotIn('access_token', response.cookies)
+
+    def test_expired_access_token_is_refreshed(self):
+        response = self.get(expired_access_token(self.user), str(RefreshToken.for_user(self.user)))
+        self.assertEqual(response.status_code, 200)
+        renewed = AccessToken(response.cookies['access_token'].value)
+        self.assertEqual(str(renewed['user_id']), str(self.user.pk))
+
+    def test_invalid_refresh_token_ends_the_session(self):
+        response = self.get(expired_access_token(self.user), 'not-a-token')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()['detail'], 'Session expired, please login again.')
+
+    def test_expired_access_token_without_refresh_is_refused(self):
+        self.assertEqual(self.get(expired_access_token(self.user)).status_code, 401)
+
+
+class AsyncJWTRequiredTests(TestCase):
+    def setUp(self):
+        @async_jwt_required
+        async def view(request):
+            return JsonResponse({'user': str(request.user.pk)})
+
+        self.view = async_to_sync(view)
+
+    def request(self, **cookies):
+        request = RequestFactory().get('/')
+        request.COOKIES.update(cookies)
+        return self.view(request)
+
+    def test_valid_token_authenticates_the_view(self):
+        user = make_user()
+        response = self.request(access_token=str(AccessToken.for_user(user)))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content), {'user': str(user.pk)})
+
+    def test_missing_or_expired_token_is_refused(self):
+        self.assertEqual(self.request().status_code, 401)
+        self.assertEqual(self.request(access_token=expired_access_token(make_user())).status_code, 401)
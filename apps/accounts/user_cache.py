@@ -0,0 +1,84 @@
+"""
+Short-lived cache of authenticated users.
+
+Every authenticated API call and WebSocket connection needs the user row
+of its token. Its column values are kept in the Django cache for
+USER_CACHE_TIMEOUT seconds together with the user's version stamp. Both
+are read in one round trip and the entry is used only when its stamp is
+the current one. The handlers in ``apps.accounts.signals`` bump the
+stamp once a change to the user or their roles is committed. A load
+that was already in flight during the bump stores its result under the
+old stamp, so nobody reads it.
+
+The password hash is never cached. It is left deferred on the instance
+and loaded from the database only when something reads it.
+"""
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import router
+
+USER_CACHE_TIMEOUT = getattr(settings, 'USER_CACHE_TIMEOUT', 60 * 5)
+
+
+def _version_key(user_id):
+    return f"user_version:{user_id}"
+
+
+def _entry_key(user_id):
+    return f"user:{user_id}"
+
+
+def _cached_fields(model):
+    return [field.attname for field in model._meta.concrete_fields if field.attname != 'password']
+
+
+def get_cached_user(user_id):
+    """
+    Return the user with primary key ``user_id`` (or None if there is no
+    such user), querying the database only on a cache miss.
+    """
+    User = get_user_model()
+    fields = _cached_fields(User)
+    version_key, entry_key = _version_key(user_id), _entry_key(user_id)
+
+    found = cache.get_many([version_key, entry_key])
+    version = found.get(version_key)
+    entry = found.get(entry_key)
+    if version is None:
+        # Start from the clock rather than 1, so that an entry written
+        # before the stamp was evicted cannot match the new one
+        cache.add(version_key, time.time_ns(), timeout=None)
+        version = cache.get(version_key)
+
+    if entry is not None and entry[0] == version:
+        values = entry[1]
+    else:
+        values = User.objects.filter(pk=user_id).values_list(*fields).first()
+        if values is None:
+            return None
+        if version is not None:
+            cache.set(entry_key, (version, values), timeout=USER_CACHE_TIMEOUT)
+
+    return User.from_db(router.db_for_read(User), fields, values)
+
+
+def bump_user_version(*users):
+    """
+    Make the cached entries of the given users (instances or ids) stale.
+    """
+    keys = []
+    for user in users:
+        if user is None:
+            continue
+        user_id = getattr(user, 'pk', user)
+        try:
+            cache.incr(_version_key(user_id))
+        except ValueError:
+            # No stamp yet, so nothing was cached either
+            pass
+        keys.append(_entry_key(user_id))
+    if keys:
+        cache.delete_many(keys)
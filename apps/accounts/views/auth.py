@@ -16,6 +16,7 @@ from django.utils import timezone
 from django.conf import settings
 
 from ..models import User, ResidentProfile, Role, PasswordResetCode
+from ..roles import resolve_user_roles
 from ..serializers import (
     UserSerializer,
     ResidentProfileSerializer,
@@ -62,7 +63,7 @@ class RegisterView(generics.CreateAPIView):
         user = serializer.save()
 
         # إنشاء محفظة للمستخدم
-        Wallet.objects.create(owner_type='user', owner_id=user.id, current_balance=0)
+        Wallet.objects.create(user=user, current_balance=0)
 
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
@@ -185,19 +186,7 @@ class UserRolesView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        # Get roles from database
-        roles = [ur.role.name for ur in request.user.userrole_set.all()]
-
-        # Add implied roles based on profiles
-        from apps.accounts.models import ResidentProfile
-        from apps.buildings.models import Building
-        if ResidentProfile.objects.filter(user=request.user).exists():
-            if 'resident' not in roles:
-                roles.append('resident')
-        if Building.objects.filter(union_head=request.user).exists():
-            if 'union_head' not in roles:
-                roles.append('union_head')
-
+        roles = resolve_user_roles(request.user)
         return Response({"roles": roles})
 
 
@@ -240,7 +229,7 @@ class UpdateProfileView(generics.UpdateAPIView):
 
 # 🏢 إدارة بروفايلات الأدوار
 class BuildingViewSet(viewsets.ModelViewSet):
-    queryset = Building.objects.all()
+    queryset = BuildingSerializer.setup_eager_loading(Building.objects.all())
     serializer_class = BuildingSerializer
     permission_classes = [IsAuthenticated]
 
@@ -607,63 +596,25 @@ def search_by_national_id(request, national_id):
 def get_resident_profile_data(request):
     try:
         # Get all resident profiles for the user, ordered by most recent
-        resident_profiles = ResidentProfile.objects.filter(user=request.user).select_related('unit__building').order_by('-created_at')
+        resident_profiles = list(
+            ResidentProfile.objects.filter(user=request.user).select_related('unit__building').order_by('-created_at')
+        )
 
-        if not resident_profiles.exists():
+        if not resident_profiles:
             return Response({"detail": "Resident profile not found"}, status=404)
 
+        # الباقات المشتركة (من العمارة) والخاصة (التي أنشأها الساكن) لكل البروفايلات دفعة واحدة
+        try:
+            from apps.packages.queries import resident_packages
+            packages_by_profile = resident_packages(request.user, resident_profiles)
+        except Exception as e:
+            # Log the error but don't fail the request
+            logger.error(f"Error fetching packages for resident profile: {str(e)}")
+            packages_by_profile = {}
+
         resident_data = []
         for resident_profile in resident_profiles:
-            # الباقات المشتركة (من العمارة)
-            building_packages = []
-            personal_packages = []
-            try:
-                from apps.packages.models import Package, PackageBuilding, PackageInvoice
-
-                if resident_profile.building:
-                    package_buildings = PackageBuilding.objects.filter(building=resident_profile.building)
-                    for pb in package_buildings:
-                        package_invoices = PackageInvoice.objects.filter(
-                            package=pb.package,
-                            resident=resident_profile,
-                            status__in=['pending', 'paid']
-                        )
-                        if package_invoices.exists():
-                            building_packages.append({
-                                'id': pb.package.id,
-                                'name': pb.package.name,
-                                'type': 'building',
-                                'status': package_invoices.first().status,
-                                'amount': package_invoices.first().amount,
-                                'due_date': package_invoices.first().due_date,
-                                'description': pb.package.description,
-                                'is_recurring': pb.package.is_recurring,
-                            })
-
-                # الباقات الخاصة (التي أنشأها الساكن)
-                user_packages = Package.objects.filter(created_by=request.user)
-                for pkg in user_packages:
-                    package_invoices = PackageInvoice.objects.filter(
-                        package=pkg,
-                        resident=resident_profile,
-                        status__in=['pending', 'paid']
-                    )
-                    if package_invoices.exists():
-                        personal_packages.append({
-                            'id': pkg.id,
-                            'name': pkg.name,
-                            'type': 'personal',
-                            'status': package_invoices.first().status,
-                            'amount': package_invoices.first().amount,
-                            'due_date': package_invoices.first().due_date,
-                            'description': pkg.description,
-                            'is_recurring': pkg.is_recurring,
-                        })
-            except Exception as e:
-                # Log the error but don't fail the request
-                logger.error(f"Error fetching packages for resident profile: {str(e)}")
-                building_packages = []
-                personal_packages = []
+            building_packages, personal_packages = packages_by_profile.get(resident_profile.id, ([], []))
 
             resident_data.append({
                 'id': resident_profile.id,
@@ -704,41 +655,16 @@ def get_resident_profile_data(request):
 @permission_classes([IsAuthenticated])
 def get_union_head_profile_data(request):
     try:
-        from apps.packages.models import Package, PackageBuilding, PackageInvoice
+        from apps.packages.queries import building_packages, personal_packages
 
         # الحصول على العمارات الخاصة برئيس الاتحاد
-        user_buildings = Building.objects.filter(union_head=request.user)
+        user_buildings = list(Building.objects.filter(union_head=request.user))
+
+        # الباقات المرتبطة بكل عمارة مع حالة آخر فاتورة (استعلام واحد لكل العمارات)
+        packages_by_building = building_packages(user_buildings)
 
         buildings_data = []
         for building in user_buildings:
-            # الباقات المرتبطة بالعمارة
-            building_packages = Package.objects.filter(packagebuilding__building=building).only('id', 'name', 'description', 'is_recurring', 'package_type', 'created_at')
-
-            packages_data = []
-            for pkg in building_packages:
-                # الحصول على حالة الدفع من الفواتير
-                package_invoices = PackageInvoice.objects.filter(package=pkg, building=building).order_by('-created_at')
-                status = 'active'  # افتراضي
-                amount = 0
-                due_date = None
-                if package_invoices.exists():
-                    latest_invoice = package_invoices.first()
-                    status = latest_invoice.status
-                    amount = latest_invoice.amount
-                    due_date = latest_invoice.due_date
-
-                packages_data.append({
-                    'id': pkg.id,
-                    'name': pkg.name,
-                    'status': status,
-                    'amount': amount,
-                    'due_date': due_date,
-                    'description': pkg.description,
-                    'is_recurring': pkg.is_recurring,
-                    'package_type': pkg.package_type,
-                    'created_at': pkg.created_at,
-                })
-
             buildings_data.append({
                 'id': building.id,
                 'name': building.name,
@@ -746,35 +672,11 @@ def get_union_head_profile_data(request):
                 'total_units': building.total_units,
                 'total_floors': building.total_floors,
                 'units_per_floor': building.units_per_floor,
-                'packages': packages_data,
+                'packages': packages_by_building.get(building.id, []),
             })
 
         # الباقات التي أنشأها رئيس الاتحاد شخصياً (غير مرتبطة بعمارة محددة)
-        created_packages = Package.objects.filter(created_by=request.user).exclude(packagebuilding__building__in=user_buildings).only('id', 'name', 'description', 'is_recurring', 'package_type', 'created_at')
-
-        personal_packages_data = []
-        for pkg in created_packages:
-            package_invoices = PackageInvoice.objects.filter(package=pkg).order_by('-created_at')
-            status = 'active'
-            amount = 0
-            due_date = None
-            if package_invoices.exists():
-                latest_invoice = package_invoices.first()
-                status = latest_invoice.status
-                amount = latest_invoice.amount
-                due_date = latest_invoice.due_date
-
-            personal_packages_data.append({
-                'id': pkg.id,
-                'name': pkg.name,
-                'status': status,
-                'amount': amount,
-                'due_date': due_date,
-                'description': pkg.description,
-                'is_recurring': pkg.is_recurring,
-                'package_type': pkg.package_type,
-                'created_at': pkg.created_at,
-            })
+        personal_packages_data = personal_packages(request.user, user_buildings)
 
         return Response({
             'buildings': buildings_data,
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Building
+from .models import Building, BuildingStats
 
 # Register models for admin
-admin.site.register(Building)
+admin.site.register([Building, BuildingStats])
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.buildings.stats import month_start, next_month, parse_month, refresh_building_stats
+
+
+class Command(BaseCommand):
+    help = 'Build BuildingStats rows from the live tables for a range of months'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='start', help='First month (YYYY-MM), defaults to the current month')
+        parser.add_argument('--to', dest='end', help='Last month (YYYY-MM), defaults to the current month')
+
+    def handle(self, *args, **options):
+        current = month_start()
+        try:
+            start = parse_month(options['start']) if options['start'] else current
+            end = parse_month(options['end']) if options['end'] else current
+        except ValueError as e:
+            raise CommandError(str(e))
+        if start > end:
+            raise CommandError('--from must not be after --to')
+
+        month = start
+        while month <= end:
+            refreshed = refresh_building_stats(month=month)
+            self.stdout.write(f"{month:%Y-%m}: {refreshed} buildings")
+            month = next_month(month)
+
+        self.stdout.write(self.style.SUCCESS('Building stats backfill completed successfully'))
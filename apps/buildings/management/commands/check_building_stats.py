@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.buildings.stats import find_stale_stats, month_start, parse_month, refresh_building_stats
+
+
+class Command(BaseCommand):
+    help = 'Compare BuildingStats rows with the live tables and optionally repair them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--month', help='Month to check (YYYY-MM), defaults to the current month')
+        parser.add_argument('--fix', action='store_true', help='Rebuild the rows that differ')
+
+    def handle(self, *args, **options):
+        try:
+            month = parse_month(options['month']) if options['month'] else month_start()
+        except ValueError as e:
+            raise CommandError(str(e))
+        differences = find_stale_stats(month)
+
+        if not differences:
+            self.stdout.write(self.style.SUCCESS(f"Building stats for {month:%Y-%m} are consistent"))
+            return
+
+        for building_id, field, stored, actual in differences:
+            self.stdout.write(f"{building_id} {field}: stored={stored} actual={actual}")
+        self.stdout.write(self.style.WARNING(f"{len(differences)} differences for {month:%Y-%m}"))
+
+        if options['fix']:
+            stale_ids = sorted({building_id for building_id, *_ in differences}, key=str)
+            refresh_building_stats(stale_ids, month)
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt {len(stale_ids)} buildings"))
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('buildings', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BuildingStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('residents', models.PositiveIntegerField(default=0)),
+                ('packages', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('building', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='buildings.building')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('building', 'month'), name='unique_building_stats_per_month')],
+            },
+        ),
+    ]
@@ -34,4 +34,24 @@ class Unit(models.Model):
         return f"{self.building.name} - Floor {self.floor_number} - Apt {self.apartment_number}"
 
 
+class BuildingStats(models.Model):
+    """
+    Monthly rollup read by the dashboards. ``residents`` and ``packages``
+    hold the building's counts as of the last refresh of that month and
+    ``revenue`` the completed payments into the building's wallet during
+    it. Maintained by apps.buildings.stats.
+    """
+    building = models.ForeignKey(Building, on_delete=models.CASCADE, related_name='stats')
+    month = models.DateField()  # أول يوم في الشهر
+    residents = models.PositiveIntegerField(default=0)
+    packages = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['building', 'month'], name='unique_building_stats_per_month'),
+        ]
 
+    def __str__(self):
+        return f"{self.building_id} - {self.month:%Y-%m}"
@@ -1,4 +1,6 @@
+from django.core.exceptions import ObjectDoesNotExist
 from rest_framework import serializers
+from apps.core.serializers import SparseFieldsetMixin
 from .models import Building, Unit
 
 class UnitSerializer(serializers.ModelSerializer):
@@ -27,11 +29,24 @@ class UnitSerializer(serializers.ModelSerializer):
         return unit
 
 class BuildingSerializer(serializers.ModelSerializer):
+    """
+    Reads residents, payments and packages from the relations loaded by
+    ``setup_eager_loading``, so a page of buildings costs a fixed number of
+    queries. Without the prefetches it still works, one query per relation.
+    """
     residents = serializers.SerializerMethodField()
     union_head_name = serializers.SerializerMethodField()
     packages_count = serializers.SerializerMethodField()
     packages = serializers.SerializerMethodField()
 
+    # Reverse one-to-one detail tables and the field holding the package amount
+    PACKAGE_AMOUNT_FIELDS = {
+        'fixed': ('packagefixed', 'monthly_amount'),
+        'utilities': ('packageutility', 'monthly_amount'),
+        'prepaid': ('packageprepaid', 'average_monthly_charge'),
+        'misc': ('packagemisc', 'total_amount'),
+    }
+
     class Meta:
         model = Building
         fields = [
@@ -40,31 +55,74 @@ class BuildingSerializer(serializers.ModelSerializer):
             'residents', 'packages_count', 'packages'
         ]
 
-    def get_residents(self, obj):
+    @classmethod
+    def setup_eager_loading(cls, queryset, residents=True, payment_history=True, packages=True):
+        from django.db.models import Prefetch
         from apps.accounts.models import ResidentProfile
-        from apps.packages.models import PackageInvoice
-
-        residents = ResidentProfile.objects.filter(unit__building=obj).select_related('user')
-        resident_data = []
-
-        for resident in residents:
-            payments = PackageInvoice.objects.filter(
-                resident=resident,
-                status='paid'
-            ).select_related('package').values(
-                'id', 'package__name', 'amount', 'due_date', 'status'
+        from apps.packages.models import PackageBuilding, PackageInvoice
+
+        queryset = queryset.select_related('union_head')
+        if residents:
+            resident_queryset = ResidentProfile.objects.select_related('user')
+            if payment_history:
+                resident_queryset = resident_queryset.prefetch_related(
+                    Prefetch(
+                        'packageinvoice_set',
+                        queryset=PackageInvoice.objects.filter(status='paid').select_related('package'),
+                        to_attr='paid_invoices',
+                    )
+                )
+            queryset = queryset.prefetch_related(
+                Prefetch('unit_set__residentprofile_set', queryset=resident_queryset)
+            )
+        if packages:
+            queryset = queryset.prefetch_related(
+                Prefetch(
+                    'packagebuilding_set',
+                    queryset=PackageBuilding.objects.select_related(
+                        'package',
+                        'package__packagefixed',
+                        'package__packageutility',
+                        'package__packageprepaid',
+                        'package__packagemisc',
+                    ),
+                )
             )
+        return queryset
 
-            resident_data.append({
-                'id': resident.id,
-                'user_name': resident.user.full_name,
-                'phone_number': resident.user.phone_number,
-                'floor_number': resident.floor_number,
-                'apartment_number': resident.apartment_number,
-                'resident_type': getattr(resident, 'resident_type', 'unknown'),
-                'national_id': resident.user.national_id,
-                'payment_history': list(payments)
-            })
+    def include_payment_history(self):
+        return True
+
+    def get_residents(self, obj):
+        resident_data = []
+        include_payments = self.include_payment_history()
+
+        for unit in obj.unit_set.all():
+            for resident in unit.residentprofile_set.all():
+                data = {
+                    'id': resident.id,
+                    'user_name': resident.user.full_name,
+                    'phone_number': resident.user.phone_number,
+                    'floor_number': resident.floor_number,
+                    'apartment_number': resident.apartment_number,
+                    'resident_type': getattr(resident, 'resident_type', 'unknown'),
+                    'national_id': resident.user.national_id,
+                }
+                if include_payments:
+                    paid_invoices = getattr(resident, 'paid_invoices', None)
+                    if paid_invoices is None:
+                        paid_invoices = resident.packageinvoice_set.filter(status='paid').select_related('package')
+                    data['payment_history'] = [
+                        {
+                            'id': invoice.id,
+                            'package__name': invoice.package.name,
+                            'amount': invoice.amount,
+                            'due_date': invoice.due_date,
+                            'status': invoice.status,
+                        }
+                        for invoice in paid_invoices
+                    ]
+                resident_data.append(data)
 
         return resident_data
 
@@ -72,52 +130,89 @@ class BuildingSerializer(serializers.ModelSerializer):
         return obj.union_head.full_name if getattr(obj, 'union_head', None) else None
 
     def get_packages_count(self, obj):
-        from apps.packages.models import PackageBuilding
-        return PackageBuilding.objects.filter(building=obj).count()
+        if hasattr(obj, 'packages_total'):
+            return obj.packages_total
+        return len(obj.packagebuilding_set.all())
+
+    @classmethod
+    def package_amount(cls, package):
+        detail_name, amount_field = cls.PACKAGE_AMOUNT_FIELDS.get(package.package_type, (None, None))
+        if detail_name is None:
+            return None
+        try:
+            return getattr(getattr(package, detail_name), amount_field)
+        except ObjectDoesNotExist:
+            return None
 
     def get_packages(self, obj):
-        from apps.packages.models import PackageBuilding, Package, PackageFixed, PackageUtility, PackagePrepaid, PackageMisc
-        package_buildings = PackageBuilding.objects.filter(building=obj).select_related('package')
         packages_data = []
-        for pb in package_buildings:
+        for pb in obj.packagebuilding_set.all():
             package = pb.package
-            amount = None
-            if package.package_type == 'fixed':
-                try:
-                    fixed_details = PackageFixed.objects.get(package=package)
-                    amount = fixed_details.monthly_amount
-                except PackageFixed.DoesNotExist:
-                    pass
-            elif package.package_type == 'utilities':
-                try:
-                    utility_details = PackageUtility.objects.get(package=package)
-                    amount = utility_details.monthly_amount
-                except PackageUtility.DoesNotExist:
-                    pass
-            elif package.package_type == 'prepaid':
-                try:
-                    prepaid_details = PackagePrepaid.objects.get(package=package)
-                    amount = prepaid_details.average_monthly_charge
-                except PackagePrepaid.DoesNotExist:
-                    pass
-            elif package.package_type == 'misc':
-                try:
-                    misc_details = PackageMisc.objects.get(package=package)
-                    amount = misc_details.total_amount
-                except PackageMisc.DoesNotExist:
-                    pass
-
             packages_data.append({
                 'id': package.id,
                 'name': package.name,
                 'description': package.description,
                 'package_type': package.package_type,
                 'is_recurring': package.is_recurring,
-                'amount': amount,
+                'amount': self.package_amount(package),
                 'created_at': package.created_at.isoformat(),
             })
         return packages_data
 
 
+class BuildingListSerializer(SparseFieldsetMixin, BuildingSerializer):
+    """
+    Dashboard representation: building fields and counts only. Residents
+    (optionally with ``residents.payment_history``) and packages are added
+    with ``?expand=``, and ``?fields=`` trims the rest.
+    """
+    residents_count = serializers.SerializerMethodField()
+
+    class Meta(BuildingSerializer.Meta):
+        fields = [
+            'id', 'name', 'address', 'total_units', 'total_floors', 'units_per_floor',
+            'subscription_plan', 'union_head', 'union_head_name', 'created_at', 'updated_at',
+            'residents_count', 'packages_count', 'residents', 'packages'
+        ]
+        expandable_fields = ('residents', 'packages')
+
+    @classmethod
+    def setup_eager_loading(cls, queryset, request=None):
+        """
+        Annotate the counts and load only the expanded relations.
+        """
+        from django.db.models import Count, OuterRef, Subquery, IntegerField
+        from django.db.models.functions import Coalesce
+        from apps.accounts.models import ResidentProfile
+        from apps.core.serializers import requested_expansions
+        from apps.packages.models import PackageBuilding
+
+        def count_of(model, **filters):
+            counts = (
+                model.objects.filter(**filters)
+                .order_by()
+                .values(*filters)
+                .annotate(total=Count('pk'))
+                .values('total')
+            )
+            return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+        expand = requested_expansions(request)
+        queryset = queryset.annotate(
+            residents_total=count_of(ResidentProfile, unit__building=OuterRef('pk')),
+            packages_total=count_of(PackageBuilding, building=OuterRef('pk')),
+        )
+        return super().setup_eager_loading(
+            queryset,
+            residents='residents' in expand,
+            payment_history='residents.payment_history' in expand,
+            packages='packages' in expand,
+        )
 
+    def include_payment_history(self):
+        return self.is_expanded('residents.payment_history')
 
+    def get_residents_count(self, obj):
+        if hasattr(obj, 'residents_total'):
+            return obj.residents_total
+        return sum(len(unit.residentprofile_set.all()) for unit in obj.unit_set.all())
@@ -0,0 +1,81 @@
+from django.db import transaction as db_transaction
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver
+
+from .stats import add_revenue, refresh_building_counts
+
+
+def _unit_building_id(unit_id):
+    from .models import Unit
+
+    if unit_id is None:
+        return None
+    return Unit.objects.filter(pk=unit_id).values_list('building_id', flat=True).first()
+
+
+@receiver(pre_save, sender='accounts.ResidentProfile')
+def remember_previous_unit(sender, instance, **kwargs):
+    instance._previous_unit_id = None
+    if not instance._state.adding:
+        instance._previous_unit_id = (
+            sender.objects.filter(pk=instance.pk).values_list('unit_id', flat=True).first()
+        )
+
+
+@receiver(post_save, sender='accounts.ResidentProfile')
+@receiver(post_delete, sender='accounts.ResidentProfile')
+def update_resident_stats(sender, instance, **kwargs):
+    """
+    Recount the accepted residents of the building the profile is in, and
+    of the one it moved out of.
+    """
+    unit_ids = {instance.unit_id, getattr(instance, '_previous_unit_id', None)} - {None}
+
+    def recount():
+        for building_id in {_unit_building_id(unit_id) for unit_id in unit_ids} - {None}:
+            refresh_building_counts(building_id, 'residents')
+
+    if unit_ids:
+        db_transaction.on_commit(recount)
+
+
+@receiver(post_save, sender='packages.PackageBuilding')
+@receiver(post_delete, sender='packages.PackageBuilding')
+def update_package_stats(sender, instance, **kwargs):
+    building_id = instance.building_id
+    db_transaction.on_commit(lambda: refresh_building_counts(building_id, 'packages'))
+
+
+@receiver(pre_save, sender='payments.Transaction')
+def remember_previous_transaction(sender, instance, **kwargs):
+    instance._previous_completed_amount = None
+    if not instance._state.adding:
+        previous = sender.objects.filter(pk=instance.pk).values('status', 'amount').first()
+        if previous and previous['status'] == 'completed':
+            instance._previous_completed_amount = previous['amount']
+
+
+@receiver(post_save, sender='payments.Transaction')
+def update_revenue_stats(sender, instance, **kwargs):
+    """
+    Apply the change in completed amount of a payment into a building
+    wallet to that month's revenue.
+    """
+    from apps.payments.models import Wallet
+
+    previous = getattr(instance, '_previous_completed_amount', None) or 0
+    current = instance.amount if instance.status == 'completed' else 0
+    delta = current - previous
+    if not delta:
+        return
+
+    building_id = (
+        Wallet.objects.filter(pk=instance.wallet_id, building__isnull=False)
+        .values_list('building_id', flat=True)
+        .first()
+    )
+    if building_id is None:
+        return
+
+    created_at = instance.created_at
+    db_transaction.on_commit(lambda: add_revenue(building_id, delta, created_at))
@@ -0,0 +1,220 @@
+"""
+Maintenance of the BuildingStats monthly rollup.
+
+Dashboards read one BuildingStats row per building instead of counting
+residents, packages and payments on every call. Rows are kept current by
+signals (see apps.buildings.signals): resident and package changes
+recount that single building, completed payments into a building wallet
+add to the month's revenue in place. ``refresh_building_stats`` rebuilds
+rows set-wise and is used by the nightly task, the backfill command and
+as a fallback for buildings without a row yet.
+"""
+from datetime import date, datetime, time
+from decimal import Decimal
+
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+from .models import Building, BuildingStats
+
+STATS_FIELDS = ('residents', 'packages', 'revenue')
+STATS_BATCH_SIZE = 500
+
+
+def month_start(value=None):
+    value = value or timezone.now()
+    if hasattr(value, 'tzinfo') and value.tzinfo is not None:
+        value = timezone.localtime(value)
+    return date(value.year, value.month, 1)
+
+
+def next_month(month):
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def parse_month(value):
+    """
+    Parse ``YYYY-MM`` into the first day of that month.
+    """
+    try:
+        year, month = value.split('-')
+        return date(int(year), int(month), 1)
+    except ValueError:
+        raise ValueError(f"Invalid month '{value}', expected YYYY-MM")
+
+
+def month_bounds(month):
+    """
+    Aware datetimes delimiting ``month``, so created_at is compared as is.
+    """
+    return (
+        timezone.make_aware(datetime.combine(month, time.min)),
+        timezone.make_aware(datetime.combine(next_month(month), time.min)),
+    )
+
+
+def count_residents(building_ids):
+    from apps.accounts.models import ResidentProfile
+
+    return dict(
+        ResidentProfile.objects.filter(
+            unit__building_id__in=building_ids, status__in=ResidentProfile.ACCEPTED_STATUSES,
+        )
+        .values('unit__building_id')
+        .annotate(total=Count('id'))
+        .values_list('unit__building_id', 'total')
+    )
+
+
+def count_packages(building_ids):
+    from apps.packages.models import PackageBuilding
+
+    return dict(
+        PackageBuilding.objects.filter(building_id__in=building_ids)
+        .values('building_id')
+        .annotate(total=Count('package_id', distinct=True))
+        .values_list('building_id', 'total')
+    )
+
+
+def sum_revenue(building_ids, month):
+    """
+    Completed payments into the buildings' wallets during ``month``.
+    """
+    from apps.payments.models import Transaction
+
+    return dict(
+        Transaction.objects.filter(
+            wallet__building_id__in=building_ids,
+            created_at__gte=month_bounds(month)[0],
+            created_at__lt=month_bounds(month)[1],
+            status='completed',
+        )
+        .values('wallet__building_id')
+        .annotate(total=Sum('amount'))
+        .values_list('wallet__building_id', 'total')
+    )
+
+
+def compute_building_stats(building_ids, month):
+    """
+    Return ``{building_id: {'residents', 'packages', 'revenue'}}`` computed
+    live with three grouped queries.
+    """
+    building_ids = list(building_ids)
+    residents = count_residents(building_ids)
+    packages = count_packages(building_ids)
+    revenue = sum_revenue(building_ids, month)
+    return {
+        building_id: {
+            'residents': residents.get(building_id, 0),
+            'packages': packages.get(building_id, 0),
+            'revenue': revenue.get(building_id) or Decimal('0'),
+        }
+        for building_id in building_ids
+    }
+
+
+def refresh_building_stats(building_ids=None, month=None):
+    """
+    Recompute and upsert the rows of ``month`` (current month by default)
+    for the given buildings, or for all of them. Return the row count.
+    """
+    month = month or month_start()
+    if building_ids is None:
+        building_ids = Building.objects.order_by('id').values_list('id', flat=True)
+    building_ids = list(building_ids)
+
+    refreshed = 0
+    for start in range(0, len(building_ids), STATS_BATCH_SIZE):
+        stats = compute_building_stats(building_ids[start:start + STATS_BATCH_SIZE], month)
+        BuildingStats.objects.bulk_create(
+            [BuildingStats(building_id=building_id, month=month, **values) for building_id, values in stats.items()],
+            update_conflicts=True,
+            unique_fields=['building', 'month'],
+            update_fields=[*STATS_FIELDS, 'updated_at'],
+        )
+        refreshed += len(stats)
+    return refreshed
+
+
+def refresh_building_counts(building_id, *fields):
+    """
+    Recount residents and/or packages of one building in its current row.
+    """
+    month = month_start()
+    counts = {}
+    if 'residents' in fields:
+        counts['residents'] = count_residents([building_id]).get(building_id, 0)
+    if 'packages' in fields:
+        counts['packages'] = count_packages([building_id]).get(building_id, 0)
+    if not BuildingStats.objects.filter(building_id=building_id, month=month).update(
+        updated_at=timezone.now(), **counts
+    ):
+        refresh_building_stats([building_id], month)
+
+
+def add_revenue(building_id, amount, when=None):
+    """
+    Add ``amount`` (negative to reverse) to the building's revenue for the
+    month of ``when``.
+    """
+    month = month_start(when)
+    if not BuildingStats.objects.filter(building_id=building_id, month=month).update(
+        revenue=F('revenue') + amount, updated_at=timezone.now()
+    ):
+        # First payment of the month: build the row from the database,
+        # which already includes this payment.
+        refresh_building_stats([building_id], month)
+
+
+def get_dashboard_stats(building_ids, month=None):
+    """
+    Summed rollup of the given buildings for ``month``, creating the rows
+    that are missing.
+    """
+    month = month or month_start()
+    building_ids = list(building_ids)
+    existing = set(
+        BuildingStats.objects.filter(building_id__in=building_ids, month=month).values_list('building_id', flat=True)
+    )
+    missing = [building_id for building_id in building_ids if building_id not in existing]
+    if missing:
+        refresh_building_stats(missing, month)
+
+    totals = BuildingStats.objects.filter(building_id__in=building_ids, month=month).aggregate(
+        residents=Sum('residents'), packages=Sum('packages'), revenue=Sum('revenue'),
+    )
+    return {
+        'residents': totals['residents'] or 0,
+        'packages': totals['packages'] or 0,
+        'revenue': totals['revenue'] or Decimal('0'),
+    }
+
+
+def find_stale_stats(month=None, building_ids=None):
+    """
+    Compare stored rows with live values and return
+    ``[(building_id, field, stored, actual), ...]`` for every difference
+    (a missing row counts as zeros).
+    """
+    month = month or month_start()
+    if building_ids is None:
+        building_ids = Building.objects.order_by('id').values_list('id', flat=True)
+    building_ids = list(building_ids)
+    actual = {}
+    for start in range(0, len(building_ids), STATS_BATCH_SIZE):
+        actual.update(compute_building_stats(building_ids[start:start + STATS_BATCH_SIZE], month))
+    stored = {
+        row['building_id']: row
+        for row in BuildingStats.objects.filter(building_id__in=list(actual), month=month).values(
+            'building_id', *STATS_FIELDS
+        )
+    }
+    differences = []
+    for building_id, values in actual.items():
+        row = stored.get(building_id, {})
+        for field in STATS_FIELDS:
+            if row.get(field, 0) != values[field]:
+                differences.append((building_id, field, row.get(field, 0), values[field]))
+    return differences
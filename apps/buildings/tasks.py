@@ -0,0 +1,18 @@
+import logging
+
+from celery import shared_task
+
+from .stats import refresh_building_stats
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def refresh_building_stats_task():
+    """
+    Rebuild the current month's BuildingStats rows from the live tables,
+    correcting any drift left by the incremental updates.
+    """
+    refreshed = refresh_building_stats()
+    logger.info(f"Refreshed stats for {refreshed} buildings")
+    return refreshed
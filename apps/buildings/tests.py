@@ -0,0 +1,118 @@
+import datetime
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from apps.accounts.models import ResidentProfile
+from apps.accounts.factories import make_user
+from apps.packages.models import Package, PackageBuilding, PackageFixed, PackageInvoice
+from apps.packages.tasks import generate_package_invoices_task
+from apps.payments.models import Transaction, Wallet
+from .models import Building, Unit
+from .serializers import BuildingSerializer
+from .stats import find_stale_stats, get_dashboard_stats
+
+
+def make_building(union_head, residents, packages):
+    """
+    A building with ``residents`` units (one resident each) and
+    ``packages`` fixed packages, every resident having paid each package.
+    """
+    building = Building.objects.create(
+        union_head=union_head, name='Building', address='Cairo',
+        total_units=residents, total_floors=1, units_per_floor=residents,
+    )
+    linked = []
+    for _ in range(packages):
+        package = Package.objects.create(
+            package_type='fixed', name='Maintenance', created_by=union_head, start_date=datetime.date(2026, 1, 1),
+        )
+        PackageFixed.objects.create(package=package, monthly_amount=100, deduction_day=1, payment_method='union_head')
+        PackageBuilding.objects.create(package=package, building=building)
+        linked.append(package)
+    for number in range(residents):
+        unit = Unit.objects.create(building=building, floor_number=1, apartment_number=str(number + 1))
+        resident = ResidentProfile.objects.create(user=make_user(), unit=unit, status='approved')
+        for package in linked:
+            PackageInvoice.objects.create(
+                package=package, building=building, resident=resident, amount=100,
+                due_date=datetime.date(2026, 10, 1), status='paid',
+            )
+    return building
+
+
+class BuildingSerializerQueryTests(TestCase):
+    # Buildings with union heads, units, residents with users, paid
+    # invoices with packages, and package links with their details
+    EXPECTED_QUERIES = 5
+
+    def serialize(self, building):
+        queryset = BuildingSerializer.setup_eager_loading(Building.objects.filter(pk=building.pk))
+        return BuildingSerializer(queryset, many=True).data
+
+    def test_query_count_does_not_grow_with_residents_and_packages(self):
+        small = make_building(make_user(), residents=1, packages=1)
+        large = make_building(make_user(), residents=6, packages=4)
+
+        with self.assertNumQueries(self.EXPECTED_QUERIES):
+            data = self.serialize(small)
+        self.assertEqual(len(data[0]['residents']), 1)
+
+        with self.assertNumQueries(self.EXPECTED_QUERIES):
+            data = self.serialize(large)
+        self.assertEqual(len(data[0]['residents']), 6)
+        self.assertEqual(data[0]['packages_count'], 4)
+        self.assertEqual(len(data[0]['residents'][0]['payment_history']), 4)
+
+
+class BuildingStatsTests(TestCase):
+    def setUp(self):
+        self.building = make_building(make_user(), residents=2, packages=1)
+        self.wallet = Wallet.objects.create(building=self.building)
+
+    def pay(self, amount):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Transaction.objects.create(wallet=self.wallet, amount=Decimal(amount), method='wallet', status='completed')
+
+    def assertConsistent(self):
+        self.assertEqual(find_stale_stats(), [])
+        out = StringIO()
+        call_command('check_building_stats', stdout=out)
+        self.assertIn('consistent', out.getvalue())
+
+    def test_rollup_follows_payments(self):
+        self.assertEqual(get_dashboard_stats([self.building.id])['revenue'], Decimal('0'))
+        self.pay('120')
+        payment = self.pay('30')
+        self.assertConsistent()
+        self.assertEqual(get_dashboard_stats([self.building.id])['revenue'], Decimal('150'))
+
+        # A payment that stops being completed is taken back out
+        with self.captureOnCommitCallbacks(execute=True):
+            payment.status = 'refunded'
+            payment.save()
+        self.assertConsistent()
+        self.assertEqual(get_dashboard_stats([self.building.id])['revenue'], Decimal('120'))
+
+    @mock.patch.object(generate_package_invoices_task, 'delay')
+    def test_rollup_follows_residents_and_packages(self, delay):
+        self.assertEqual(get_dashboard_stats([self.building.id])['residents'], 2)
+        unit = Unit.objects.create(building=self.building, floor_number=2, apartment_number='9')
+        with self.captureOnCommitCallbacks(execute=True):
+            resident = ResidentProfile.objects.create(user=make_user(), unit=unit)
+        self.assertEqual(get_dashboard_stats([self.building.id])['residents'], 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            resident.status = 'approved'
+            resident.save()
+            package = Package.objects.create(
+                package_type='fixed', name='Cleaning', created_by=self.building.union_head,
+                start_date=datetime.date(2026, 1, 1),
+            )
+            PackageBuilding.objects.create(package=package, building=self.building)
+        self.assertConsistent()
+        stats = get_dashboard_stats([self.building.id])
+        self.assertEqual((stats['residents'], stats['packages']), (3, 2))
@@ -6,9 +6,9 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.db.models import Q
 from .models import Building, Unit
-from .serializers import BuildingSerializer, UnitSerializer
+from .serializers import BuildingSerializer, BuildingListSerializer, UnitSerializer
 from .permissions import BuildingPermission
-from apps.core.permissions import DynamicRolePermission
+from apps.core.permissions import DynamicRolePermission, get_user_roles
 from apps.core.views import PublicAPIView
 
 
@@ -26,20 +26,27 @@ class BuildingViewSet(viewsets.ModelViewSet):
     search_fields = ['name', 'address']
     ordering_fields = ['name', 'address']
 
+    # Actions that return many buildings use the slim list representation,
+    # heavy blocks are opt-in through ?expand= (see BuildingListSerializer)
+    list_actions = ('list', 'recent', 'my_buildings')
+
+    def get_serializer_class(self):
+        if self.action in self.list_actions:
+            return BuildingListSerializer
+        return BuildingSerializer
+
     def get_queryset(self):
+        queryset = self.get_visible_buildings()
+        if self.action in self.list_actions:
+            queryset = BuildingListSerializer.setup_eager_loading(queryset, self.request)
+        elif self.action == 'retrieve':
+            queryset = BuildingSerializer.setup_eager_loading(queryset)
+        return queryset
+
+    def get_visible_buildings(self):
         user = self.request.user
-        # Get roles from database
-        roles = [ur.role.name for ur in user.userrole_set.all()]
-
-        # Add implied roles based on profiles
+        roles = get_user_roles(user)
         from apps.accounts.models import ResidentProfile
-        is_resident = ResidentProfile.objects.filter(user=user).exists()
-        is_union_head = Building.objects.filter(union_head=user).exists()
-
-        if is_resident and 'resident' not in roles:
-            roles.append('resident')
-        if is_union_head and 'union_head' not in roles:
-            roles.append('union_head')
         
         # Superusers and staff should see all buildings
         if user.is_superuser or user.is_staff:
@@ -168,10 +175,10 @@ class BuildingViewSet(viewsets.ModelViewSet):
         Get buildings for the current authenticated user where they are the union_head.
         Returns empty list if no buildings found.
         """
-        buildings = Building.objects.filter(union_head_id=request.user.id).order_by('created_at')
-
-        print("🔍 Authenticated user:", request.user.id, request.user.email)
-        print("🏢 Found buildings:", buildings.count())
+        buildings = BuildingListSerializer.setup_eager_loading(
+            Building.objects.filter(union_head_id=request.user.id).order_by('created_at'),
+            request,
+        )
 
         serializer = self.get_serializer(buildings, many=True)
         return Response(serializer.data)
@@ -230,7 +237,11 @@ class BuildingViewSet(viewsets.ModelViewSet):
             resident_profile = ResidentProfile.objects.filter(user=request.user).first()
             if not resident_profile:
                 return Response({'error': 'Resident profile not found'}, status=404)
-            building = resident_profile.unit.building if resident_profile.unit else None
+            building = None
+            if resident_profile.unit_id:
+                building = BuildingSerializer.setup_eager_loading(
+                    Building.objects.filter(unit__id=resident_profile.unit_id)
+                ).first()
             serializer = self.get_serializer(building)
             return Response(serializer.data)
         except Exception as e:
@@ -247,61 +258,12 @@ class BuildingViewSet(viewsets.ModelViewSet):
         if building.union_head != request.user:
             return Response({'error': 'Access denied. Only the union head can view this data.'}, status=403)
 
-        from apps.packages.models import Package, PackageBuilding, PackageInvoice
-
-        # Packages for this building
-        building_packages = Package.objects.filter(packagebuilding__building=building).only('id', 'name', 'description', 'is_recurring', 'package_type', 'created_at')
-
-        packages_data = []
-        for pkg in building_packages:
-            package_invoices = PackageInvoice.objects.filter(package=pkg, building=building).order_by('-created_at')
-            status = 'active'
-            amount = 0
-            due_date = None
-            if package_invoices.exists():
-                latest_invoice = package_invoices.first()
-                status = latest_invoice.status
-                amount = latest_invoice.amount
-                due_date = latest_invoice.due_date
-
-            packages_data.append({
-                'id': pkg.id,
-                'name': pkg.name,
-                'status': status,
-                'amount': amount,
-                'due_date': due_date,
-                'description': pkg.description,
-                'is_recurring': pkg.is_recurring,
-                'package_type': pkg.package_type,
-                'created_at': pkg.created_at,
-            })
+        from apps.packages.queries import building_packages, personal_packages
+
+        packages_data = building_packages([building]).get(building.id, [])
 
         # Personal packages (excluding those linked to this building)
-        created_packages = Package.objects.filter(created_by=request.user).exclude(packagebuilding__building=building).only('id', 'name', 'description', 'is_recurring', 'package_type', 'created_at')
-
-        personal_packages_data = []
-        for pkg in created_packages:
-            package_invoices = PackageInvoice.objects.filter(package=pkg).order_by('-created_at')
-            status = 'active'
-            amount = 0
-            due_date = None
-            if package_invoices.exists():
-                latest_invoice = package_invoices.first()
-                status = latest_invoice.status
-                amount = latest_invoice.amount
-                due_date = latest_invoice.due_date
-
-            personal_packages_data.append({
-                'id': pkg.id,
-                'name': pkg.name,
-                'status': status,
-                'amount': amount,
-                'due_date': due_date,
-                'description': pkg.description,
-                'is_recurring': pkg.is_recurring,
-                'package_type': pkg.package_type,
-                'created_at': pkg.created_at,
-            })
+        personal_packages_data = personal_packages(request.user, [building])
 
         return Response({
             'building': {
@@ -323,8 +285,6 @@ class PublicBuildingNamesView(PublicAPIView):
      الهدف: عرض أسماء وعناوين العمارات المتاحة للجميع (بدون تسجيل دخول)
     """
     def get(self, request):
-        print("🔍 user:", request.user)
-        print("🔍 auth:", request.auth)
         from .models import Building
         buildings = Building.objects.filter(approval_status='approved')
         data = list(buildings.values('id', 'name', 'address'))
@@ -341,18 +301,8 @@ class UnitViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         user = self.request.user
-        # Get roles from database
-        roles = [ur.role.name for ur in user.userrole_set.all()]
-
-        # Add implied roles based on profiles
+        roles = get_user_roles(user)
         from apps.accounts.models import ResidentProfile
-        is_resident = ResidentProfile.objects.filter(user=user).exists()
-        is_union_head = Building.objects.filter(union_head=user).exists()
-
-        if is_resident and 'resident' not in roles:
-            roles.append('resident')
-        if is_union_head and 'union_head' not in roles:
-            roles.append('union_head')
 
         # Superusers and staff should see all units
         if user.is_superuser or user.is_staff:
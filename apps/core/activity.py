@@ -0,0 +1,68 @@
+"""
+Writers for the building Activity feed.
+
+Each ``*_activity`` builder turns a source row into an unsaved Activity;
+the signals in apps.core.signals record them as events happen and the
+``backfill_activities`` command replays existing rows through the same
+builders. Inserts ignore conflicts on (building, kind, source_id), so an
+event is recorded once however often it is replayed.
+"""
+from .models import Activity
+
+
+def record_activities(activities):
+    activities = [activity for activity in activities if activity is not None]
+    if activities:
+        Activity.objects.bulk_create(activities, ignore_conflicts=True)
+    return len(activities)
+
+
+def payment_activity(transaction, building):
+    return Activity(
+        building=building,
+        kind='payment',
+        source_id=str(transaction.id),
+        title=f'تم دفع فاتورة - {building.name}',
+        description=f'مبلغ: {transaction.amount} ج.م',
+        icon='FaCheckCircle',
+        color='green',
+        created_at=transaction.created_at,
+    )
+
+
+def resident_activity(resident, building):
+    return Activity(
+        building=building,
+        kind='resident',
+        source_id=str(resident.id),
+        title=f'انضمام ساكن جديد - {building.name}',
+        description=f'{resident.user.full_name}',
+        icon='FaUsers',
+        color='blue',
+        created_at=resident.created_at,
+    )
+
+
+def package_activity(package, building_id):
+    return Activity(
+        building_id=building_id,
+        kind='package',
+        source_id=str(package.id),
+        title=f'تم إضافة باقة جديدة - {package.name}',
+        description=package.description or f'باقة {package.get_package_type_display()}',
+        icon='FaBox',
+        color='blue',
+        created_at=package.created_at,
+    )
+
+
+def activity_payload(activity):
+    return {
+        'id': f'{activity.kind}_{activity.source_id}',
+        'type': activity.kind,
+        'title': activity.title,
+        'description': activity.description,
+        'timestamp': activity.created_at.isoformat(),
+        'icon': activity.icon,
+        'color': activity.color,
+    }
@@ -1,2 +1,5 @@
 from django.contrib import admin
+from .models import Activity
+
 # Register your models here.
+admin.site.register(Activity)
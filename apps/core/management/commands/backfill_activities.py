@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+
+from apps.core.activity import package_activity, payment_activity, record_activities, resident_activity
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = 'Fill the building activity feed from existing payments, residents and packages'
+
+    def handle(self, *args, **options):
+        from apps.accounts.models import ResidentProfile
+        from apps.buildings.models import Building
+        from apps.packages.models import PackageBuilding
+        from apps.payments.models import Transaction
+
+        buildings = {building.id: building for building in Building.objects.only('id', 'name')}
+
+        recorded = 0
+        batch = []
+        payments = Transaction.objects.filter(
+            wallet__building__isnull=False, status='completed'
+        ).select_related('wallet').iterator(chunk_size=BATCH_SIZE)
+        for transaction in payments:
+            building = buildings.get(transaction.wallet.building_id)
+            if building is not None:
+                batch.append(payment_activity(transaction, building))
+            if len(batch) >= BATCH_SIZE:
+                recorded += record_activities(batch)
+                batch = []
+
+        residents = ResidentProfile.objects.filter(
+            status__in=ResidentProfile.ACCEPTED_STATUSES, unit__isnull=False
+        ).select_related('user', 'unit').iterator(chunk_size=BATCH_SIZE)
+        for resident in residents:
+            building = buildings.get(resident.unit.building_id)
+            if building is not None:
+                batch.append(resident_activity(resident, building))
+            if len(batch) >= BATCH_SIZE:
+                recorded += record_activities(batch)
+                batch = []
+
+        links = PackageBuilding.objects.select_related('package').iterator(chunk_size=BATCH_SIZE)
+        for link in links:
+            batch.append(package_activity(link.package, link.building_id))
+            if len(batch) >= BATCH_SIZE:
+                recorded += record_activities(batch)
+                batch = []
+
+        recorded += record_activities(batch)
+        self.stdout.write(self.style.SUCCESS(f'Activity backfill completed: {recorded} events processed'))
@@ -1,6 +1,7 @@
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 from datetime import date, timedelta
+from decimal import Decimal
 import random
 from apps.accounts.models import User, ResidentProfile
 from apps.buildings.models import Building
@@ -8,6 +9,7 @@ from apps.packages.models import (
     Package, PackageUtility, PackagePrepaid, PackageFixed, PackageMisc,
     PackageBuilding, PackageInvoice
 )
+from apps.payments.ledger import Transfer, clearing_wallet, post_transfers
 from apps.payments.models import Wallet, WalletTransaction, Invoice, Transaction
 
 
@@ -153,11 +155,12 @@ class Command(BaseCommand):
     def create_wallets_and_transactions(self, users, buildings, technicians):
         self.stdout.write('Creating wallets and transactions...')
 
+        seeded = []
+
         # Create wallets for users
         for user in users:
             wallet, created = Wallet.objects.get_or_create(
-                owner_type='user',
-                owner_id=user.id,
+                user=user,
                 defaults={'current_balance': random.uniform(0, 5000)}
             )
             if created:
@@ -173,12 +176,12 @@ class Command(BaseCommand):
                     )
                     wallet.current_balance += amount
                     wallet.save()
+                seeded.append(wallet)
 
         # Create wallets for buildings
         for building in buildings:
             wallet, created = Wallet.objects.get_or_create(
-                owner_type='building',
-                owner_id=building.id,
+                building=building,
                 defaults={'current_balance': random.uniform(0, 10000)}
             )
             if created:
@@ -193,6 +196,14 @@ class Command(BaseCommand):
                     )
                     wallet.current_balance += amount
                     wallet.save()
+                seeded.append(wallet)
+
+        # Balances live in the ledger: open the new wallets from clearing
+        clearing = clearing_wallet()
+        post_transfers([
+            Transfer(clearing, wallet, Decimal(str(round(wallet.current_balance, 2))), f'opening:{wallet.id}', 'opening')
+            for wallet in seeded
+        ])
 
         # Technicians removed, no wallets to create
 
@@ -200,7 +211,7 @@ class Command(BaseCommand):
         wallets = list(Wallet.objects.all())
         for _ in range(20):
             wallet = random.choice(wallets)
-            user = User.objects.filter(id=wallet.owner_id).first() if wallet.owner_type == 'user' else random.choice(users)
+            user = wallet.user if wallet.user_id else random.choice(users)
             invoice = Invoice.objects.create(
                 user=user,
                 source_type='sample',
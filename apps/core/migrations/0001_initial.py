@@ -0,0 +1,35 @@
+# Generated by Django 5.2.7 on 2026-10-18 13:10
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('buildings', '0002_buildingstats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Activity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('payment', 'Payment'), ('resident', 'Resident'), ('package', 'Package')], max_length=20)),
+                ('source_id', models.CharField(max_length=64)),
+                ('title', models.CharField(max_length=255)),
+                ('description', models.TextField(blank=True)),
+                ('icon', models.CharField(max_length=50)),
+                ('color', models.CharField(max_length=20)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('building', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activities', to='buildings.building')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['building', '-created_at', '-id'], name='activity_building_created_idx')],
+                'constraints': [models.UniqueConstraint(fields=('building', 'kind', 'source_id'), name='unique_activity_per_source')],
+            },
+        ),
+    ]
@@ -1,4 +1,36 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 
-# Example models for core
+
+class Activity(models.Model):
+    """
+    Append-only feed of what happened in a building, read by the union
+    head dashboard. Written by apps.core.activity as the events happen;
+    ``source_id`` identifies the originating row so each event is
+    recorded once.
+    """
+    KIND_CHOICES = [
+        ('payment', 'Payment'),
+        ('resident', 'Resident'),
+        ('package', 'Package'),
+    ]
+    building = models.ForeignKey('buildings.Building', on_delete=models.CASCADE, related_name='activities')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    source_id = models.CharField(max_length=64)
+    title = models.CharField(max_length=255)
+    description = models.TextField(blank=True)
+    icon = models.CharField(max_length=50)
+    color = models.CharField(max_length=20)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['building', 'kind', 'source_id'], name='unique_activity_per_source'),
+        ]
+        indexes = [
+            models.Index(fields=['building', '-created_at', '-id'], name='activity_building_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} - {self.title}"
@@ -1,28 +1,14 @@
 from rest_framework import permissions
 from apps.buildings.models import Building, Unit
+from apps.accounts.roles import resolve_user_roles
 
 
 def get_user_roles(user):
     """
     Get all roles for a user, including implied roles.
+    Memoized per request and cached across requests, see apps.accounts.roles.
     """
-    if not user or not user.is_authenticated:
-        return []
-
-    # Get roles from database
-    roles = [ur.role.name for ur in user.userrole_set.all()]
-
-    # Add implied roles based on profiles
-    from apps.accounts.models import ResidentProfile
-    is_resident = ResidentProfile.objects.filter(user=user).exists()
-    is_union_head = Building.objects.filter(union_head=user).exists()
-
-    if is_resident and 'resident' not in roles:
-        roles.append('resident')
-    if is_union_head and 'union_head' not in roles:
-        roles.append('union_head')
-    
-    return roles
+    return resolve_user_roles(user)
 
 
 class DynamicRolePermission(permissions.BasePermission):
@@ -1,3 +1,54 @@
 from rest_framework import serializers
 
-# TODO: add serializers for core
+
+def _param_set(request, name):
+    if request is None:
+        return set()
+    value = request.query_params.get(name, '')
+    return {part.strip() for part in value.split(',') if part.strip()}
+
+
+def requested_fields(request):
+    """
+    Names passed in ``?fields=a,b``; empty means "all default fields".
+    """
+    return _param_set(request, 'fields')
+
+
+def requested_expansions(request):
+    """
+    Names passed in ``?expand=a,b.c``. A dotted name also expands its
+    parents, so ``residents.payment_history`` implies ``residents``.
+    """
+    expand = set()
+    for name in _param_set(request, 'expand'):
+        parts = name.split('.')
+        expand.update('.'.join(parts[:i]) for i in range(1, len(parts) + 1))
+    return expand
+
+
+class SparseFieldsetMixin:
+    """
+    Serializer mixin for ``?fields=`` / ``?expand=``.
+
+    Fields listed in ``Meta.expandable_fields`` are left out unless they are
+    named in ``?expand=``; ``?fields=`` then restricts the output to the
+    given fields (expanded ones are always kept). Views should load only
+    the relations of expanded fields, see ``is_expanded``.
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        expand = requested_expansions(request)
+        only = requested_fields(request)
+
+        for name in getattr(self.Meta, 'expandable_fields', ()):
+            if name not in expand:
+                fields.pop(name, None)
+        if only:
+            fields = {name: field for name, field in fields.items() if name in only or name in expand}
+        return fields
+
+    def is_expanded(self, name):
+        return name in requested_expansions(self.context.get('request'))
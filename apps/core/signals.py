@@ -0,0 +1,35 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .activity import package_activity, payment_activity, record_activities, resident_activity
+
+
+@receiver(post_save, sender='payments.Transaction')
+def record_payment_activity(sender, instance, **kwargs):
+    """
+    A completed payment into a building wallet shows in that building's feed.
+    """
+    from apps.buildings.models import Building
+
+    if instance.status != 'completed':
+        return
+    building = Building.objects.filter(wallets__id=instance.wallet_id).only('id', 'name').first()
+    if building is not None:
+        record_activities([payment_activity(instance, building)])
+
+
+@receiver(post_save, sender='accounts.ResidentProfile')
+def record_resident_activity(sender, instance, **kwargs):
+    from apps.buildings.models import Building
+
+    if instance.status not in sender.ACCEPTED_STATUSES or instance.unit_id is None:
+        return
+    building = Building.objects.filter(unit__id=instance.unit_id).only('id', 'name').first()
+    if building is not None:
+        record_activities([resident_activity(instance, building)])
+
+
+@receiver(post_save, sender='packages.PackageBuilding')
+def record_package_activity(sender, instance, created, **kwargs):
+    if created:
+        record_activities([package_activity(instance.package, instance.building_id)])
@@ -0,0 +1,96 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.accounts.models import ResidentProfile
+from apps.accounts.factories import make_user
+from apps.buildings.models import Building, Unit
+from .models import Activity
+from .views import ActivityCursorPagination
+
+
+def make_unit():
+    building = Building.objects.create(
+        union_head=make_user(), name='Building', address='Cairo',
+        total_units=1, total_floors=1, units_per_floor=1,
+    )
+    return Unit.objects.create(building=building, floor_number=1, apartment_number='1')
+
+
+class ResidentActivityTests(TestCase):
+    def test_approved_and_accepted_residents_show_in_the_feed(self):
+        unit = make_unit()
+        approved = ResidentProfile.objects.create(user=make_user(), unit=unit)
+        accepted = ResidentProfile.objects.create(user=make_user(), unit=unit)
+        self.assertFalse(Activity.objects.exists())
+
+        approved.status = 'approved'
+        approved.save()
+        accepted.status = 'accepted'
+        accepted.save()
+        self.assertEqual(
+            set(Activity.objects.filter(kind='resident').values_list('source_id', flat=True)),
+            {str(approved.id), str(accepted.id)},
+        )
+
+    def test_rejected_resident_is_not_recorded(self):
+        ResidentProfile.objects.create(user=make_user(), unit=make_unit(), status='rejected')
+        self.assertFalse(Activity.objects.filter(kind='resident').exists())
+
+
+class LatestActivitiesTests(TestCase):
+    url = '/api/core/dashboard/activities/'
+
+    def test_following_next_returns_every_activity_once(self):
+        building = make_unit().building
+        now = timezone.now()
+        # Several activities share a timestamp, so pages must break ties
+        Activity.objects.bulk_create([
+            Activity(
+                building=building, kind='package', source_id=str(number), title=f'Activity {number}',
+                icon='FaBox', color='blue', created_at=now - timedelta(minutes=number // 4),
+            )
+            for number in range(25)
+        ])
+        client = APIClient()
+        client.force_authenticate(building.union_head)
+
+        seen = []
+        url = self.url
+        pages = 0
+        while url:
+            response = client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data['results']), ActivityCursorPagination.page_size)
+            seen.extend(activity['id'] for activity in response.data['results'])
+            url = response.data['next']
+            pages += 1
+
+        self.assertEqual(pages, 3)
+        self.assertEqual(len(seen), 25)
+        self.assertEqual(set(seen), {f'package_{number}' for number in range(25)})
+        newest_first = Activity.objects.order_by('-created_at', '-id').values_list('source_id', flat=True)
+        self.assertEqual(seen, [f'package_{source_id}' for source_id in newest_first])
+
+    def test_other_users_are_refused(self):
+        make_unit()
+        client = APIClient()
+        client.force_authenticate(make_user())
+        self.assertEqual(client.get(self.url).status_code, 403)
+
+
+class BackfillActivitiesTests(TestCase):
+    def test_backfill_records_each_event_once(self):
+        unit = make_unit()
+        resident = ResidentProfile.objects.create(user=make_user(), unit=unit, status='approved')
+        Activity.objects.all().delete()
+
+        for _ in range(2):
+            call_command('backfill_activities', stdout=StringIO())
+        self.assertEqual(
+            list(Activity.objects.values_list('kind', 'source_id')), [('resident', str(resident.id))],
+        )
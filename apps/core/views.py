@@ -5,17 +5,14 @@ from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from django.db.models import Sum, Count
-from django.db.models.functions import Cast
-from django.db.models import CharField
 from django.utils import timezone
-from datetime import timedelta
 from django.contrib.auth import get_user_model
-from apps.accounts.models import ResidentProfile
 from apps.buildings.models import Building
-from apps.packages.models import PackageBuilding, PackageInvoice, Package
-from apps.payments.models import Transaction
-from apps.notifications.models import Notification
+from apps.notifications.counters import get_unread_summary
+from apps.buildings.stats import get_dashboard_stats
+from .activity import activity_payload
+from .models import Activity
+from .pagination import CreatedAtCursorPagination
 
 User = get_user_model()
 
@@ -56,30 +53,13 @@ def dashboard_stats(request):
     # Get buildings owned by this union_head
     buildings = Building.objects.filter(union_head=user)
 
-    # Statistics
-    total_buildings = buildings.count()
-    total_residents = ResidentProfile.objects.filter(
-        unit__building__in=buildings,
-        status='accepted'
-    ).count()
-
-    # Total packages (unique packages linked to buildings)
-    total_packages = PackageBuilding.objects.filter(
-        building__in=buildings
-    ).values('package').distinct().count()
-
-    # Monthly revenue (transactions in current month)
-    current_month = timezone.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    next_month = current_month + timedelta(days=32)
-    next_month = next_month.replace(day=1)
-
-    monthly_revenue = Transaction.objects.filter(
-        wallet__owner_type='building',
-        wallet__owner_id__in=buildings.annotate(id_str=Cast('id', CharField())).values_list('id_str', flat=True),
-        created_at__gte=current_month,
-        created_at__lt=next_month,
-        status='completed'
-    ).aggregate(total=Sum('amount'))['total'] or 0
+    # Statistics (one BuildingStats row per building for the current month)
+    building_ids = list(buildings.values_list('id', flat=True))
+    total_buildings = len(building_ids)
+    stats = get_dashboard_stats(building_ids)
+    total_residents = stats['residents']
+    total_packages = stats['packages']
+    monthly_revenue = stats['revenue']
 
     # Pending maintenance requests - temporarily set to 0 since maintenance app is removed
     pending_maintenance = 0
@@ -93,6 +73,10 @@ def dashboard_stats(request):
     })
 
 
+class ActivityCursorPagination(CreatedAtCursorPagination):
+    page_size = 10
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def latest_activities(request):
@@ -109,88 +93,29 @@ def latest_activities(request):
         return Response({"error": "Access denied. Union head role required."}, status=403)
 
     # Get buildings owned by this union_head
-    buildings = Building.objects.filter(union_head=user)
-    building_ids = buildings.values_list('id', flat=True)
-
-    activities = []
-
-    # Recent transactions (payments)
-    recent_transactions = Transaction.objects.filter(
-        wallet__owner_type='building',
-        wallet__owner_id__in=[str(bid) for bid in building_ids],
-        status='completed'
-    ).select_related('wallet', 'invoice').order_by('-created_at')[:5]
-
-    for transaction in recent_transactions:
-        building = buildings.filter(id=transaction.wallet.owner_id).first()
-        activities.append({
-            'id': f'transaction_{transaction.id}',
-            'type': 'payment',
-            'title': f'تم دفع فاتورة - {building.name if building else "عمارة"}',
-            'description': f'مبلغ: {transaction.amount} ج.م',
-            'timestamp': transaction.created_at,
-            'icon': 'FaCheckCircle',
-            'color': 'green'
-        })
-
-    # Maintenance requests removed - no activities to add
-
-    # Recent resident registrations
-    recent_residents = ResidentProfile.objects.filter(
-        unit__building__in=buildings,
-        status='accepted'
-    ).select_related('unit__building', 'user').order_by('-created_at')[:3]
-
-    for resident in recent_residents:
-        activities.append({
-            'id': f'resident_{resident.id}',
-            'type': 'resident',
-            'title': f'انضمام ساكن جديد - {resident.unit.building.name}',
-            'description': f'{resident.user.full_name}',
-            'timestamp': resident.created_at,
-            'icon': 'FaUsers',
-            'color': 'blue'
-        })
-
-    # Unread notifications count
-    unread_notifications_count = Notification.objects.filter(
-        user=user,
-        is_read=False
-    ).count()
-
-    if unread_notifications_count > 0:
-        activities.append({
+    building_ids = list(Building.objects.filter(union_head=user).values_list('id', flat=True))
+
+    # Feed rows are written as events happen (see apps.core.activity); this
+    # is one range scan on (building, created_at), paged by cursor.
+    paginator = ActivityCursorPagination()
+    page = paginator.paginate_queryset(
+        Activity.objects.filter(building_id__in=building_ids), request
+    )
+    activities = [activity_payload(activity) for activity in page]
+
+    # Unread notifications count, on the first page only
+    unread_summary = get_unread_summary(user.id)
+    unread_notifications_count = unread_summary['unread']
+
+    if unread_notifications_count > 0 and not request.query_params.get(paginator.cursor_query_param):
+        activities.insert(0, {
             'id': 'unread_notifications',
             'type': 'notification',
             'title': f'إشعارات جديدة ({unread_notifications_count})',
             'description': f'لديك {unread_notifications_count} إشعار غير مقروء',
-            'timestamp': Notification.objects.filter(user=user).order_by('-created_at').first().created_at if unread_notifications_count > 0 else timezone.now(),
+            'timestamp': unread_summary['latest_at'] or timezone.now().isoformat(),
             'icon': 'FaBell',
             'color': 'purple'
         })
 
-    # Recent package additions
-    recent_packages = Package.objects.filter(
-        packagebuilding__building__in=buildings
-    ).select_related('created_by').order_by('-created_at')[:3]
-
-    for package in recent_packages:
-        activities.append({
-            'id': f'package_{package.id}',
-            'type': 'package',
-            'title': f'تم إضافة باقة جديدة - {package.name}',
-            'description': package.description or f'باقة {package.get_package_type_display()}',
-            'timestamp': package.created_at,
-            'icon': 'FaBox',
-            'color': 'blue'
-        })
-
-    # Sort all activities by timestamp and take top 10
-    activities.sort(key=lambda x: x['timestamp'], reverse=True)
-    activities = activities[:10]
-
-    # Format timestamps as ISO strings for proper JavaScript parsing
-    for activity in activities:
-        activity['timestamp'] = activity['timestamp'].isoformat()
-
-    return Response(activities)
+    return paginator.get_paginated_response(activities)
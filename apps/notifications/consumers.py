@@ -2,10 +2,9 @@ import json
 from channels.generic.websocket import AsyncJsonWebsocketConsumer
 from channels.db import database_sync_to_async
 from rest_framework_simplejwt.tokens import AccessToken
-from django.contrib.auth import get_user_model
+from apps.accounts.user_cache import get_cached_user
 from .models import Notification
-
-User = get_user_model()
+from .counters import get_unread_summary
 
 class NotificationConsumer(AsyncJsonWebsocketConsumer):
     """
@@ -20,7 +19,8 @@ class NotificationConsumer(AsyncJsonWebsocketConsumer):
             try:
                 access = AccessToken(token)
                 user_id = access.get("user_id")
-                self.user = await database_sync_to_async(User.objects.get)(id=user_id)
+                user = await database_sync_to_async(get_cached_user)(user_id)
+                self.user = user if user is not None and user.is_active else None
             except Exception:
                 self.user = None
 
@@ -32,6 +32,10 @@ class NotificationConsumer(AsyncJsonWebsocketConsumer):
         await self.channel_layer.group_add(self.group_name, self.channel_name)
         await self.accept()
 
+        # Current badge state, so the client does not have to poll for it
+        summary = await database_sync_to_async(get_unread_summary)(self.user.id)
+        await self.send_json({"type": "unread_summary", **summary})
+
     async def disconnect(self, close_code):
         await self.channel_layer.group_discard(self.group_name, self.channel_name)
 
@@ -42,3 +46,6 @@ class NotificationConsumer(AsyncJsonWebsocketConsumer):
     async def send_notification(self, event):
         # Send notification data to WebSocket
         await self.send_json(event["content"])
+
+    async def send_unread_summary(self, event):
+        await self.send_json(event["content"])
@@ -0,0 +1,98 @@
+"""
+Per-user unread notification counters.
+
+The unread count and the time of the latest notification are kept in the
+shared cache and adjusted in place when notifications are created or read,
+so badges never need to count the table. A missing entry is rebuilt from
+the database with a single aggregate query; the timeout bounds how long
+any drift can survive.
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max, Q
+
+UNREAD_COUNTER_TIMEOUT = getattr(settings, 'UNREAD_COUNTER_TIMEOUT', 60 * 10)
+
+
+def _unread_key(user_id):
+    return f"notification_unread:{user_id}"
+
+
+def _latest_key(user_id):
+    return f"notification_latest:{user_id}"
+
+
+def get_unread_summary(user_id):
+    """
+    Return ``{'unread': int, 'latest_at': iso string or None}``.
+    """
+    from .models import Notification
+
+    unread_key, latest_key = _unread_key(user_id), _latest_key(user_id)
+    cached = cache.get_many([unread_key, latest_key])
+    if unread_key in cached and latest_key in cached:
+        # '' stands for "no notifications yet", since None is not cacheable
+        return {'unread': max(cached[unread_key], 0), 'latest_at': cached[latest_key] or None}
+
+    totals = Notification.objects.filter(user_id=user_id).aggregate(
+        unread=Count('id', filter=Q(is_read=False)),
+        latest_at=Max('created_at'),
+    )
+    latest_at = totals['latest_at'].isoformat() if totals['latest_at'] else ''
+    cache.set_many({unread_key: totals['unread'], latest_key: latest_at}, UNREAD_COUNTER_TIMEOUT)
+    return {'unread': totals['unread'], 'latest_at': latest_at or None}
+
+
+def _adjust(user_id, delta):
+    """
+    Apply delta to a cached counter. A missing counter is left missing and
+    gets rebuilt from the database on the next read.
+    """
+    try:
+        if delta > 0:
+            value = cache.incr(_unread_key(user_id), delta)
+        else:
+            value = cache.decr(_unread_key(user_id), -delta)
+    except ValueError:
+        return
+    if value < 0:
+        cache.delete(_unread_key(user_id))
+
+
+def record_created(notifications):
+    """
+    Count freshly committed notifications into their users' counters.
+    """
+    unread = defaultdict(int)
+    latest = {}
+    for notification in notifications:
+        if not notification.is_read:
+            unread[notification.user_id] += 1
+        created_at = notification.created_at.isoformat()
+        if created_at > latest.get(notification.user_id, ''):
+            latest[notification.user_id] = created_at
+
+    for user_id, count in unread.items():
+        _adjust(user_id, count)
+
+    cached_latest = cache.get_many([_latest_key(user_id) for user_id in latest])
+    cache.set_many(
+        {
+            _latest_key(user_id): created_at
+            for user_id, created_at in latest.items()
+            if created_at > (cached_latest.get(_latest_key(user_id)) or '')
+        },
+        UNREAD_COUNTER_TIMEOUT,
+    )
+    return list(latest)
+
+
+def record_read(user_id, count):
+    if count:
+        _adjust(user_id, -count)
+
+
+def reset_unread(user_id):
+    cache.set(_unread_key(user_id), 0, UNREAD_COUNTER_TIMEOUT)
@@ -1,9 +1,25 @@
+import logging
+
 from django.db import models
 from apps.accounts.models import User
 from django.db.models.signals import post_save
 from django.dispatch import receiver
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+class NotificationQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        """
+        bulk_create skips post_save, so queue the realtime delivery of the
+        new rows here (one extra INSERT for the whole batch).
+        """
+        created = super().bulk_create(objs, *args, **kwargs)
+        from .outbox import enqueue_notifications
+        enqueue_notifications([obj for obj in created if obj.pk is not None], using=self.db)
+        return created
+
 
 class Notification(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -12,38 +28,36 @@ class Notification(models.Model):
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = NotificationQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Serves the cursor-paginated list and the unread aggregates
+            models.Index(fields=['user', '-created_at', '-id'], name='notification_user_created_idx'),
+        ]
+
     def __str__(self):
         return f"🔔 {self.user.full_name}: {self.title} - {self.message[:50]}"
 
-import logging
 
-# ... (rest of the imports)
+class NotificationOutbox(models.Model):
+    """
+    Notifications waiting to be pushed over the channel layer. Rows are
+    written in the same transaction as the notification and drained in
+    batches by the dispatcher task.
+    """
+    notification = models.OneToOneField(Notification, on_delete=models.CASCADE, related_name='outbox')
+    # Failed sends so far; the row is retried with backoff from available_at
+    attempts = models.PositiveSmallIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
 
-logger = logging.getLogger(__name__)
+    def __str__(self):
+        return f"Outbox #{self.notification_id}"
 
-class Notification(models.Model):
-    # ... (model definition)
 
 @receiver(post_save, sender=Notification)
 def send_realtime_notification(sender, instance, created, **kwargs):
     if created:
-        try:
-            channel_layer = get_channel_layer()
-            if channel_layer is not None:
-                group_name = f"user_{instance.user.id}_notifications"
-
-                async_to_sync(channel_layer.group_send)(
-                    group_name,
-                    {
-                        "type": "send_notification",
-                        "content": {
-                            "id": instance.id,
-                            "title": instance.title,
-                            "message": instance.message,
-                            "is_read": instance.is_read,
-                            "created_at": instance.created_at.strftime("%Y-%m-%d %H:%M:%S"),
-                        },
-                    }
-                )
-        except Exception as e:
-            logger.error(f"Failed to send real-time notification for user {instance.user.id}: {e}")
+        from .outbox import enqueue_notifications
+        enqueue_notifications([instance], using=kwargs.get('using'))
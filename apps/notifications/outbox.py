@@ -0,0 +1,203 @@
+"""
+Realtime delivery of notifications through an outbox table.
+
+Writers only insert NotificationOutbox rows next to their notifications
+(single saves through post_save, bulk_create through the queryset) and
+schedule the dispatcher once their transaction commits. The dispatcher
+drains the outbox in batches and sends each batch's group_send calls
+concurrently on a single event loop, so the Redis round trips are
+pipelined instead of paid once per notification by the writer.
+
+A batch is claimed by pushing its rows' ``available_at`` past a short
+lease and committing, so no transaction stays open across the sends.
+Rows are deleted once sent; a failed send is retried with backoff.
+"""
+import asyncio
+import logging
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction as db_transaction
+from django.utils import timezone
+
+from .counters import get_unread_summary, record_created
+
+logger = logging.getLogger(__name__)
+
+DISPATCH_BATCH_SIZE = getattr(settings, 'NOTIFICATION_DISPATCH_BATCH_SIZE', 500)
+# A row failing this many sends is dropped; the notification stays listed
+DISPATCH_MAX_ATTEMPTS = getattr(settings, 'NOTIFICATION_DISPATCH_MAX_ATTEMPTS', 8)
+# Seconds a claimed batch is hidden from other dispatchers. A dispatcher
+# that dies mid-batch leaves its rows to be sent again after the lease.
+DISPATCH_LEASE_SECONDS = 60
+DISPATCH_RETRY_BASE_SECONDS = 5
+DISPATCH_RETRY_MAX_SECONDS = 60 * 10
+
+# Held between scheduling the dispatcher and the moment it starts draining,
+# so a burst of commits enqueues a single task.
+DISPATCH_SCHEDULED_KEY = 'notification_outbox_dispatch_scheduled'
+DISPATCH_SCHEDULED_TIMEOUT = 60
+
+
+def group_name(user_id):
+    return f"user_{user_id}_notifications"
+
+
+def notification_payload(notification):
+    return {
+        "id": notification.id,
+        "title": notification.title,
+        "message": notification.message,
+        "is_read": notification.is_read,
+        "created_at": notification.created_at.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+
+def enqueue_notifications(notifications, using=None):
+    """
+    Queue freshly created notifications for realtime delivery.
+    """
+    from .models import NotificationOutbox
+
+    if not notifications:
+        return
+    NotificationOutbox.objects.using(using).bulk_create(
+        [NotificationOutbox(notification_id=notification.pk) for notification in notifications],
+        ignore_conflicts=True,
+    )
+    db_transaction.on_commit(lambda: record_created(notifications), using=using)
+    db_transaction.on_commit(schedule_dispatch, using=using)
+
+
+def schedule_dispatch():
+    if not cache.add(DISPATCH_SCHEDULED_KEY, 1, DISPATCH_SCHEDULED_TIMEOUT):
+        return
+    from .tasks import dispatch_notification_outbox
+    try:
+        dispatch_notification_outbox.delay()
+    except Exception as e:
+        # The periodic dispatcher picks the rows up if the broker is down
+        cache.delete(DISPATCH_SCHEDULED_KEY)
+        logger.error(f"Failed to schedule notification dispatch: {e}")
+
+
+def unread_summary_message(user_id):
+    return (
+        group_name(user_id),
+        {"type": "send_unread_summary", "content": {"type": "unread_summary", **get_unread_summary(user_id)}},
+    )
+
+
+def push_unread_summaries(user_ids):
+    """
+    Push the current unread summary to each user's open sockets.
+    """
+    channel_layer = get_channel_layer()
+    if channel_layer is None or not user_ids:
+        return
+    messages = [unread_summary_message(user_id) for user_id in user_ids]
+    for (group, _), result in zip(messages, async_to_sync(_group_send_all)(channel_layer, messages)):
+        if isinstance(result, Exception):
+            logger.error(f"Failed to push unread summary to {group}: {result}")
+
+
+async def _group_send_all(channel_layer, messages):
+    return await asyncio.gather(
+        *(channel_layer.group_send(group, message) for group, message in messages),
+        return_exceptions=True,
+    )
+
+
+def retry_delay(attempts):
+    return timedelta(seconds=min(DISPATCH_RETRY_BASE_SECONDS * 2 ** (attempts - 1), DISPATCH_RETRY_MAX_SECONDS))
+
+
+def claim_batch(batch_size=DISPATCH_BATCH_SIZE):
+    """
+    Lease up to ``batch_size`` due rows to this dispatcher and commit.
+    Rows are locked with SKIP LOCKED only while they are being leased, so
+    several dispatchers can drain the outbox side by side.
+    """
+    from .models import NotificationOutbox
+
+    now = timezone.now()
+    with db_transaction.atomic():
+        entries = list(
+            NotificationOutbox.objects.select_for_update(skip_locked=True, of=('self',))
+            .filter(available_at__lte=now)
+            .select_related('notification')
+            .order_by('id')[:batch_size]
+        )
+        if entries:
+            NotificationOutbox.objects.filter(id__in=[entry.id for entry in entries]).update(
+                available_at=now + timedelta(seconds=DISPATCH_LEASE_SECONDS)
+            )
+    return entries
+
+
+def dispatch_batch(batch_size=DISPATCH_BATCH_SIZE):
+    """
+    Send one batch of pending notifications and remove the sent rows from
+    the outbox. Return the number of rows handled.
+
+    Delivery is at-least-once: a failed send stays in the outbox with its
+    attempt counter bumped, and a crash after sending leaves the rows to
+    be sent again once their lease runs out.
+    """
+    from .models import NotificationOutbox
+
+    entries = claim_batch(batch_size)
+    if not entries:
+        return 0
+
+    channel_layer = get_channel_layer()
+    failed = []
+    if channel_layer is not None:
+        messages = [
+            (
+                group_name(entry.notification.user_id),
+                {"type": "send_notification", "content": notification_payload(entry.notification)},
+            )
+            for entry in entries
+        ]
+        # One badge update per user after their notifications
+        messages += [
+            unread_summary_message(user_id)
+            for user_id in dict.fromkeys(entry.notification.user_id for entry in entries)
+        ]
+        results = async_to_sync(_group_send_all)(channel_layer, messages)
+        for (group, _), result in zip(messages, results):
+            if isinstance(result, Exception):
+                logger.error(f"Failed to send real-time notification to {group}: {result}")
+        failed = [entry for entry, result in zip(entries, results) if isinstance(result, Exception)]
+
+    now = timezone.now()
+    retries = []
+    for entry in failed:
+        entry.attempts += 1
+        if entry.attempts >= DISPATCH_MAX_ATTEMPTS:
+            logger.error(f"Giving up real-time delivery of notification {entry.notification_id} after {entry.attempts} attempts")
+            continue
+        entry.available_at = now + retry_delay(entry.attempts)
+        retries.append(entry)
+    if retries:
+        NotificationOutbox.objects.bulk_update(retries, ['attempts', 'available_at'])
+
+    retry_ids = {entry.id for entry in retries}
+    NotificationOutbox.objects.filter(
+        id__in=[entry.id for entry in entries if entry.id not in retry_ids]
+    ).delete()
+    return len(entries)
+
+
+def drain_outbox(batch_size=DISPATCH_BATCH_SIZE):
+    cache.delete(DISPATCH_SCHEDULED_KEY)
+    sent = 0
+    while True:
+        count = dispatch_batch(batch_size)
+        sent += count
+        if count < batch_size:
+            return sent
@@ -0,0 +1,18 @@
+import logging
+
+from celery import shared_task
+
+from .outbox import drain_outbox
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(ignore_result=True)
+def dispatch_notification_outbox():
+    """
+    Push pending notifications to their users' websocket groups.
+    """
+    sent = drain_outbox()
+    if sent:
+        logger.info(f"Dispatched {sent} realtime notifications")
+    return sent
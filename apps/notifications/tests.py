@@ -0,0 +1,88 @@
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from apps.accounts.models import User
+from apps.core.pagination import CreatedAtCursorPagination
+from .models import Notification, NotificationOutbox
+from .outbox import dispatch_batch, group_name
+
+
+class FakeChannelLayer:
+    def __init__(self, failing_groups=()):
+        self.failing_groups = set(failing_groups)
+        self.sent = []
+
+    async def group_send(self, group, message):
+        if group in self.failing_groups:
+            raise ConnectionError('channel layer unavailable')
+        self.sent.append((group, message))
+
+
+def make_user(n):
+    return User.objects.create_user(
+        username=f'user{n}', email=f'user{n}@example.com', password='x',
+        full_name=f'User {n}', phone_number=f'0100000000{n}', national_id=f'2900000000000{n}',
+    )
+
+
+class OutboxDispatchTests(TestCase):
+    def setUp(self):
+        self.alice, self.bob = make_user(1), make_user(2)
+        Notification.objects.create(user=self.alice, message='hello alice')
+        Notification.objects.create(user=self.bob, message='hello bob')
+
+    def dispatch(self, layer):
+        with mock.patch('apps.notifications.outbox.get_channel_layer', return_value=layer):
+            return dispatch_batch()
+
+    def test_sent_rows_are_removed(self):
+        layer = FakeChannelLayer()
+        self.assertEqual(self.dispatch(layer), 2)
+        self.assertFalse(NotificationOutbox.objects.exists())
+
+    def test_failed_send_stays_in_outbox_with_backoff(self):
+        layer = FakeChannelLayer(failing_groups=[group_name(self.bob.pk)])
+        self.assertEqual(self.dispatch(layer), 2)
+
+        entry = NotificationOutbox.objects.get()
+        self.assertEqual(entry.notification.user, self.bob)
+        self.assertEqual(entry.attempts, 1)
+        # Not due yet, so an immediate run leaves it alone
+        self.assertEqual(self.dispatch(FakeChannelLayer()), 0)
+
+        NotificationOutbox.objects.update(available_at=entry.created_at)
+        self.assertEqual(self.dispatch(FakeChannelLayer()), 1)
+        self.assertFalse(NotificationOutbox.objects.exists())
+
+
+class CursorPaginationTests(TestCase):
+    def setUp(self):
+        self.user = make_user(1)
+        Notification.objects.bulk_create([Notification(user=self.user, message=str(n)) for n in range(7)])
+        # Several notifications share a timestamp, as bulk writes do
+        Notification.objects.update(created_at=timezone.now())
+        self.queryset = Notification.objects.filter(user=self.user)
+
+    def page(self, url):
+        paginator = CreatedAtCursorPagination()
+        paginator.page_size = 3
+        page = paginator.paginate_queryset(self.queryset, Request(APIRequestFactory().get(url)))
+        return [notification.id for notification in page], paginator.get_next_link(), paginator.get_previous_link()
+
+    def test_pages_walk_ties_without_skips_or_repeats(self):
+        expected = list(self.queryset.order_by('-created_at', '-id').values_list('id', flat=True))
+
+        seen, links, url = [], [], '/notifications/'
+        while url:
+            ids, url, previous = self.page(url)
+            seen += ids
+            links.append(previous)
+        self.assertEqual(seen, expected)
+
+        # And back again from the last page
+        ids, _, previous = self.page(links[-1])
+        self.assertEqual(ids, expected[3:6])
@@ -1,7 +1,10 @@
 from rest_framework.routers import DefaultRouter
-from .views import NotificationViewSet
+from django.urls import path
+from .views import NotificationViewSet, unread_summary
 
 router = DefaultRouter()
 router.register(r'notification', NotificationViewSet)
 
-urlpatterns = router.urls
+urlpatterns = [
+    path('unread-summary/', unread_summary, name='notification-unread-summary'),
+] + router.urls
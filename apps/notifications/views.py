@@ -1,10 +1,15 @@
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import viewsets, filters
-from rest_framework.decorators import action
+from rest_framework import status
+from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from .models import Notification
 from .serializers import NotificationSerializer
 from apps.core.permissions import DynamicRolePermission
+from apps.core.pagination import CreatedAtCursorPagination
+from .counters import get_unread_summary, record_read, reset_unread
+from .outbox import push_unread_summaries
 
 class NotificationViewSet(viewsets.ModelViewSet):
     permission_classes = [DynamicRolePermission]
@@ -16,9 +21,11 @@ class NotificationViewSet(viewsets.ModelViewSet):
     queryset = Notification.objects.all()
     serializer_class = NotificationSerializer
     permission_classes = [DynamicRolePermission]
+    pagination_class = CreatedAtCursorPagination
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['title', 'created_at']
-    ordering_fields = ['title', 'created_at']
+    # Cursor pagination needs a stable, indexed order
+    ordering_fields = ['created_at']
 
     def get_queryset(self):
         user = self.request.user
@@ -33,8 +40,49 @@ class NotificationViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'], permission_classes=[])
     def mark_read(self, request, pk=None):
         notification = self.get_object()
+        # Conditional UPDATE, so concurrent requests decrement the counter once
+        if Notification.objects.filter(pk=notification.pk, is_read=False).update(is_read=True):
+            record_read(notification.user_id, 1)
+            push_unread_summaries([notification.user_id])
         notification.is_read = True
-        notification.save()
         serializer = self.get_serializer(notification)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated])
+    def mark_all_read(self, request):
+        """
+        Mark every unread notification of the user as read in one UPDATE.
+        """
+        updated = self.get_queryset().filter(is_read=False).update(is_read=True)
+        reset_unread(request.user.id)
+        push_unread_summaries([request.user.id])
+        return Response({'updated': updated})
+
+    @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated])
+    def mark_read_bulk(self, request):
+        """
+        Mark the given notifications as read in one UPDATE.
+        Body: {"ids": [1, 2, 3]}
+        """
+        ids = request.data.get('ids')
+        if not isinstance(ids, list) or not ids:
+            return Response({'error': 'ids must be a non-empty list'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            ids = [int(notification_id) for notification_id in ids]
+        except (TypeError, ValueError):
+            return Response({'error': 'ids must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+
+        updated = self.get_queryset().filter(id__in=ids, is_read=False).update(is_read=True)
+        record_read(request.user.id, updated)
+        push_unread_summaries([request.user.id])
+        return Response({'updated': updated})
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def unread_summary(request):
+    """
+    Unread count and latest notification time for the badge, served from
+    the per-user counter.
+    """
+    return Response(get_unread_summary(request.user.id))
@@ -0,0 +1,381 @@
+"""
+Set-based engine for recurring package invoices.
+
+Instead of walking package -> building -> unit -> resident with several
+queries per unit, a run over a set of buildings:
+
+1. loads the recurring package links for those buildings in one query,
+2. resolves the active resident of every unit in one annotated
+   ``DISTINCT ON (unit_id)`` query (approved tenant first, then owner),
+3. counts units per building in one aggregate query,
+4. computes every invoice in memory and writes them with
+   ``bulk_create(ignore_conflicts=True)`` against the unique
+   (package, resident, due_date) constraint, so re-running a period is a
+   no-op for invoices that already exist.
+
+The cost of a run is therefore a constant number of queries per batch of
+buildings rather than per unit.
+"""
+from datetime import date
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db.models import Case, When, Value, IntegerField, Count, Q
+
+from apps.accounts.models import ResidentProfile
+from apps.buildings.models import Unit
+from apps.notifications.models import Notification
+from apps.payments.debits import debit_invoices, DEBIT_BATCH_SIZE
+from .models import PackageBuilding, PackageInvoice
+
+# Package types billed every month, with the detail relation holding the
+# monthly amount and the day of the month the invoice falls due.
+RECURRING_PACKAGE_TYPES = {
+    'utilities': ('packageutility', 'due_day'),
+    'fixed': ('packagefixed', 'deduction_day'),
+}
+
+BUILDING_BATCH_SIZE = 500
+INVOICE_BATCH_SIZE = 1000
+
+CENT = Decimal('0.01')
+
+
+def empty_summary():
+    return {'created': 0, 'paid': 0, 'insufficient': 0, 'no_wallet': 0}
+
+
+def merge_summaries(total, summary):
+    for key, value in summary.items():
+        total[key] = total.get(key, 0) + value
+    return total
+
+
+def period_due_date(today, due_day):
+    return date(today.year, today.month, min(due_day, 28))
+
+
+def recurring_links(building_ids=None):
+    """
+    PackageBuilding rows of recurring packages, with the package and its
+    amount details joined in.
+    """
+    links = PackageBuilding.objects.filter(
+        package__is_recurring=True,
+        package__package_type__in=RECURRING_PACKAGE_TYPES.keys(),
+    ).select_related('package__packageutility', 'package__packagefixed')
+    if building_ids is not None:
+        links = links.filter(building_id__in=building_ids)
+    return links
+
+
+def recurring_building_ids(first_id=None, last_id=None):
+    """
+    Ids of every building linked to at least one recurring package, ordered,
+    optionally restricted to the inclusive range [first_id, last_id].
+    """
+    links = recurring_links()
+    if first_id is not None:
+        links = links.filter(building_id__gte=first_id)
+    if last_id is not None:
+        links = links.filter(building_id__lte=last_id)
+    return list(links.order_by('building_id').values_list('building_id', flat=True).distinct())
+
+
+def shard_ranges(building_ids, shards):
+    """
+    Split an ordered list of building ids into at most ``shards`` contiguous
+    ``(first_id, last_id)`` ranges. The first range is open below and the
+    last one open above, so buildings added after the split still belong to
+    exactly one shard.
+    """
+    if not building_ids:
+        return []
+    shards = max(1, min(shards, len(building_ids)))
+    size, remainder = divmod(len(building_ids), shards)
+
+    ranges = []
+    start = 0
+    for index in range(shards):
+        end = start + size + (1 if index < remainder else 0)
+        ranges.append([str(building_ids[start]), str(building_ids[end - 1])])
+        start = end
+    ranges[0][0] = None
+    ranges[-1][1] = None
+    return [tuple(bounds) for bounds in ranges]
+
+
+def active_residents_by_building(building_ids):
+    """
+    Return ``{building_id: [(resident_id, user_id), ...]}`` with one active
+    resident per unit: the approved tenant if there is one, otherwise the
+    owner.
+    """
+    residents = (
+        ResidentProfile.objects
+        .filter(unit__building_id__in=building_ids)
+        .filter(Q(resident_type='tenant', status='approved') | Q(resident_type='owner'))
+        .annotate(priority=Case(
+            When(resident_type='tenant', then=Value(0)),
+            default=Value(1),
+            output_field=IntegerField(),
+        ))
+        .order_by('unit_id', 'priority', 'created_at')
+        .distinct('unit_id')
+        .values_list('unit__building_id', 'id', 'user_id')
+    )
+
+    by_building = {}
+    for building_id, resident_id, user_id in residents:
+        by_building.setdefault(building_id, []).append((resident_id, user_id))
+    return by_building
+
+
+def unit_counts(building_ids):
+    return dict(
+        Unit.objects.filter(building_id__in=building_ids)
+        .values('building_id')
+        .annotate(total=Count('id'))
+        .values_list('building_id', 'total')
+    )
+
+
+def monthly_terms(package):
+    """
+    Return ``(monthly_amount, due_day)`` for a recurring package, or None when
+    its details are missing.
+    """
+    relation, due_day_field = RECURRING_PACKAGE_TYPES[package.package_type]
+    details = getattr(package, relation, None)
+    if details is None:
+        return None
+    return details.monthly_amount, getattr(details, due_day_field)
+
+
+def build_monthly_invoices(links, residents, counts, today):
+    """
+    Compute the unsaved invoices for one billing period, entirely in memory.
+    Each unit pays an equal share of the package's monthly amount.
+    """
+    invoices = []
+    for link in links:
+        terms = monthly_terms(link.package)
+        building_residents = residents.get(link.building_id)
+        units_total = counts.get(link.building_id, 0)
+        if terms is None or not building_residents or not units_total:
+            continue
+
+        monthly_amount, due_day = terms
+        amount = (monthly_amount / units_total).quantize(CENT, rounding=ROUND_HALF_UP)
+        due_date = period_due_date(today, due_day)
+
+        for resident_id, _user_id in building_residents:
+            invoices.append(PackageInvoice(
+                package=link.package,
+                building_id=link.building_id,
+                resident_id=resident_id,
+                amount=amount,
+                due_date=due_date,
+                status='pending',
+            ))
+    return invoices
+
+
+def insert_invoices(invoices):
+    """
+    Bulk insert invoices, skipping those that already exist for their
+    (package, resident, due_date), and return only the ones that were new.
+    """
+    created = []
+    for start in range(0, len(invoices), INVOICE_BATCH_SIZE):
+        batch = invoices[start:start + INVOICE_BATCH_SIZE]
+        PackageInvoice.objects.bulk_create(batch, ignore_conflicts=True)
+        # Ids are generated client side, so the rows that made it in are
+        # exactly the ones whose id can be found.
+        inserted = set(
+            PackageInvoice.objects.filter(id__in=[invoice.id for invoice in batch]).values_list('id', flat=True)
+        )
+        created.extend(invoice for invoice in batch if invoice.id in inserted)
+    return created
+
+
+def pending_period_invoices(building_ids, today):
+    """
+    Recurring invoices of this period in the given buildings that are still
+    waiting for a wallet payment.
+    """
+    first_day = date(today.year, today.month, 1)
+    return (
+        PackageInvoice.objects
+        .filter(
+            building_id__in=building_ids,
+            package__is_recurring=True,
+            due_date__gte=first_day,
+            due_date__lte=period_due_date(today, 28),
+            status='pending',
+            transaction__isnull=True,
+        )
+        .select_related('package', 'resident')
+        .order_by('id')
+    )
+
+
+MONTHLY_DEBIT_MESSAGES = {
+    'paid': "تم خصم {amount} جنيه من محفظتك مقابل باقة {package} لشهر {month}",
+    'insufficient': "رصيدك غير كافٍ لدفع فاتورة باقة {package} بمبلغ {amount} جنيه. الرجاء شحن المحفظة.",
+    'no_wallet': "لم يتم العثور على محفظتك، برجاء إنشاء محفظة لتفعيل الدفع التلقائي.",
+}
+
+
+def debit_and_notify(invoices, messages, notify_failure_ids=None, **message_context):
+    """
+    Pay invoices (with ``package`` and ``resident`` loaded) from their
+    residents' wallets in batches and notify the residents with ``messages``,
+    a template per outcome. When ``notify_failure_ids`` is given, failed
+    debits are only notified for invoices in it. Return the outcome counts.
+    """
+    summary = {'paid': 0, 'insufficient': 0, 'no_wallet': 0}
+    for start in range(0, len(invoices), DEBIT_BATCH_SIZE):
+        notifications = []
+        for invoice, outcome in debit_invoices(invoices[start:start + DEBIT_BATCH_SIZE]):
+            summary[outcome] += 1
+            if outcome != 'paid' and notify_failure_ids is not None and invoice.id not in notify_failure_ids:
+                continue
+            notifications.append(Notification(
+                user_id=invoice.resident.user_id,
+                message=messages[outcome].format(
+                    amount=invoice.amount, package=invoice.package.name, **message_context
+                ),
+            ))
+        Notification.objects.bulk_create(notifications)
+    return summary
+
+
+PACKAGE_DEBIT_MESSAGES = {
+    'paid': "تم خصم {amount} جنيه من محفظتك مقابل باقة {package} الجديدة",
+    'insufficient': "رصيدك غير كافٍ لدفع فاتورة باقة {package} الجديدة بمبلغ {amount} جنيه. الرجاء شحن المحفظة.",
+    'no_wallet': "لم يتم العثور على محفظتك، برجاء إنشاء محفظة لتفعيل الدفع التلقائي لباقة {package}.",
+}
+
+
+def package_terms(package):
+    """
+    Return ``(total_amount, due_date)`` for the first invoice of a new
+    package, or None for types that are not invoiced on creation.
+    """
+    if package.package_type == 'utilities':
+        details = getattr(package, 'packageutility', None)
+        if details:
+            return details.monthly_amount, package.start_date.replace(day=min(details.due_day, 28))
+    elif package.package_type == 'fixed':
+        details = getattr(package, 'packagefixed', None)
+        if details:
+            return details.monthly_amount, package.start_date.replace(day=min(details.deduction_day, 28))
+    elif package.package_type == 'misc':
+        details = getattr(package, 'packagemisc', None)
+        if details:
+            return details.total_amount, details.deadline
+    return None
+
+
+def generate_package_invoices(package):
+    """
+    Invoice the active resident of every unit in the buildings linked to a
+    new package, each unit paying an equal share like the monthly run, and
+    auto-debit the invoices of recurring packages. Safe to run more than
+    once.
+    """
+    summary = empty_summary()
+    terms = package_terms(package)
+    if terms is None:
+        return summary
+    total_amount, due_date = terms
+
+    building_ids = set(PackageBuilding.objects.filter(package=package).values_list('building_id', flat=True))
+    counts = unit_counts(building_ids)
+    invoices = []
+    for building_id, building_residents in active_residents_by_building(building_ids).items():
+        units_total = counts.get(building_id, 0)
+        if not units_total:
+            continue
+        amount = (total_amount / units_total).quantize(CENT, rounding=ROUND_HALF_UP)
+        invoices.extend(
+            PackageInvoice(
+                package=package,
+                building_id=building_id,
+                resident_id=resident_id,
+                amount=amount,
+                due_date=due_date,
+                status='pending',
+            )
+            for resident_id, _user_id in building_residents
+        )
+    created = insert_invoices(invoices)
+    summary['created'] = len(created)
+
+    if package.is_recurring:
+        pending = (
+            PackageInvoice.objects
+            .filter(package=package, status='pending', transaction__isnull=True)
+            .select_related('package', 'resident')
+            .order_by('id')
+        )
+        merge_summaries(summary, debit_and_notify(
+            list(pending),
+            PACKAGE_DEBIT_MESSAGES,
+            notify_failure_ids={invoice.id for invoice in created},
+        ))
+
+    return summary
+
+
+def generate_invoices_for_buildings(building_ids, today=None, auto_debit=True):
+    """
+    Generate this period's recurring invoices for a set of buildings and,
+    unless ``auto_debit`` is False, try to pay every pending invoice of the
+    period from the residents' wallets. Return a summary of the counts.
+
+    Safe to run again for the same buildings and period: existing invoices
+    are not duplicated, paid ones are left alone, and failure notifications
+    are only sent for invoices created by this run.
+    """
+    today = today or date.today()
+    summary = empty_summary()
+
+    links = list(recurring_links(building_ids))
+    if not links:
+        return summary
+
+    linked_ids = {link.building_id for link in links}
+    invoices = build_monthly_invoices(
+        links,
+        active_residents_by_building(linked_ids),
+        unit_counts(linked_ids),
+        today,
+    )
+    created = insert_invoices(invoices)
+    summary['created'] = len(created)
+
+    if auto_debit:
+        merge_summaries(summary, debit_and_notify(
+            list(pending_period_invoices(linked_ids, today)),
+            MONTHLY_DEBIT_MESSAGES,
+            notify_failure_ids={invoice.id for invoice in created},
+            month=today.strftime('%B'),
+        ))
+
+    return summary
+
+
+def generate_invoices_for_range(first_id=None, last_id=None, today=None, auto_debit=True):
+    """
+    Run the engine over every building with a recurring package whose id is
+    in [first_id, last_id] (all buildings by default), in batches of
+    BUILDING_BATCH_SIZE buildings.
+    """
+    today = today or date.today()
+    building_ids = recurring_building_ids(first_id, last_id)
+    summary = empty_summary()
+    for start in range(0, len(building_ids), BUILDING_BATCH_SIZE):
+        batch = building_ids[start:start + BUILDING_BATCH_SIZE]
+        merge_summaries(summary, generate_invoices_for_buildings(batch, today, auto_debit))
+    return summary
@@ -0,0 +1,49 @@
+"""
+Background invoice fan-out for newly created packages.
+
+Creating a package only enqueues the job (after the surrounding transaction
+commits); the invoices, wallet debits and notifications for every resident
+of the linked buildings are produced by a Celery worker. The job state is
+kept in the shared cache so that the enqueue is deduplicated and the
+package endpoint can report progress.
+"""
+from django.core.cache import cache
+from django.utils import timezone
+
+JOB_STATUS_TIMEOUT = 60 * 60 * 24
+
+ACTIVE_STATUSES = ('queued', 'running')
+
+
+def _job_key(package_id):
+    return f"package_invoice_job:{package_id}"
+
+
+def get_job_status(package_id):
+    return cache.get(_job_key(package_id))
+
+
+def set_job_status(package_id, status, **extra):
+    cache.set(
+        _job_key(package_id),
+        {'status': status, 'updated_at': timezone.now().isoformat(), **extra},
+        JOB_STATUS_TIMEOUT,
+    )
+
+
+def enqueue_package_invoices(package_id):
+    """
+    Enqueue the invoice fan-out of a package unless one is already queued
+    or running. Return True when a job was enqueued.
+    """
+    from .tasks import generate_package_invoices_task
+
+    queued = {'status': 'queued', 'updated_at': timezone.now().isoformat()}
+    if not cache.add(_job_key(package_id), queued, JOB_STATUS_TIMEOUT):
+        current = get_job_status(package_id)
+        if current and current.get('status') in ACTIVE_STATUSES:
+            return False
+        set_job_status(package_id, 'queued')
+
+    generate_package_invoices_task.delay(str(package_id))
+    return True
@@ -0,0 +1,125 @@
+import time
+import uuid
+from datetime import date
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from apps.accounts.models import User, ResidentProfile
+from apps.buildings.models import Building, Unit
+from apps.packages.billing import generate_invoices_for_buildings
+from apps.packages.models import Package, PackageFixed, PackageBuilding
+from apps.payments.ledger import Transfer, clearing_wallet, post_transfers
+from apps.payments.models import Wallet
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the monthly invoice engine on synthetic portfolios of growing size. '
+        'Every run happens inside a transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10,100,1000,10000', help='Comma separated building counts')
+        parser.add_argument('--units-per-building', type=int, default=4)
+        parser.add_argument('--no-debit', action='store_true', help='Only generate invoices, skip the wallet auto-debit')
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',') if size.strip()]
+        units_per_building = options['units_per_building']
+        auto_debit = not options['no_debit']
+
+        self.stdout.write(f"{'buildings':>10} {'invoices':>10} {'queries':>8} {'seconds':>9} {'ms/invoice':>11}")
+        for size in sizes:
+            try:
+                with transaction.atomic():
+                    building_ids = self.seed(size, units_per_building)
+                    with CaptureQueriesContext(connection) as queries:
+                        started = time.perf_counter()
+                        summary = generate_invoices_for_buildings(building_ids, date.today(), auto_debit)
+                        elapsed = time.perf_counter() - started
+                    raise Rollback(summary, len(queries), elapsed)
+            except Rollback as result:
+                summary, query_count, elapsed = result.args
+
+            created = summary['created']
+            per_invoice = (elapsed * 1000 / created) if created else 0
+            self.stdout.write(f"{size:>10} {created:>10} {query_count:>8} {elapsed:>9.3f} {per_invoice:>11.3f}")
+
+        self.stdout.write(self.style.SUCCESS('Benchmark finished, all synthetic data rolled back'))
+
+    def seed(self, buildings_count, units_per_building):
+        run = uuid.uuid4().hex[:8]
+
+        def make_user(label):
+            return User(
+                email=f'bench-{run}-{label}@example.com',
+                username=f'bench-{run}-{label}',
+                full_name=f'Bench {label}',
+                phone_number=f'b{run}{label}'[:20],
+                national_id=f'n{run}{label}'[:20],
+            )
+
+        union_head = make_user('head')
+        union_head.set_unusable_password()
+        union_head.save()
+
+        buildings = Building.objects.bulk_create([
+            Building(
+                union_head=union_head,
+                name=f'Bench building {index}',
+                address='Benchmark',
+                total_units=units_per_building,
+                total_floors=1,
+                units_per_floor=units_per_building,
+            )
+            for index in range(buildings_count)
+        ])
+
+        units = Unit.objects.bulk_create([
+            Unit(building=building, floor_number=1, apartment_number=str(number))
+            for building in buildings
+            for number in range(units_per_building)
+        ])
+
+        residents = User.objects.bulk_create([make_user(index) for index in range(len(units))])
+        ResidentProfile.objects.bulk_create([
+            ResidentProfile(user=user, unit=unit, resident_type='owner', status='approved')
+            for user, unit in zip(residents, units)
+        ])
+
+        wallets = Wallet.objects.bulk_create([
+            Wallet(user=user, owner_type='user', owner_id=str(user.id)) for user in residents
+        ])
+        # Half of the residents can pay, the other half cannot
+        clearing = clearing_wallet()
+        post_transfers([
+            Transfer(clearing, wallet, Decimal('1000'), f'bench:{run}:{wallet.id}', 'opening')
+            for index, wallet in enumerate(wallets)
+            if index % 2 == 0
+        ])
+
+        package = Package.objects.create(
+            package_type='fixed',
+            name=f'Bench package {run}',
+            is_recurring=True,
+            created_by=union_head,
+            start_date=date.today(),
+        )
+        PackageFixed.objects.create(
+            package=package,
+            monthly_amount=Decimal('400'),
+            deduction_day=1,
+            payment_method='union_head',
+        )
+        PackageBuilding.objects.bulk_create([
+            PackageBuilding(package=package, building=building) for building in buildings
+        ])
+
+        return [building.id for building in buildings]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+# The old generator could bill a resident twice for the same package and
+# period. Keep one invoice per (package, resident, due_date), preferring a
+# paid one, then one linked to a transaction, then the oldest, so the
+# constraint can be created. Nothing references package invoices.
+DEDUPE_INVOICES_SQL = """
+DELETE FROM packages_packageinvoice
+WHERE resident_id IS NOT NULL
+  AND id NOT IN (
+      SELECT DISTINCT ON (package_id, resident_id, due_date) id
+      FROM packages_packageinvoice
+      WHERE resident_id IS NOT NULL
+      ORDER BY package_id, resident_id, due_date,
+               (status = 'paid') DESC, (transaction_id IS NOT NULL) DESC, created_at, id
+  );
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('packages', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunSQL(DEDUPE_INVOICES_SQL, reverse_sql=migrations.RunSQL.noop),
+        migrations.AddConstraint(
+            model_name='packageinvoice',
+            constraint=models.UniqueConstraint(fields=('package', 'resident', 'due_date'), name='unique_package_invoice_per_period'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('buildings', '0001_initial'),
+        ('packages', '0002_packageinvoice_unique_package_invoice_per_period'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='packageinvoice',
+            index=models.Index(fields=['package', 'building', '-created_at'], name='invoice_pkg_bldg_created_idx'),
+        ),
+    ]
@@ -101,6 +101,18 @@ class PackageInvoice(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['package', 'resident', 'due_date'],
+                name='unique_package_invoice_per_period',
+            ),
+        ]
+        indexes = [
+            # Latest invoice per (package, building), see apps.packages.queries
+            models.Index(fields=['package', 'building', '-created_at'], name='invoice_pkg_bldg_created_idx'),
+        ]
+
     def __str__(self):
         return f"{self.package.name} - {self.building.name} - {self.amount}"
 
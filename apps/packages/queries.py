@@ -0,0 +1,153 @@
+"""
+Read-side queries shared by the dashboard and profile endpoints.
+
+Each package row is annotated with the fields of its latest invoice through
+correlated subqueries (or, per resident, picked with ``DISTINCT ON``), so a
+whole listing is a fixed number of SQL statements whatever the number of
+packages, instead of ``exists()`` + ``first()`` per package.
+"""
+from django.db.models import OuterRef, Subquery
+
+from .models import Package, PackageBuilding, PackageInvoice
+
+PACKAGE_SUMMARY_FIELDS = ('id', 'name', 'description', 'is_recurring', 'package_type', 'created_at')
+
+LATEST_INVOICE_FIELDS = {
+    'latest_invoice_status': 'status',
+    'latest_invoice_amount': 'amount',
+    'latest_invoice_due_date': 'due_date',
+}
+
+
+def annotate_latest_invoice(queryset, invoices):
+    """
+    Annotate ``queryset`` with ``latest_invoice_status``, ``_amount`` and
+    ``_due_date`` taken from the newest row of ``invoices``, which must
+    already be correlated to the outer query with OuterRef.
+    """
+    invoices = invoices.order_by('-created_at', '-id')
+    return queryset.annotate(**{
+        name: Subquery(invoices.values(field)[:1])
+        for name, field in LATEST_INVOICE_FIELDS.items()
+    })
+
+
+def package_summary(package, source):
+    """
+    Dashboard entry of a package; ``source`` carries the latest invoice
+    annotations. Packages without invoices show as active with no amount.
+    """
+    status = source.latest_invoice_status
+    return {
+        'id': package.id,
+        'name': package.name,
+        'status': status or 'active',
+        'amount': source.latest_invoice_amount if status else 0,
+        'due_date': source.latest_invoice_due_date if status else None,
+        'description': package.description,
+        'is_recurring': package.is_recurring,
+        'package_type': package.package_type,
+        'created_at': package.created_at,
+    }
+
+
+def building_packages(buildings):
+    """
+    Return ``{building_id: [package summary, ...]}`` with the latest invoice
+    of each (package, building) pair, in one query.
+    """
+    links = annotate_latest_invoice(
+        PackageBuilding.objects.filter(building__in=buildings)
+        .select_related('package')
+        .only('building_id', *(f'package__{field}' for field in PACKAGE_SUMMARY_FIELDS))
+        .order_by('building_id', 'package__created_at', 'package_id'),
+        PackageInvoice.objects.filter(package=OuterRef('package_id'), building=OuterRef('building_id')),
+    )
+    packages = {}
+    for link in links:
+        packages.setdefault(link.building_id, []).append(package_summary(link.package, link))
+    return packages
+
+
+def personal_packages(user, exclude_buildings):
+    """
+    Packages created by ``user`` and not linked to any of
+    ``exclude_buildings``, with their latest invoice overall.
+    """
+    packages = annotate_latest_invoice(
+        Package.objects.filter(created_by=user)
+        .exclude(packagebuilding__building__in=exclude_buildings)
+        .only(*PACKAGE_SUMMARY_FIELDS)
+        .order_by('created_at', 'id'),
+        PackageInvoice.objects.filter(package=OuterRef('pk')),
+    )
+    return [package_summary(package, package) for package in packages]
+
+
+def latest_resident_invoices(residents, statuses=('pending', 'paid')):
+    """
+    Return ``{(package_id, resident_id): invoice}`` holding the newest
+    invoice of each package for the given residents, with the package
+    loaded, in one ``DISTINCT ON`` query.
+    """
+    invoices = (
+        PackageInvoice.objects.filter(resident__in=residents, status__in=statuses)
+        .select_related('package')
+        .order_by('package_id', 'resident_id', '-created_at', '-id')
+        .distinct('package_id', 'resident_id')
+    )
+    return {(invoice.package_id, invoice.resident_id): invoice for invoice in invoices}
+
+
+def resident_package_entry(invoice, package_type):
+    package = invoice.package
+    return {
+        'id': package.id,
+        'name': package.name,
+        'type': package_type,
+        'status': invoice.status,
+        'amount': invoice.amount,
+        'due_date': invoice.due_date,
+        'description': package.description,
+        'is_recurring': package.is_recurring,
+    }
+
+
+def resident_packages(user, resident_profiles):
+    """
+    Return ``{resident_id: (building_packages, personal_packages)}`` for the
+    given profiles (with ``unit`` loaded): the building's packages and the
+    packages ``user`` created, each listed when the resident has a pending
+    or paid invoice for it. Three queries whatever the number of profiles
+    and packages.
+    """
+    invoices = latest_resident_invoices(resident_profiles)
+
+    building_ids = {profile.unit.building_id for profile in resident_profiles if profile.unit}
+    packages_by_building = {}
+    for building_id, package_id in (
+        PackageBuilding.objects.filter(building_id__in=building_ids)
+        .order_by('id')
+        .values_list('building_id', 'package_id')
+    ):
+        packages_by_building.setdefault(building_id, []).append(package_id)
+
+    personal_package_ids = list(
+        Package.objects.filter(created_by=user).order_by('created_at', 'id').values_list('id', flat=True)
+    )
+
+    packages = {}
+    for profile in resident_profiles:
+        building_id = profile.unit.building_id if profile.unit else None
+        building_entries = [
+            resident_package_entry(invoices[(package_id, profile.id)], 'building')
+            for package_id in packages_by_building.get(building_id, [])
+            if (package_id, profile.id) in invoices
+        ]
+        personal_entries = [
+            resident_package_entry(invoices[(package_id, profile.id)], 'personal')
+            for package_id in personal_package_ids
+            if (package_id, profile.id) in invoices
+        ]
+        packages[profile.id] = (building_entries, personal_entries)
+    return packages
@@ -1,99 +1,90 @@
+import logging
 from datetime import date
-from django.utils import timezone
-from apps.packages.models import Package, PackageBuilding, PackageInvoice
-from apps.payments.models import Wallet, Transaction, Invoice
-from apps.notifications.models import Notification
-from django.db import transaction as db_transaction
-from celery import shared_task
+
+from celery import chord, shared_task
+from django.conf import settings
+from django.db import InterfaceError, OperationalError
+
+from .billing import (
+    empty_summary, merge_summaries, recurring_building_ids, shard_ranges,
+    generate_invoices_for_range, generate_package_invoices,
+)
+from .jobs import set_job_status
+
+logger = logging.getLogger(__name__)
+
+INVOICE_SHARD_COUNT = getattr(settings, 'INVOICE_SHARD_COUNT', 8)
 
 
 @shared_task
-def generate_monthly_invoices():
+def generate_monthly_invoices(shards=None):
     """
     توليد فواتير الباقات الشهرية لجميع المباني والسكان
     + خصم تلقائي من المحفظة إن أمكن
     + تخصيص الفواتير للمستأجر إذا كان موجودًا ومفعلًا، وإلا للمالك
+
+    Coordinator: splits the buildings into contiguous id ranges and fans
+    them out to generate_invoice_shard workers through a chord, whose
+    callback collects the summary. Returns the period, the number of
+    shards and the chord id (None when there was nothing to bill).
+    """
+    period = date.today().isoformat()
+    ranges = shard_ranges(recurring_building_ids(), shards or INVOICE_SHARD_COUNT)
+    if not ranges:
+        return {'period': period, 'shards': 0, 'chord_id': None}
+
+    header = [generate_invoice_shard.s(first_id, last_id, period) for first_id, last_id in ranges]
+    result = chord(header)(summarize_invoice_shards.s(period))
+    logger.info(f"Monthly invoices for {period}: {len(ranges)} shards dispatched ({result.id})")
+    return {'period': period, 'shards': len(ranges), 'chord_id': result.id}
+
+
+@shared_task(
+    acks_late=True,
+    autoretry_for=(OperationalError, InterfaceError),
+    retry_backoff=True,
+    max_retries=5,
+)
+def generate_invoice_shard(first_id, last_id, period):
+    """
+    Generate and auto-debit the invoices of one building id range.
+    Idempotent, so a retried or redelivered shard only finishes what is left.
     """
-    today = date.today()
-    current_month = today.month
-    current_year = today.year
-
-    active_packages = Package.objects.filter(is_recurring=True)
-
-    for pkg in active_packages:
-        package_buildings = PackageBuilding.objects.filter(package=pkg)
-
-        for package_building in package_buildings:
-            building = package_building.building
-            # Get all units in the building
-            units = building.units.all()
-
-            for unit in units:
-                # Determine the active resident for this unit
-                # Priority: approved tenant > owner
-                active_resident = None
-                if hasattr(unit, 'residents') and unit.residents.filter(resident_type='tenant', status='approved').exists():
-                    active_resident = unit.residents.filter(resident_type='tenant', status='approved').first()
-                elif hasattr(unit, 'residents') and unit.residents.filter(resident_type='owner').exists():
-                    active_resident = unit.residents.filter(resident_type='owner').first()
-
-                if not active_resident:
-                    continue  # Skip if no active resident
-
-                # Determine amount based on package type
-                if pkg.package_type == 'utilities':
-                    utility = pkg.packageutility
-                    amount = utility.monthly_amount / len(units) if len(units) else 0
-                    due_day = utility.due_day
-                elif pkg.package_type == 'fixed':
-                    fixed = pkg.packagefixed
-                    amount = fixed.monthly_amount / len(units) if len(units) else 0
-                    due_day = fixed.deduction_day
-                else:
-                    continue  # Skip non-recurring or unsupported types
-
-                package_invoice, created = PackageInvoice.objects.get_or_create(
-                    package=pkg,
-                    building=building,
-                    resident=active_resident,
-                    due_date=date(current_year, current_month, min(due_day, 28)),
-                    defaults={"amount": amount, "status": "pending"},
-                )
-
-                if created:
-                    # محاولة خصم المبلغ تلقائيًا من محفظة الساكن النشط
-                    try:
-                        with db_transaction.atomic():
-                            wallet = Wallet.objects.select_for_update().get(owner_type='user', owner_id=active_resident.user.id)
-                            if wallet.current_balance >= amount:
-                                wallet.current_balance -= amount
-                                wallet.save()
-
-                                Transaction.objects.create(
-                                    wallet=wallet,
-                                    amount=amount,
-                                    method="wallet",
-                                    status="completed",
-                                )
-
-                                package_invoice.status = "paid"
-                                package_invoice.payment_method = "wallet"
-                                package_invoice.transaction = Transaction.objects.filter(wallet=wallet).last()
-                                package_invoice.save()
-
-                                Notification.objects.create(
-                                    user=active_resident.user,
-                                    message=f"تم خصم {amount} جنيه من محفظتك مقابل باقة {pkg.name} لشهر {today.strftime('%B')}",
-                                )
-
-                            else:
-                                Notification.objects.create(
-                                    user=active_resident.user,
-                                    message=f"رصيدك غير كافٍ لدفع فاتورة باقة {pkg.name} بمبلغ {amount} جنيه. الرجاء شحن المحفظة.",
-                                )
-
-                    except Wallet.DoesNotExist:
-                        Notification.objects.create(
-                            user=active_resident.user,
-                            message=f"لم يتم العثور على محفظتك، برجاء إنشاء محفظة لتفعيل الدفع التلقائي.",
-                        )
+    return generate_invoices_for_range(first_id, last_id, date.fromisoformat(period))
+
+
+@shared_task
+def summarize_invoice_shards(results, period):
+    summary = empty_summary()
+    for result in results:
+        merge_summaries(summary, result)
+    logger.info(f"Monthly invoices for {period} done: {summary}")
+    return summary
+
+
+@shared_task(
+    acks_late=True,
+    autoretry_for=(OperationalError, InterfaceError),
+    retry_backoff=True,
+    max_retries=5,
+)
+def generate_package_invoices_task(package_id):
+    """
+    Invoice the residents of a newly created package's buildings and
+    auto-debit recurring ones. Idempotent, so retries are safe.
+    """
+    from .models import Package
+
+    package = Package.objects.filter(pk=package_id).first()
+    if package is None:
+        set_job_status(package_id, 'failed', error='Package not found')
+        return empty_summary()
+
+    set_job_status(package_id, 'running')
+    try:
+        summary = generate_package_invoices(package)
+    except Exception as e:
+        set_job_status(package_id, 'failed', error=str(e))
+        raise
+    set_job_status(package_id, 'done', summary=summary)
+    return summary
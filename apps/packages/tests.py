@@ -0,0 +1,256 @@
+import datetime
+from decimal import Decimal
+from unittest import mock
+
+from django.test import TestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.accounts.models import ResidentProfile
+from apps.accounts.factories import make_user
+from apps.accounts.views.auth import get_resident_profile_data
+from apps.buildings.models import Building, Unit
+from . import jobs, tasks
+from .billing import (
+    generate_invoices_for_buildings, generate_package_invoices, insert_invoices, recurring_building_ids, shard_ranges,
+)
+from .models import Package, PackageBuilding, PackageFixed, PackageInvoice
+
+
+def make_package(created_by, building=None):
+    package = Package.objects.create(
+        package_type='fixed', name='Maintenance', created_by=created_by, start_date=datetime.date(2026, 1, 1),
+    )
+    PackageFixed.objects.create(package=package, monthly_amount=Decimal('100'), deduction_day=1, payment_method='union_head')
+    if building is not None:
+        PackageBuilding.objects.create(package=package, building=building)
+    return package
+
+
+def make_building(units):
+    building = Building.objects.create(
+        union_head=make_user(), name='Building', address='Cairo',
+        total_units=units, total_floors=1, units_per_floor=units,
+    )
+    return building, [
+        Unit.objects.create(building=building, floor_number=1, apartment_number=str(number + 1))
+        for number in range(units)
+    ]
+
+
+def make_recurring_package(building):
+    package = make_package(building.union_head, building)
+    Package.objects.filter(pk=package.pk).update(is_recurring=True)
+    return package
+
+
+def bill(package, resident, months):
+    """
+    One invoice per month, the older ones paid and the latest pending.
+    """
+    for month in range(1, months + 1):
+        PackageInvoice.objects.create(
+            package=package, building=resident.unit.building, resident=resident, amount=100,
+            due_date=datetime.date(2026, month, 1), status='pending' if month == months else 'paid',
+        )
+
+
+class ResidentProfileDataQueryTests(TestCase):
+    # Profiles with units and buildings, latest invoices with packages,
+    # building package links, and the packages the resident created
+    EXPECTED_QUERIES = 4
+
+    def make_resident(self, user, packages, personal, months):
+        building = Building.objects.create(
+            union_head=make_user(), name='Building', address='Cairo',
+            total_units=1, total_floors=1, units_per_floor=1,
+        )
+        unit = Unit.objects.create(building=building, floor_number=1, apartment_number='1')
+        resident = ResidentProfile.objects.create(user=user, unit=unit, status='approved')
+        for _ in range(packages):
+            bill(make_package(building.union_head, building), resident, months)
+        for _ in range(personal):
+            bill(make_package(user), resident, months)
+
+    def fetch(self, user):
+        request = APIRequestFactory().get('/api/accounts/profile/resident-data/')
+        force_authenticate(request, user=user)
+        with self.assertNumQueries(self.EXPECTED_QUERIES):
+            response = get_resident_profile_data(request)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_query_count_does_not_grow_with_packages_and_invoices(self):
+        single = make_user()
+        self.make_resident(single, packages=1, personal=0, months=1)
+        data = self.fetch(single)
+        self.assertEqual(len(data[0]['building_packages']), 1)
+
+        busy = make_user()
+        self.make_resident(busy, packages=3, personal=2, months=4)
+        self.make_resident(busy, packages=2, personal=0, months=3)
+        data = self.fetch(busy)
+        self.assertEqual(len(data), 2)
+        self.assertEqual(
+            sorted((len(entry['building_packages']), len(entry['personal_packages'])) for entry in data),
+            [(2, 0), (3, 2)],
+        )
+        for entry in data:
+            for package in entry['building_packages'] + entry['personal_packages']:
+                self.assertEqual(package['status'], 'pending')
+
+
+class PackageInvoiceGenerationTests(TestCase):
+    def test_new_package_bills_one_active_resident_per_unit(self):
+        building = Building.objects.create(
+            union_head=make_user(), name='Building', address='Cairo',
+            total_units=2, total_floors=1, units_per_floor=2,
+        )
+        first = Unit.objects.create(building=building, floor_number=1, apartment_number='1')
+        second = Unit.objects.create(building=building, floor_number=1, apartment_number='2')
+        owner = ResidentProfile.objects.create(user=make_user(), unit=first, resident_type='owner', status='approved')
+        tenant = ResidentProfile.objects.create(user=make_user(), unit=first, resident_type='tenant', status='approved')
+        ResidentProfile.objects.create(user=make_user(), unit=first, resident_type='tenant', status='rejected')
+        ResidentProfile.objects.create(user=make_user(), unit=second, resident_type='tenant', status='pending')
+        package = make_package(building.union_head, building)
+
+        summary = generate_package_invoices(package)
+        self.assertEqual(summary['created'], 1)
+        invoice = PackageInvoice.objects.get(package=package)
+        # The approved tenant pays for the unit, and each unit owes half
+        self.assertEqual(invoice.resident, tenant)
+        self.assertEqual(invoice.amount, 50)
+        self.assertFalse(PackageInvoice.objects.filter(resident=owner).exists())
+
+        # Running it again changes nothing
+        self.assertEqual(generate_package_invoices(package)['created'], 0)
+        self.assertEqual(PackageInvoice.objects.filter(package=package).count(), 1)
+
+
+class MonthlyInvoiceDispatchTests(TestCase):
+    def test_dispatch_always_returns_the_same_shape(self):
+        self.assertEqual(
+            tasks.generate_monthly_invoices(),
+            {'period': datetime.date.today().isoformat(), 'shards': 0, 'chord_id': None},
+        )
+
+        building, _units = make_building(units=1)
+        make_recurring_package(building)
+        with mock.patch.object(tasks, 'chord') as chord:
+            chord.return_value.return_value.id = 'chord-1'
+            result = tasks.generate_monthly_invoices(shards=4)
+        self.assertEqual(result, {'period': datetime.date.today().isoformat(), 'shards': 1, 'chord_id': 'chord-1'})
+        self.assertEqual(len(chord.call_args.args[0]), 1)
+
+
+class MonthlyInvoiceEngineTests(TestCase):
+    today = datetime.date(2026, 10, 5)
+
+    def setUp(self):
+        self.building, (first, second, _vacant) = make_building(units=3)
+        ResidentProfile.objects.create(user=make_user(), unit=first, resident_type='owner', status='approved')
+        self.tenant = ResidentProfile.objects.create(
+            user=make_user(), unit=first, resident_type='tenant', status='approved',
+        )
+        self.owner = ResidentProfile.objects.create(user=make_user(), unit=second, resident_type='owner', status='approved')
+        self.package = make_recurring_package(self.building)
+
+    def run_engine(self):
+        return generate_invoices_for_buildings([self.building.id], self.today, auto_debit=False)
+
+    def test_running_a_period_twice_creates_no_duplicates(self):
+        self.assertEqual(self.run_engine()['created'], 2)
+        self.assertEqual(self.run_engine()['created'], 0)
+
+        invoices = PackageInvoice.objects.filter(package=self.package)
+        self.assertEqual(invoices.count(), 2)
+        # The approved tenant pays for their unit; every unit owes a third
+        self.assertEqual({invoice.resident for invoice in invoices}, {self.tenant, self.owner})
+        self.assertEqual({invoice.amount for invoice in invoices}, {Decimal('33.33')})
+        self.assertEqual({invoice.due_date for invoice in invoices}, {datetime.date(2026, 10, 1)})
+
+    def test_insert_returns_only_the_rows_that_were_new(self):
+        self.run_engine()
+        existing = PackageInvoice.objects.get(resident=self.tenant)
+        duplicate = PackageInvoice(
+            package=self.package, building=self.building, resident=self.tenant,
+            amount=existing.amount, due_date=existing.due_date, status='pending',
+        )
+        fresh = PackageInvoice(
+            package=self.package, building=self.building, resident=self.tenant,
+            amount=existing.amount, due_date=datetime.date(2026, 11, 1), status='pending',
+        )
+        self.assertEqual(insert_invoices([duplicate, fresh]), [fresh])
+        self.assertEqual(PackageInvoice.objects.filter(resident=self.tenant).count(), 2)
+
+
+class InvoiceShardTests(TestCase):
+    def test_ranges_cover_every_id_once_and_are_open_at_the_ends(self):
+        self.assertEqual(shard_ranges([1, 2, 3, 4, 5], 2), [(None, '3'), ('4', None)])
+        self.assertEqual(shard_ranges([1, 2], 8), [(None, '1'), ('2', None)])
+        self.assertEqual(shard_ranges([7], 3), [(None, None)])
+        self.assertEqual(shard_ranges([], 3), [])
+
+    def test_running_shards_twice_bills_each_building_once(self):
+        buildings = []
+        for _ in range(3):
+            building, (unit,) = make_building(units=1)
+            ResidentProfile.objects.create(user=make_user(), unit=unit, resident_type='owner', status='approved')
+            make_recurring_package(building)
+            buildings.append(building)
+
+        period = datetime.date.today().isoformat()
+        ranges = shard_ranges(recurring_building_ids(), 2)
+        self.assertEqual(len(ranges), 2)
+        first_run = [tasks.generate_invoice_shard(first_id, last_id, period) for first_id, last_id in ranges]
+        # A redelivered shard finishes nothing new
+        second_run = [tasks.generate_invoice_shard(first_id, last_id, period) for first_id, last_id in ranges]
+
+        self.assertEqual(tasks.summarize_invoice_shards(first_run, period)['created'], 3)
+        self.assertEqual(tasks.summarize_invoice_shards(second_run, period)['created'], 0)
+        self.assertEqual(
+            sorted(PackageInvoice.objects.values_list('building_id', flat=True)),
+            sorted(building.id for building in buildings),
+        )
+
+
+class PackageInvoiceJobTests(TestCase):
+    def setUp(self):
+        self.building, (unit,) = make_building(units=1)
+        self.resident = ResidentProfile.objects.create(
+            user=make_user(), unit=unit, resident_type='owner', status='approved',
+        )
+
+    @mock.patch.object(tasks.generate_package_invoices_task, 'delay')
+    def test_creating_a_package_enqueues_one_job_after_commit(self, delay):
+        with self.captureOnCommitCallbacks(execute=True):
+            package = make_package(self.building.union_head, self.building)
+            delay.assert_not_called()
+        delay.assert_called_once_with(str(package.pk))
+        self.assertEqual(jobs.get_job_status(package.pk)['status'], 'queued')
+
+        # Already queued: a second enqueue is a no-op
+        self.assertFalse(jobs.enqueue_package_invoices(package.pk))
+        self.assertEqual(delay.call_count, 1)
+
+    def test_job_invoices_the_package_and_reports_its_summary(self):
+        with mock.patch.object(tasks.generate_package_invoices_task, 'delay'):
+            with self.captureOnCommitCallbacks(execute=True):
+                package = make_package(self.building.union_head, self.building)
+
+        summary = tasks.generate_package_invoices_task(str(package.pk))
+        self.assertEqual(summary['created'], 1)
+        self.assertEqual(PackageInvoice.objects.get(package=package).resident, self.resident)
+        job = jobs.get_job_status(package.pk)
+        self.assertEqual(job['status'], 'done')
+        self.assertEqual(job['summary'], summary)
+
+        # A finished job can be enqueued again, and re-running it is harmless
+        with mock.patch.object(tasks.generate_package_invoices_task, 'delay') as delay:
+            self.assertTrue(jobs.enqueue_package_invoices(package.pk))
+        delay.assert_called_once()
+        self.assertEqual(tasks.generate_package_invoices_task(str(package.pk))['created'], 0)
+
+    def test_missing_package_marks_the_job_failed(self):
+        missing = '00000000-0000-0000-0000-000000000000'
+        tasks.generate_package_invoices_task(missing)
+        self.assertEqual(jobs.get_job_status(missing)['status'], 'failed')
@@ -3,11 +3,14 @@ from rest_framework import viewsets, filters, status
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from django.db import transaction as db_transaction
+from django.db.models import Count, Q
 
 from .models import Package, PackageBuilding, PackageInvoice
 from .serializers import PackageSerializer
 from apps.packages.tasks import generate_monthly_invoices
-from apps.core.permissions import DynamicRolePermission
+from .jobs import get_job_status
+from apps.core.permissions import DynamicRolePermission, get_user_roles
 
 class PackageViewSet(viewsets.ModelViewSet):
     permission_classes = [DynamicRolePermission]
@@ -22,19 +25,7 @@ class PackageViewSet(viewsets.ModelViewSet):
         user = self.request.user
         queryset = Package.objects.all().select_related("created_by")
 
-        # Get roles from database
-        roles = [ur.role.name for ur in user.userrole_set.all()]
-
-        # Add implied roles based on profiles
-        from apps.accounts.models import ResidentProfile
-        from apps.buildings.models import Building
-        is_resident = ResidentProfile.objects.filter(user=user).exists()
-        is_union_head = Building.objects.filter(union_head=user).exists()
-
-        if is_resident and 'resident' not in roles:
-            roles.append('resident')
-        if is_union_head and 'union_head' not in roles:
-            roles.append('union_head')
+        roles = get_user_roles(user)
 
         # ✅ فلترة حسب building_id لو متبعت في الـ request
         building_id = self.request.query_params.get('building_id')
@@ -78,21 +69,15 @@ class PackageViewSet(viewsets.ModelViewSet):
 
     def perform_create(self, serializer):
         user = self.request.user
+        roles = get_user_roles(user)
 
-        # Get roles from database
-        roles = [ur.role.name for ur in user.userrole_set.all()]
-
-        # Add implied roles based on profiles
-        from apps.accounts.models import ResidentProfile
-        from apps.buildings.models import Building
-        is_resident = ResidentProfile.objects.filter(user=user).exists()
-        is_union_head = Building.objects.filter(union_head=user).exists()
-
-        if is_resident and 'resident' not in roles:
-            roles.append('resident')
-        if is_union_head and 'union_head' not in roles:
-            roles.append('union_head')
+        # Everything below commits together, so the invoice job enqueued by
+        # the post_save signal only starts once the buildings are linked.
+        with db_transaction.atomic():
+            package = self._create_package(serializer, user, roles)
+        return package
 
+    def _create_package(self, serializer, user, roles):
         package = serializer.save(created_by=user)
 
         # Staff/Admins behave like Union Heads
@@ -219,6 +204,20 @@ class PackageViewSet(viewsets.ModelViewSet):
         # حفظ الإشعارات دفعة واحدة
         Notification.objects.bulk_create(notifications)
 
+    @action(detail=True, methods=["get"], url_path="invoice-status")
+    def invoice_status(self, request, pk=None):
+        """
+        Progress of the background invoice generation for this package,
+        plus the invoices issued so far.
+        """
+        package = self.get_object()
+        job = get_job_status(package.pk) or {'status': 'unknown'}
+        invoices = PackageInvoice.objects.filter(package=package).aggregate(
+            total=Count('id'),
+            paid=Count('id', filter=Q(status='paid')),
+        )
+        return Response({'package': package.pk, **job, 'invoices': invoices})
+
     @action(detail=False, methods=["post"], permission_classes=[IsAuthenticated])
     def generate_invoices(self, request):
         """
@@ -238,19 +237,7 @@ def invoice_history(request):
     user = request.user
     invoices = PackageInvoice.objects.none()
 
-    # Get roles from database
-    roles = [ur.role.name for ur in user.userrole_set.all()]
-
-    # Add implied roles based on profiles
-    from apps.accounts.models import ResidentProfile
-    from apps.buildings.models import Building
-    is_resident = ResidentProfile.objects.filter(user=user).exists()
-    is_union_head = Building.objects.filter(union_head=user).exists()
-
-    if is_resident and 'resident' not in roles:
-        roles.append('resident')
-    if is_union_head and 'union_head' not in roles:
-        roles.append('union_head')
+    roles = get_user_roles(user)
 
     # لو المستخدم ساكن
     if 'resident' in roles:
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Wallet, WalletTransaction, SubscriptionPlan, UserSubscription, Invoice, Transaction
+from .models import Wallet, WalletTransaction, SubscriptionPlan, UserSubscription, Invoice, Transaction, LedgerEntry, WalletSnapshot, IdempotencyKey, WebhookEvent
 
 # Register models for admin
 admin.site.register(Wallet)
@@ -8,3 +8,7 @@ admin.site.register(SubscriptionPlan)
 admin.site.register(UserSubscription)
 admin.site.register(Invoice)
 admin.site.register(Transaction)
+admin.site.register(LedgerEntry)
+admin.site.register(WalletSnapshot)
+admin.site.register(IdempotencyKey)
+admin.site.register(WebhookEvent)
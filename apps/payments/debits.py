@@ -0,0 +1,94 @@
+"""
+Batched wallet auto-debit for package invoices.
+
+A batch is paid in one database transaction with a constant number of
+round trips, whatever its size:
+
+1. lock the invoices that are still unpaid,
+2. lock every affected wallet in a single ``SELECT ... FOR UPDATE`` ordered
+   by id, so two batches touching the same wallets always lock them in the
+   same order and cannot deadlock; the lock only serialises the funds
+   check, wallet rows are never written,
+3. read the ledger balances and apply the debits in memory,
+4. bulk insert the Transactions and ledger entries (wallet -> clearing)
+   and bulk update the invoices.
+"""
+from django.db import transaction as db_transaction
+from django.utils import timezone
+
+from .ledger import Transfer, clearing_wallet, post_transfers, wallet_balances
+from .models import Wallet, Transaction
+
+DEBIT_BATCH_SIZE = 500
+
+
+def debit_invoices(invoices):
+    """
+    Pay a batch of PackageInvoices (with ``resident`` loaded) from their
+    residents' wallets.
+
+    Return ``[(invoice, outcome), ...]`` where outcome is one of 'paid',
+    'insufficient' or 'no_wallet'. Invoices that were paid by someone else
+    in the meantime are left out.
+    """
+    from apps.packages.models import PackageInvoice
+
+    if not invoices:
+        return []
+
+    with db_transaction.atomic():
+        unpaid_ids = set(
+            PackageInvoice.objects.select_for_update(of=('self',))
+            .filter(id__in=[invoice.id for invoice in invoices], status='pending', transaction__isnull=True)
+            .order_by('id')
+            .values_list('id', flat=True)
+        )
+        invoices = [invoice for invoice in invoices if invoice.id in unpaid_ids]
+
+        user_ids = {invoice.resident.user_id for invoice in invoices}
+        wallets = {
+            wallet.user_id: wallet
+            for wallet in Wallet.objects.select_for_update()
+            .filter(user_id__in=user_ids)
+            .order_by('id')
+        }
+        balances = wallet_balances(wallet.pk for wallet in wallets.values())
+
+        results = []
+        paid = []
+        for invoice in invoices:
+            wallet = wallets.get(invoice.resident.user_id)
+            if wallet is None:
+                results.append((invoice, 'no_wallet'))
+            elif balances[wallet.pk] >= invoice.amount:
+                balances[wallet.pk] -= invoice.amount
+                paid.append((invoice, wallet))
+                results.append((invoice, 'paid'))
+            else:
+                results.append((invoice, 'insufficient'))
+
+        if paid:
+            now = timezone.now()
+            transactions = Transaction.objects.bulk_create([
+                Transaction(wallet=wallet, amount=invoice.amount, method="wallet", status="completed")
+                for invoice, wallet in paid
+            ])
+            clearing = clearing_wallet()
+            transfers = []
+            for (invoice, wallet), transaction in zip(paid, transactions):
+                invoice.transaction = transaction
+                invoice.status = "paid"
+                invoice.payment_method = "wallet"
+                invoice.updated_at = now
+                transfers.append(Transfer(
+                    wallet, clearing, invoice.amount, f"package_invoice:{invoice.id}", 'package_invoice',
+                    transaction=transaction,
+                ))
+
+            post_transfers(transfers)
+            PackageInvoice.objects.bulk_update(
+                [invoice for invoice, _ in paid],
+                ['status', 'payment_method', 'transaction', 'updated_at'],
+            )
+
+    return results
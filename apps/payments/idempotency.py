@@ -0,0 +1,178 @@
+"""
+Idempotency keys for money-moving endpoints.
+
+Clients send an ``Idempotency-Key`` header with a payment. The first
+request claims the key (an IdempotencyKey row in ``pending`` state,
+committed before the view runs), executes, and stores its response. A
+retry with the same key and body gets the stored response back without
+touching wallets; a retry while the first attempt is still running gets
+409, and reusing a key for a different body gets 422. Server errors
+release the key so the client can retry for real, except when a gateway
+call may have gone through (GatewayOutcomeUnknown, 504): the key is then
+kept in the ``unknown`` state and retries replay the 504, so a timed-out
+bill payment is never sent a second time under the same key.
+
+A pending key is never taken over, however old: its first attempt may
+still be waiting on a slow gateway, and running it again could move the
+money twice. It answers 409 until purge_idempotency_keys removes it.
+
+Requests without the header run as before. The decorator wraps DRF
+views and plain async views alike.
+"""
+import functools
+import hashlib
+import json
+from datetime import timedelta
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction as db_transaction
+from django.http import JsonResponse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+from .services.breaker import GatewayOutcomeUnknown
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+# Keys are kept this long before purge_idempotency_keys removes them
+IDEMPOTENCY_KEY_TTL = getattr(settings, 'IDEMPOTENCY_KEY_TTL', 60 * 60 * 24)
+
+
+def request_hash(request):
+    if hasattr(request, 'data'):
+        body = json.dumps(request.data, sort_keys=True, cls=DjangoJSONEncoder)
+    else:
+        body = request.body.decode()
+    return hashlib.sha256(f'{request.method} {request.path}\n{body}'.encode()).hexdigest()
+
+
+def claim_key(user, endpoint, key, fingerprint):
+    """
+    Return ``(record, None)`` when this request owns the key, or
+    ``(None, (status, body, replayed))`` describing the response to send
+    instead.
+    """
+    try:
+        with db_transaction.atomic():
+            return IdempotencyKey.objects.create(
+                user=user, endpoint=endpoint, key=key, request_hash=fingerprint
+            ), None
+    except IntegrityError:
+        pass
+
+    in_progress = (status.HTTP_409_CONFLICT, {"error": "Request in progress, retry later."}, False)
+    record = IdempotencyKey.objects.filter(user=user, endpoint=endpoint, key=key).first()
+    if record is None:
+        # Released between our insert and this read: let the client retry
+        return None, in_progress
+    if record.request_hash != fingerprint:
+        return None, (
+            status.HTTP_422_UNPROCESSABLE_ENTITY,
+            {"error": "Idempotency-Key was already used with a different request."},
+            False,
+        )
+    if record.status in ('completed', 'unknown'):
+        return None, (record.response_status, record.response_body, True)
+    return None, in_progress
+
+
+def begin(request, endpoint):
+    """
+    Return ``(record, outcome)`` as claim_key does, or ``(None, None)``
+    when the request carries no key and runs unguarded.
+    """
+    key = request.headers.get(IDEMPOTENCY_HEADER)
+    if not key or not request.user.is_authenticated:
+        return None, None
+    if len(key) > 255:
+        return None, (status.HTTP_400_BAD_REQUEST, {"error": "Idempotency-Key is too long."}, False)
+    return claim_key(request.user, endpoint, key, request_hash(request))
+
+
+def finish(record, status_code, body):
+    """
+    Store the response of a guarded request, or release the key after a
+    server error so the client can retry. A 504 is only sent when the
+    outcome of a gateway call is unknown, so it is stored instead.
+    """
+    outcome_unknown = status_code == GatewayOutcomeUnknown.status_code
+    if status_code >= 500 and not outcome_unknown:
+        record.delete()
+        return
+    record.status = 'unknown' if outcome_unknown else 'completed'
+    record.response_status = status_code
+    record.response_body = body
+    record.completed_at = timezone.now()
+    record.save(update_fields=['status', 'response_status', 'response_body', 'completed_at'])
+
+
+def idempotent(endpoint):
+    """
+    Make a view replay its response for repeated ``Idempotency-Key``
+    headers from the same user. Works on DRF function views and viewset
+    actions, and on plain async Django views returning JsonResponse.
+    """
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @functools.wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                record, outcome = await sync_to_async(begin)(request, endpoint)
+                if outcome is not None:
+                    status_code, body, replayed = outcome
+                    response = JsonResponse(body, status=status_code, safe=False)
+                    if replayed:
+                        response['Idempotent-Replayed'] = 'true'
+                    return response
+                if record is None:
+                    return await view(request, *args, **kwargs)
+
+                try:
+                    response = await view(request, *args, **kwargs)
+                except GatewayOutcomeUnknown as e:
+                    await sync_to_async(finish)(record, e.status_code, {"detail": str(e.detail)})
+                    raise
+                except Exception:
+                    await record.adelete()
+                    raise
+                await sync_to_async(finish)(record, response.status_code, json.loads(response.content))
+                return response
+            return async_wrapper
+
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            request = args[0] if isinstance(args[0], Request) else args[1]
+            record, outcome = begin(request, endpoint)
+            if outcome is not None:
+                status_code, body, replayed = outcome
+                response = Response(body, status=status_code)
+                if replayed:
+                    response['Idempotent-Replayed'] = 'true'
+                return response
+            if record is None:
+                return view(*args, **kwargs)
+
+            try:
+                response = view(*args, **kwargs)
+            except GatewayOutcomeUnknown as e:
+                finish(record, e.status_code, {"detail": str(e.detail)})
+                raise
+            except Exception:
+                record.delete()
+                raise
+            finish(record, response.status_code, response.data)
+            return response
+        return wrapper
+    return decorator
+
+
+def purge_idempotency_keys():
+    """
+    Delete keys older than IDEMPOTENCY_KEY_TTL. Return the number deleted.
+    """
+    cutoff = timezone.now() - timedelta(seconds=IDEMPOTENCY_KEY_TTL)
+    deleted, _ = IdempotencyKey.objects.filter(created_at__lt=cutoff).delete()
+    return deleted
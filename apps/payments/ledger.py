@@ -0,0 +1,187 @@
+"""
+Append-only double-entry wallet ledger.
+
+Money moves between wallets as transfers: each transfer inserts a debit
+leg and a credit leg (LedgerEntry rows) under one idempotency key, and
+nothing is ever updated in place, so month-start debit runs are pure
+inserts. Money entering or leaving the platform (gateway top-ups, bill
+payments, opening balances) moves against the system clearing wallet.
+
+A wallet's balance is its latest WalletSnapshot plus the sum of the
+entries written after it; ``take_snapshots`` (run periodically) keeps
+that tail short.
+"""
+import logging
+from collections import namedtuple
+from decimal import Decimal
+
+from django.db import OperationalError, connection, transaction as db_transaction
+from django.db.models import DecimalField, Max, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import LedgerEntry, Wallet, WalletSnapshot
+
+logger = logging.getLogger(__name__)
+
+CLEARING_OWNER_TYPE = 'system'
+CLEARING_OWNER_ID = 'clearing'
+
+# How long take_snapshots waits for in-flight ledger writers before it
+# skips the run
+SNAPSHOT_LOCK_TIMEOUT = '5s'
+
+Transfer = namedtuple(
+    'Transfer',
+    ['source', 'destination', 'amount', 'key', 'entry_type', 'description', 'transaction'],
+    defaults=('', None),
+)
+
+
+def clearing_wallet():
+    """
+    The platform's counterparty wallet. Its balance is the negative of the
+    money held in all other wallets, so it is allowed to go below zero.
+    """
+    wallet, _ = Wallet.objects.get_or_create(
+        owner_type=CLEARING_OWNER_TYPE, owner_id=CLEARING_OWNER_ID, user=None, building=None,
+    )
+    return wallet
+
+
+def transfer_entries(transfer):
+    common = {
+        'entry_type': transfer.entry_type,
+        'idempotency_key': transfer.key,
+        'transaction': transfer.transaction,
+        'description': transfer.description,
+    }
+    return [
+        LedgerEntry(wallet=transfer.source, amount=-transfer.amount, **common),
+        LedgerEntry(wallet=transfer.destination, amount=transfer.amount, **common),
+    ]
+
+
+def post_transfers(transfers):
+    """
+    Insert the legs of many transfers in one statement. Transfers whose
+    key was already posted are skipped.
+    """
+    entries = [entry for transfer in transfers for entry in transfer_entries(transfer)]
+    if entries:
+        LedgerEntry.objects.bulk_create(entries, ignore_conflicts=True)
+
+
+def post_transfer(source, destination, amount, key, entry_type, description='', transaction=None):
+    post_transfers([Transfer(source, destination, amount, key, entry_type, description, transaction)])
+
+
+def wallet_balances(wallet_ids):
+    """
+    Return ``{wallet_id: balance}``: latest snapshot plus the tail of
+    entries after it. Snapshot and tail are read in one statement, so
+    they always agree on which snapshot is the latest.
+    """
+    wallet_ids = list(wallet_ids)
+    amount = DecimalField(max_digits=12, decimal_places=2)
+    latest = WalletSnapshot.objects.filter(wallet_id=OuterRef('pk')).order_by('-last_entry_id')
+    tail = (
+        LedgerEntry.objects.filter(wallet_id=OuterRef('pk'), id__gt=OuterRef('snapshot_entry_id'))
+        .order_by()
+        .values('wallet_id')
+        .annotate(total=Sum('amount'))
+        .values('total')
+    )
+    rows = (
+        Wallet.objects.filter(pk__in=wallet_ids)
+        .annotate(
+            snapshot_balance=Coalesce(Subquery(latest.values('balance')[:1]), Value(Decimal('0')), output_field=amount),
+            snapshot_entry_id=Coalesce(Subquery(latest.values('last_entry_id')[:1]), Value(0)),
+        )
+        .annotate(tail_total=Coalesce(Subquery(tail), Value(Decimal('0')), output_field=amount))
+        .values_list('pk', 'snapshot_balance', 'tail_total')
+    )
+    balances = dict.fromkeys(wallet_ids, Decimal('0'))
+    for wallet_id, snapshot_balance, tail_total in rows:
+        balances[wallet_id] = snapshot_balance + tail_total
+    return balances
+
+
+def wallet_balance(wallet):
+    return wallet_balances([wallet.pk])[wallet.pk]
+
+
+def ledger_high_water():
+    """
+    Return the highest entry id at or below which every entry is committed
+    (None for an empty ledger), or raise OperationalError when writers keep
+    the ledger busy past SNAPSHOT_LOCK_TIMEOUT.
+
+    Ids are drawn inside INSERT, under the ROW EXCLUSIVE lock the insert
+    holds until commit. SHARE mode waits for those writers to finish and
+    keeps new ones out, so while it is held no uncommitted entry exists
+    and later ones get higher ids. The lock only covers this one read.
+    """
+    with db_transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"SET LOCAL lock_timeout = '{SNAPSHOT_LOCK_TIMEOUT}'")
+        cursor.execute(f'LOCK TABLE {LedgerEntry._meta.db_table} IN SHARE MODE')
+        cursor.execute(f'SELECT MAX(id) FROM {LedgerEntry._meta.db_table}')
+        return cursor.fetchone()[0]
+
+
+# Each new snapshot is the wallet's previous snapshot plus its entries in
+# (previous.last_entry_id, high_water], all read in this one statement.
+SNAPSHOT_SQL = """
+WITH stale AS (
+    SELECT DISTINCT wallet_id FROM {entries}
+    WHERE id > %(previous)s AND id <= %(high_water)s
+), base AS (
+    SELECT stale.wallet_id,
+           COALESCE(latest.balance, 0) AS balance,
+           COALESCE(latest.last_entry_id, 0) AS last_entry_id
+    FROM stale
+    LEFT JOIN LATERAL (
+        SELECT balance, last_entry_id FROM {snapshots}
+        WHERE wallet_id = stale.wallet_id
+        ORDER BY last_entry_id DESC
+        LIMIT 1
+    ) latest ON TRUE
+)
+INSERT INTO {snapshots} (wallet_id, balance, last_entry_id, created_at)
+SELECT base.wallet_id,
+       base.balance + COALESCE((
+           SELECT SUM(amount) FROM {entries}
+           WHERE wallet_id = base.wallet_id AND id > base.last_entry_id AND id <= %(high_water)s
+       ), 0),
+       %(high_water)s,
+       NOW()
+FROM base
+WHERE base.last_entry_id < %(high_water)s
+RETURNING wallet_id, balance
+"""
+
+
+def take_snapshots():
+    """
+    Snapshot the balance of every wallet that has entries since the
+    previous run. Return the number of snapshots written.
+    """
+    try:
+        high_water = ledger_high_water()
+    except OperationalError as e:
+        logger.warning(f"Skipped wallet snapshots, ledger writers held the lock: {e}")
+        return 0
+    previous = WalletSnapshot.objects.aggregate(last=Max('last_entry_id'))['last'] or 0
+    if high_water is None or high_water <= previous:
+        return 0
+
+    sql = SNAPSHOT_SQL.format(entries=LedgerEntry._meta.db_table, snapshots=WalletSnapshot._meta.db_table)
+    with db_transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(sql, {'previous': previous, 'high_water': high_water})
+        snapshots = cursor.fetchall()
+
+        # Refresh the cached column for admin and legacy readers
+        Wallet.objects.bulk_update(
+            [Wallet(pk=wallet_id, current_balance=balance) for wallet_id, balance in snapshots],
+            ['current_balance'],
+        )
+    return len(snapshots)
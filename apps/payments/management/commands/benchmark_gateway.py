@@ -0,0 +1,53 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.payments.services.gateway import GatewayClient
+from apps.payments.services.mock_gateway import MockGatewayServer
+from apps.payments.services.paymob_service import PaymobService
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark a Paymob top-up (auth -> order -> payment key) against the local mock '
+        'gateway, with a fresh connection per request versus the pooled keep-alive client.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=200)
+        parser.add_argument('--latency', type=float, default=0.005, help='Seconds the mock waits per request')
+        parser.add_argument('--certfile', help='Serve the mock over HTTPS with this certificate')
+        parser.add_argument('--keyfile')
+
+    def handle(self, *args, **options):
+        certfile = options['certfile']
+        with MockGatewayServer(latency=options['latency'], certfile=certfile, keyfile=options['keyfile']) as server:
+            base_url = f'{server.url}/paymob'
+            self.stdout.write(f"Mock gateway on {server.url}, {options['iterations']} top-ups per client")
+            self.stdout.write(f"{'client':>10} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9}")
+            for label, pooled in (('unpooled', False), ('pooled', True)):
+                client = GatewayClient(base_url, pooled=pooled, verify=certfile or True)
+                timings = self.run(client, options['iterations'])
+                client.close()
+                p95 = statistics.quantiles(timings, n=20)[-1]
+                self.stdout.write(
+                    f"{label:>10} {statistics.median(timings):>9.2f} {p95:>9.2f} {max(timings):>9.2f}"
+                )
+
+    def run(self, client, iterations):
+        class BenchPaymob(PaymobService):
+            @classmethod
+            def client(cls):
+                return client
+
+        billing_data = {'first_name': 'Bench', 'last_name': 'User', 'email': 'bench@example.com'}
+        # Warm up: the pooled client opens its connection here
+        BenchPaymob.process_payment(100, billing_data)
+
+        timings = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            BenchPaymob.process_payment(100, billing_data)
+            timings.append((time.perf_counter() - started) * 1000)
+        return timings
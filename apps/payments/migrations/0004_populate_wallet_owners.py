@@ -0,0 +1,39 @@
+# Generated by Django 5.2.7 on 2026-10-18 13:41
+
+from django.db import migrations
+
+# Link each legacy owner string to its row. When an owner has several
+# wallets only the oldest one is linked, the others keep their strings.
+LINK_OWNERS_SQL = """
+UPDATE payments_wallet AS wallet
+SET {column} = owner.id
+FROM {table} AS owner
+WHERE wallet.owner_type = '{owner_type}'
+  AND owner.id::text = wallet.owner_id
+  AND wallet.id IN (
+      SELECT DISTINCT ON (owner_id) id
+      FROM payments_wallet
+      WHERE owner_type = '{owner_type}'
+      ORDER BY owner_id, id
+  );
+"""
+
+UNLINK_OWNERS_SQL = "UPDATE payments_wallet SET user_id = NULL, building_id = NULL;"
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0003_wallet_user_wallet_building'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            LINK_OWNERS_SQL.format(column='user_id', table='accounts_user', owner_type='user'),
+            reverse_sql=UNLINK_OWNERS_SQL,
+        ),
+        migrations.RunSQL(
+            LINK_OWNERS_SQL.format(column='building_id', table='buildings_building', owner_type='building'),
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.7 on 2026-10-18 14:21
+
+from django.db import migrations
+
+
+def post_opening_balances(apps, schema_editor):
+    """
+    Carry every existing balance into the ledger as an opening transfer
+    from the clearing wallet.
+    """
+    Wallet = apps.get_model('payments', 'Wallet')
+    LedgerEntry = apps.get_model('payments', 'LedgerEntry')
+
+    clearing, _ = Wallet.objects.get_or_create(
+        owner_type='system', owner_id='clearing', user=None, building=None,
+        defaults={'current_balance': 0},
+    )
+    entries = []
+    for wallet_id, balance in Wallet.objects.exclude(pk=clearing.pk).exclude(current_balance=0).values_list('id', 'current_balance'):
+        key = f'opening:{wallet_id}'
+        entries.append(LedgerEntry(wallet_id=clearing.pk, amount=-balance, entry_type='opening', idempotency_key=key))
+        entries.append(LedgerEntry(wallet_id=wallet_id, amount=balance, entry_type='opening', idempotency_key=key))
+    LedgerEntry.objects.bulk_create(entries, batch_size=1000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0006_ledgerentry_walletsnapshot'),
+    ]
+
+    operations = [
+        migrations.RunPython(post_opening_balances, migrations.RunPython.noop),
+    ]
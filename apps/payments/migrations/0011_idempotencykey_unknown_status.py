@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0010_wallet_protect_owner'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='idempotencykey',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('completed', 'Completed'), ('unknown', 'Outcome unknown')], default='pending', max_length=20),
+        ),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:47
+
+from django.conf import settings
+from django.db import migrations, models
+
+# Concurrent first calls to clearing_wallet() could each create a system
+# wallet. Merge every group of duplicates into its oldest wallet so the
+# constraint can be created: a transfer posted against two copies keeps
+# only the leg on the oldest one, the other rows are moved over, and the
+# group's snapshots are dropped so its balance is summed afresh.
+MERGE_SYSTEM_WALLETS_SQL = [
+    """
+    CREATE TEMPORARY TABLE system_wallet_merge ON COMMIT DROP AS
+    SELECT id, keeper FROM (
+        SELECT id, MIN(id) OVER (PARTITION BY owner_id) AS keeper
+        FROM payments_wallet WHERE owner_type = 'system'
+    ) wallets
+    WHERE id <> keeper;
+    """,
+    """
+    DELETE FROM payments_ledgerentry entry
+    USING system_wallet_merge dup
+    WHERE entry.wallet_id = dup.id
+      AND EXISTS (
+          SELECT 1 FROM payments_ledgerentry other
+          WHERE other.idempotency_key = entry.idempotency_key
+            AND other.wallet_id < entry.wallet_id
+            AND (other.wallet_id = dup.keeper
+                 OR other.wallet_id IN (SELECT id FROM system_wallet_merge WHERE keeper = dup.keeper))
+      );
+    """,
+    """
+    DELETE FROM payments_walletsnapshot
+    WHERE wallet_id IN (SELECT id FROM system_wallet_merge UNION SELECT keeper FROM system_wallet_merge);
+    """,
+    """
+    UPDATE payments_ledgerentry entry SET wallet_id = dup.keeper
+    FROM system_wallet_merge dup WHERE entry.wallet_id = dup.id;
+    """,
+    """
+    UPDATE payments_wallettransaction moved SET wallet_id = dup.keeper
+    FROM system_wallet_merge dup WHERE moved.wallet_id = dup.id;
+    """,
+    """
+    UPDATE payments_transaction moved SET wallet_id = dup.keeper
+    FROM system_wallet_merge dup WHERE moved.wallet_id = dup.id;
+    """,
+    """
+    DELETE FROM payments_wallet WHERE id IN (SELECT id FROM system_wallet_merge);
+    """,
+    # Check the deferred foreign keys now: Postgres refuses to index a
+    # table with pending trigger events
+    'SET CONSTRAINTS ALL IMMEDIATE;',
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('buildings', '0002_buildingstats'),
+        ('payments', '0011_idempotencykey_unknown_status'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunSQL(MERGE_SYSTEM_WALLETS_SQL, reverse_sql=migrations.RunSQL.noop),
+        migrations.AddConstraint(
+            model_name='wallet',
+            constraint=models.UniqueConstraint(condition=models.Q(('owner_type', 'system')), fields=('owner_id',), name='unique_system_wallet'),
+        ),
+    ]
@@ -1,14 +1,46 @@
 import uuid
 from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
 from apps.accounts.models import User
 
 class Wallet(models.Model):
+    # Typed owner: exactly one of these is set for user and building wallets.
+    # Wallets carry ledger history, so an owner holding a wallet cannot be
+    # deleted. Deactivate a user instead (is_active=False, which
+    # authentication refuses) and retire a building by moving its
+    # approval_status away from 'approved'.
+    user = models.ForeignKey(User, on_delete=models.PROTECT, null=True, blank=True, related_name='wallets')
+    building = models.ForeignKey('buildings.Building', on_delete=models.PROTECT, null=True, blank=True, related_name='wallets')
+    # Legacy owner columns, kept in step with the typed owner on save()
     owner_type = models.CharField(max_length=50)  # user | building | technician | union_head | company
     owner_id = models.CharField(max_length=50)
-    current_balance = models.DecimalField(max_digits=10, decimal_places=2)
+    # Balance as of the latest snapshot; the live balance comes from the
+    # ledger, see apps.payments.ledger.wallet_balances
+    current_balance = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user'], condition=models.Q(user__isnull=False), name='unique_wallet_per_user',
+            ),
+            models.UniqueConstraint(
+                fields=['building'], condition=models.Q(building__isnull=False), name='unique_wallet_per_building',
+            ),
+            # System wallets (the ledger's clearing wallet) exist once
+            models.UniqueConstraint(
+                fields=['owner_id'], condition=models.Q(owner_type='system'), name='unique_system_wallet',
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.user_id:
+            self.owner_type, self.owner_id = 'user', str(self.user_id)
+        elif self.building_id:
+            self.owner_type, self.owner_id = 'building', str(self.building_id)
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.owner_type} {self.owner_id} - {self.current_balance}"
 
@@ -24,6 +56,52 @@ class WalletTransaction(models.Model):
         return f"{self.wallet} - {self.amount}"
 
 
+class LedgerEntry(models.Model):
+    """
+    One leg of a double-entry transfer. Entries are only ever inserted:
+    every transfer writes a debit (negative) and a credit (positive) leg
+    sharing its ``idempotency_key``, so the amounts of a key sum to zero
+    and replaying a transfer is a no-op.
+    """
+    wallet = models.ForeignKey(Wallet, on_delete=models.PROTECT, related_name='ledger_entries')
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    entry_type = models.CharField(max_length=50)  # package_invoice | rent | topup | opening | ...
+    idempotency_key = models.CharField(max_length=100)
+    transaction = models.ForeignKey('Transaction', on_delete=models.SET_NULL, null=True, blank=True, related_name='ledger_entries')
+    description = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['idempotency_key', 'wallet'], name='unique_ledger_leg_per_key'),
+        ]
+        indexes = [
+            # Tail sums after a snapshot and recent entries of a wallet
+            models.Index(fields=['wallet', 'id'], name='ledger_wallet_id_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.wallet_id} {self.amount} ({self.idempotency_key})"
+
+
+class WalletSnapshot(models.Model):
+    """
+    Balance of a wallet including every ledger entry up to ``last_entry_id``.
+    """
+    wallet = models.ForeignKey(Wallet, on_delete=models.CASCADE, related_name='snapshots')
+    balance = models.DecimalField(max_digits=12, decimal_places=2)
+    last_entry_id = models.BigIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['wallet', '-last_entry_id'], name='snapshot_wallet_entry_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.wallet_id} {self.balance} @ {self.last_entry_id}"
+
+
 class SubscriptionPlan(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     name = models.CharField(max_length=255, unique=True)
@@ -77,3 +155,71 @@ class Transaction(models.Model):
 
     def __str__(self):
         return f"Transaction {self.id} - {self.amount}"
+
+
+class IdempotencyKey(models.Model):
+    """
+    Outcome of a money-moving request sent with an ``Idempotency-Key``
+    header, so a retried request replays the stored response instead of
+    moving the money again. See apps.payments.idempotency.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('completed', 'Completed'),
+        # A gateway call timed out after it may have been sent
+        ('unknown', 'Outcome unknown'),
+    ]
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='idempotency_keys')
+    endpoint = models.CharField(max_length=100)
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'endpoint', 'key'], name='unique_idempotency_key'),
+        ]
+        indexes = [
+            models.Index(fields=['created_at'], name='idempotency_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.endpoint} {self.key} ({self.status})"
+
+
+class WebhookEvent(models.Model):
+    """
+    Gateway callback stored as received and acknowledged at once; the
+    webhook worker (apps.payments.webhooks) verifies and applies it later.
+    ``dedup_key`` identifies the gateway event, so retried deliveries are
+    stored once.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processed', 'Processed'),
+        ('ignored', 'Ignored'),
+        ('failed', 'Failed'),
+    ]
+    provider = models.CharField(max_length=20)  # paymob
+    dedup_key = models.CharField(max_length=100)
+    payload = models.JSONField()
+    signature = models.CharField(max_length=256, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    error = models.TextField(blank=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['provider', 'dedup_key'], name='unique_webhook_event'),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'id'], name='webhook_status_id_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.provider} {self.dedup_key} ({self.status})"
@@ -1,8 +1,10 @@
 from rest_framework import serializers
+from .ledger import wallet_balance
 from .models import Wallet, WalletTransaction, SubscriptionPlan, UserSubscription, Invoice, Transaction
 
 class WalletSerializer(serializers.ModelSerializer):
     owner = serializers.SerializerMethodField()
+    current_balance = serializers.SerializerMethodField()
     recent_transactions = serializers.SerializerMethodField()
 
     class Meta:
@@ -10,26 +12,25 @@ class WalletSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
     def get_owner(self, obj):
-        if obj.owner_type == 'user':
-            from apps.accounts.models import User
-            try:
-                user = User.objects.get(id=obj.owner_id)
-                return user.full_name
-            except User.DoesNotExist:
-                return f"User {obj.owner_id}"
+        # Load with select_related('user') to avoid a query per wallet
+        if obj.user_id:
+            return obj.user.full_name
         return f"{obj.owner_type} {obj.owner_id}"
 
+    def get_current_balance(self, obj):
+        return str(wallet_balance(obj))
+
     def get_recent_transactions(self, obj):
-        # Get last 5 transactions
-        transactions = obj.wallettransaction_set.order_by('-created_at')[:5]
+        # Last 5 ledger entries of the wallet
+        entries = obj.ledger_entries.order_by('-id')[:5]
         return [
             {
-                'id': tx.id,
-                'description': tx.description,
-                'type': tx.transaction_type,
-                'amount': str(tx.amount),
+                'id': entry.id,
+                'description': entry.description,
+                'type': entry.entry_type,
+                'amount': str(entry.amount),
             }
-            for tx in transactions
+            for entry in entries
         ]
 
 class WalletTransactionSerializer(serializers.ModelSerializer):
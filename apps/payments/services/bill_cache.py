@@ -0,0 +1,137 @@
+"""
+Cache for Sahel bill inquiries.
+
+A bill's amount does not change within its billing cycle, so inquiry
+results are kept in the Django cache for SAHEL_BILL_CACHE_TTL seconds,
+keyed by (service_type, account_number). Concurrent identical inquiries
+are coalesced: within a process the callers wait for one leader thread,
+across workers a short ``cache.add`` lock lets one of them call the
+gateway while the others wait for its entry.
+
+Paying a bill invalidates its account. Entries are versioned per
+account, so an inquiry that was already in flight when the payment
+landed stores its (stale) result under the old version, where nobody
+reads it.
+"""
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+SAHEL_BILL_CACHE_TTL = getattr(settings, 'SAHEL_BILL_CACHE_TTL', 60 * 30)
+# Seconds a worker that lost the race waits for the winner's entry
+BILL_WAIT_TIMEOUT = 10
+BILL_WAIT_INTERVAL = 0.05
+
+
+def account_key(service_type, account_number):
+    digest = hashlib.sha1(f'{service_type}:{account_number}'.encode()).hexdigest()
+    return f"sahel_bill:{digest}"
+
+
+def bill_account_key(bill_number):
+    return f"sahel_bill_account:{bill_number}"
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+def coalesce(key, fetch):
+    """
+    Run ``fetch`` once for all threads of this process asking for ``key``
+    at the same time; they all get its result (or exception).
+    """
+    with _inflight_lock:
+        call = _inflight.get(key)
+        leader = call is None
+        if leader:
+            call = _inflight[key] = _Call()
+
+    if not leader:
+        call.event.wait(BILL_WAIT_TIMEOUT)
+        if call.error is not None:
+            raise call.error
+        if call.event.is_set():
+            return call.result
+        return fetch()
+
+    try:
+        call.result = fetch()
+        return call.result
+    except Exception as e:
+        call.error = e
+        raise
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+        call.event.set()
+
+
+def cached_inquiry(service_type, account_number, inquire):
+    """
+    Return the cached inquiry of the account, calling ``inquire()`` (the
+    gateway) only on a miss.
+    """
+    key = account_key(service_type, account_number)
+    return coalesce(key, lambda: _load(key, service_type, account_number, inquire))
+
+
+def _load(key, service_type, account_number, inquire):
+    version = cache.get_or_set(f'{key}:version', 1, timeout=None)
+    entry_key = f'{key}:v{version}'
+    result = cache.get(entry_key)
+    if result is not None:
+        return result
+
+    lock_key = f'{entry_key}:lock'
+    locked = cache.add(lock_key, 1, timeout=BILL_WAIT_TIMEOUT)
+    if not locked:
+        # Another worker is asking the gateway: wait for its entry
+        deadline = time.time() + BILL_WAIT_TIMEOUT
+        while time.time() < deadline:
+            time.sleep(BILL_WAIT_INTERVAL)
+            result = cache.get(entry_key)
+            if result is not None:
+                return result
+    try:
+        result = inquire()
+        cache.set(entry_key, result, timeout=SAHEL_BILL_CACHE_TTL)
+        if result.get('bill_number'):
+            cache.set(
+                bill_account_key(result['bill_number']), (service_type, account_number),
+                timeout=SAHEL_BILL_CACHE_TTL,
+            )
+        return result
+    finally:
+        if locked:
+            cache.delete(lock_key)
+
+
+def invalidate_account(service_type, account_number):
+    key = account_key(service_type, account_number)
+    try:
+        version = cache.incr(f'{key}:version')
+    except ValueError:
+        # No version yet, so nothing cached either
+        return
+    cache.delete(f'{key}:v{version - 1}')
+
+
+def invalidate_bill(bill_number):
+    """
+    Invalidate the account a bill was inquired for, if it is known.
+    """
+    account = cache.get(bill_account_key(bill_number))
+    if account is not None:
+        invalidate_account(*account)
+        cache.delete(bill_account_key(bill_number))
@@ -0,0 +1,213 @@
+"""
+Circuit breaker and bulkhead per payment gateway.
+
+Every gateway host gets a GatewayGuard. Before a request it checks:
+
+- the breaker: after GATEWAY_BREAKER_FAILURE_THRESHOLD consecutive
+  failures (connection errors, timeouts, 5xx) the breaker opens and
+  calls fail immediately for GATEWAY_BREAKER_RECOVERY_TIMEOUT seconds;
+  then one trial call is let through (half-open) and its outcome closes
+  or re-opens the breaker. Opening is also published in the Django
+  cache, so the other workers fail fast without paying the timeouts;
+- the bulkhead: at most GATEWAY_MAX_CONCURRENT calls in flight per
+  gateway and process. Extra calls are rejected instead of queued, so
+  one slow gateway cannot hold every worker thread or connection.
+
+Rejected and failed calls raise GatewayUnavailable, a 503 APIException
+that DRF views turn into a response on their own. A non-idempotent call
+that may have reached the gateway before failing raises
+GatewayOutcomeUnknown (504) instead, so it is not retried blindly.
+``gateway_metrics`` reports the state of every guard for the health
+endpoint.
+"""
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+logger = logging.getLogger(__name__)
+
+GATEWAY_BREAKER_FAILURE_THRESHOLD = getattr(settings, 'GATEWAY_BREAKER_FAILURE_THRESHOLD', 5)
+GATEWAY_BREAKER_RECOVERY_TIMEOUT = getattr(settings, 'GATEWAY_BREAKER_RECOVERY_TIMEOUT', 30)
+GATEWAY_MAX_CONCURRENT = getattr(settings, 'GATEWAY_MAX_CONCURRENT', 8)
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+
+class GatewayUnavailable(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Payment gateway temporarily unavailable, try again later.'
+    default_code = 'gateway_unavailable'
+
+    def __init__(self, gateway, reason, retry_after=None):
+        super().__init__()
+        self.gateway = gateway
+        self.reason = reason  # open | saturated | error | unknown
+        # DRF's exception handler sends ``wait`` as the Retry-After header
+        self.wait = retry_after
+
+
+class GatewayOutcomeUnknown(GatewayUnavailable):
+    """
+    A non-idempotent call failed after the request may have reached the
+    gateway (read timeout, connection dropped mid-exchange), so whether it
+    took effect is unknown. Retrying it could pay twice.
+    """
+    status_code = status.HTTP_504_GATEWAY_TIMEOUT
+    default_detail = (
+        'The payment gateway did not confirm the request, its outcome is unknown. '
+        'Check the payment status before trying again.'
+    )
+    default_code = 'gateway_outcome_unknown'
+
+    def __init__(self, gateway):
+        super().__init__(gateway, 'unknown')
+
+
+class GatewayGuard:
+    def __init__(self, name, failure_threshold=None, recovery_timeout=None, max_concurrent=None):
+        self.name = name
+        self.failure_threshold = failure_threshold or GATEWAY_BREAKER_FAILURE_THRESHOLD
+        self.recovery_timeout = recovery_timeout or GATEWAY_BREAKER_RECOVERY_TIMEOUT
+        self.max_concurrent = max_concurrent or GATEWAY_MAX_CONCURRENT
+        self.lock = threading.Lock()
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.in_flight = 0
+        self.trial_in_flight = False
+        self.rejected = {'open': 0, 'saturated': 0}
+
+    @property
+    def shared_key(self):
+        return f"gateway_breaker_open:{self.name}"
+
+    def shared_open_until(self):
+        return cache.get(self.shared_key)
+
+    async def ashared_open_until(self):
+        return await cache.aget(self.shared_key)
+
+    def acquire(self, shared_until=None):
+        """
+        Reserve a slot for one call or raise GatewayUnavailable. Return
+        True when the call is the half-open trial. ``shared_until`` is the
+        deployment-wide open flag, read by the caller so async callers
+        can await it.
+        """
+        with self.lock:
+            now = time.time()
+            if self.state == CLOSED and shared_until and now < shared_until:
+                # Another worker opened the breaker: follow it
+                self.trip(shared_until - self.recovery_timeout)
+            if self.state == OPEN and now >= self.opened_at + self.recovery_timeout:
+                self.state = HALF_OPEN
+            if self.state == OPEN or (self.state == HALF_OPEN and self.trial_in_flight):
+                self.rejected['open'] += 1
+                retry_after = max(1, int(self.opened_at + self.recovery_timeout - now)) if self.state == OPEN else 1
+                raise GatewayUnavailable(self.name, 'open', retry_after)
+            if self.in_flight >= self.max_concurrent:
+                self.rejected['saturated'] += 1
+                raise GatewayUnavailable(self.name, 'saturated', 1)
+
+            self.in_flight += 1
+            trial = self.state == HALF_OPEN
+            if trial:
+                self.trial_in_flight = True
+            return trial
+
+    def settle(self, trial, success):
+        """
+        Record the outcome of a call. Return what the deployment-wide open
+        flag must become: None to leave it, False to clear it, or the time
+        the breaker stays open until. The caller writes the flag outside
+        the lock, with the sync or async cache API.
+        """
+        with self.lock:
+            self.in_flight -= 1
+            if trial:
+                self.trial_in_flight = False
+            if success:
+                shared = None
+                if self.state != CLOSED:
+                    logger.info(f"Gateway {self.name} recovered, closing breaker")
+                    shared = False
+                self.state = CLOSED
+                self.failures = 0
+                self.opened_at = None
+                return shared
+
+            self.failures += 1
+            if trial or self.failures >= self.failure_threshold:
+                self.trip(time.time())
+                return self.opened_at + self.recovery_timeout
+            return None
+
+    def release(self, trial, success):
+        shared = self.settle(trial, success)
+        if shared is False:
+            cache.delete(self.shared_key)
+        elif shared is not None:
+            cache.set(self.shared_key, shared, timeout=self.recovery_timeout)
+
+    async def arelease(self, trial, success):
+        shared = self.settle(trial, success)
+        if shared is False:
+            await cache.adelete(self.shared_key)
+        elif shared is not None:
+            await cache.aset(self.shared_key, shared, timeout=self.recovery_timeout)
+
+    def trip(self, opened_at):
+        """
+        Open the breaker. Called with ``self.lock`` held.
+        """
+        if self.state != OPEN:
+            logger.warning(f"Gateway {self.name} breaker opened after {self.failures} failures")
+        self.state = OPEN
+        self.opened_at = opened_at
+
+    def snapshot(self):
+        shared_until = self.shared_open_until()
+        with self.lock:
+            return {
+                'state': self.state,
+                'consecutive_failures': self.failures,
+                'opened_at': self.opened_at,
+                'in_flight': self.in_flight,
+                'max_concurrent': self.max_concurrent,
+                'rejected': dict(self.rejected),
+                'shared_open_until': shared_until,
+            }
+
+
+_guards = {}
+_guards_lock = threading.Lock()
+
+
+def get_guard(name):
+    guard = _guards.get(name)
+    if guard is None:
+        with _guards_lock:
+            guard = _guards.setdefault(name, GatewayGuard(name))
+    return guard
+
+
+def is_failure(status_code):
+    return status_code >= 500
+
+
+def gateway_metrics():
+    """
+    State of every gateway guard in this process.
+    """
+    with _guards_lock:
+        guards = list(_guards.values())
+    return {
+        'pid': os.getpid(),
+        'gateways': {guard.name: guard.snapshot() for guard in guards},
+    }
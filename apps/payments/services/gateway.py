@@ -0,0 +1,216 @@
+"""
+Shared HTTP client for the payment gateways.
+
+Every gateway base URL gets one ``requests.Session`` per process, with
+its own connection pool, so consecutive calls (Paymob's auth -> order ->
+payment key flow) reuse a kept-alive TLS connection instead of paying a
+handshake each. Requests carry connect/read timeouts and are retried
+with exponential backoff on connection errors; GET requests are also
+retried on 502/503/504. POSTs are only retried when the connection
+failed before anything was sent, so a payment is never submitted twice
+by the retry layer. Every call also passes the gateway's circuit breaker
+and bulkhead (see breaker.py); transport errors surface as
+GatewayUnavailable, or as GatewayOutcomeUnknown when a non-idempotent
+request may already have reached the gateway.
+
+``get_async_client`` is the asyncio counterpart for async views: an
+``httpx.AsyncClient`` per gateway and event loop, with the same
+timeouts, connect retries and guard.
+"""
+import asyncio
+import logging
+import os
+import threading
+import weakref
+from urllib.parse import urlsplit
+
+import httpx
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+from urllib3.util.retry import Retry
+
+from .breaker import GatewayOutcomeUnknown, GatewayUnavailable, get_guard, is_failure
+
+logger = logging.getLogger(__name__)
+
+GATEWAY_CONNECT_TIMEOUT = getattr(settings, 'GATEWAY_CONNECT_TIMEOUT', 3.05)
+GATEWAY_READ_TIMEOUT = getattr(settings, 'GATEWAY_READ_TIMEOUT', 15)
+GATEWAY_MAX_RETRIES = getattr(settings, 'GATEWAY_MAX_RETRIES', 3)
+GATEWAY_RETRY_BACKOFF = getattr(settings, 'GATEWAY_RETRY_BACKOFF', 0.3)
+# Kept-alive connections per gateway host (one per concurrent worker thread)
+GATEWAY_POOL_SIZE = getattr(settings, 'GATEWAY_POOL_SIZE', 10)
+# One event loop serves many requests at once, so its pool is larger
+GATEWAY_ASYNC_POOL_SIZE = getattr(settings, 'GATEWAY_ASYNC_POOL_SIZE', 100)
+
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS'])
+
+# Transport errors raised before any byte of the request was written
+UNSENT_ERRORS = (
+    requests.ConnectTimeout, requests.exceptions.SSLError, requests.exceptions.ProxyError,
+    httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout, httpx.ProxyError, httpx.UnsupportedProtocol,
+)
+
+
+def may_have_been_sent(error):
+    """
+    Whether the gateway may have received the request that failed with
+    ``error``: anything past connection setup (read timeouts, a
+    connection dropped mid-exchange) is ambiguous.
+    """
+    if isinstance(error, UNSENT_ERRORS):
+        return False
+    if isinstance(error, requests.ConnectionError) and error.args:
+        # Connect retries exhausted: urllib3 wraps the last connect error
+        return not isinstance(getattr(error.args[0], 'reason', None), NewConnectionError)
+    return True
+
+
+def transport_error(guard, method, idempotent, error):
+    if not idempotent and method.upper() not in IDEMPOTENT_METHODS and may_have_been_sent(error):
+        return GatewayOutcomeUnknown(guard.name)
+    return GatewayUnavailable(guard.name, 'error')
+
+
+class GatewayClient:
+    """
+    HTTP client bound to one gateway base URL. With ``pooled=False``
+    every request opens (and closes) its own connection, which is how the
+    services behaved before and is kept for the benchmark.
+    """
+
+    def __init__(self, base_url, pooled=True, verify=True):
+        self.base_url = base_url.rstrip('/')
+        self.guard = get_guard(urlsplit(base_url).netloc)
+        self.pooled = pooled
+        self.verify = verify
+        self.timeout = (GATEWAY_CONNECT_TIMEOUT, GATEWAY_READ_TIMEOUT)
+        self.session = self.build_session() if pooled else None
+
+    def build_session(self):
+        retry = Retry(
+            total=GATEWAY_MAX_RETRIES,
+            connect=GATEWAY_MAX_RETRIES,
+            read=GATEWAY_MAX_RETRIES,
+            status=GATEWAY_MAX_RETRIES,
+            backoff_factor=GATEWAY_RETRY_BACKOFF,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=IDEMPOTENT_METHODS,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=GATEWAY_POOL_SIZE, max_retries=retry)
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.verify = self.verify
+        return session
+
+    def request(self, method, path, idempotent=False, **kwargs):
+        """
+        Send a request through the guard. ``idempotent`` marks a POST that
+        is safe to repeat (token requests), so a timeout on it is reported
+        as GatewayUnavailable rather than GatewayOutcomeUnknown.
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        trial = self.guard.acquire(self.guard.shared_open_until())
+        success = False
+        try:
+            if self.session is not None:
+                response = self.session.request(method, url, **kwargs)
+            else:
+                with self.build_session() as session:
+                    response = session.request(method, url, **kwargs)
+            success = not is_failure(response.status_code)
+            return response
+        except requests.RequestException as e:
+            logger.warning(f"Gateway request {method} {url} failed: {e}")
+            raise transport_error(self.guard, method, idempotent, e) from e
+        finally:
+            self.guard.release(trial, success)
+
+    def post(self, path, **kwargs):
+        return self.request('POST', path, **kwargs)
+
+    def get(self, path, **kwargs):
+        return self.request('GET', path, **kwargs)
+
+    def close(self):
+        if self.session is not None:
+            self.session.close()
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(base_url):
+    """
+    Process-wide pooled client for ``base_url``. Keyed by pid as well, so
+    forked workers (celery prefork, gunicorn) never share a socket with
+    their parent.
+    """
+    key = (os.getpid(), base_url)
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = _clients[key] = GatewayClient(base_url)
+    return client
+
+
+_async_clients = weakref.WeakKeyDictionary()
+
+
+class AsyncGatewayClient:
+    """
+    ``httpx.AsyncClient`` behind the same guard as the sync client.
+    """
+
+    def __init__(self, base_url):
+        self.guard = get_guard(urlsplit(base_url).netloc)
+        self.client = build_async_client(base_url)
+
+    async def request(self, method, path, idempotent=False, **kwargs):
+        trial = self.guard.acquire(await self.guard.ashared_open_until())
+        success = False
+        try:
+            response = await self.client.request(method, path.lstrip('/'), **kwargs)
+            success = not is_failure(response.status_code)
+            return response
+        except httpx.TransportError as e:
+            logger.warning(f"Gateway request {method} {path} on {self.guard.name} failed: {e}")
+            raise transport_error(self.guard, method, idempotent, e) from e
+        finally:
+            await self.guard.arelease(trial, success)
+
+    async def post(self, path, **kwargs):
+        return await self.request('POST', path, **kwargs)
+
+    async def get(self, path, **kwargs):
+        return await self.request('GET', path, **kwargs)
+
+
+def build_async_client(base_url):
+    return httpx.AsyncClient(
+        base_url=base_url.rstrip('/') + '/',
+        timeout=httpx.Timeout(GATEWAY_READ_TIMEOUT, connect=GATEWAY_CONNECT_TIMEOUT),
+        limits=httpx.Limits(max_connections=GATEWAY_ASYNC_POOL_SIZE, max_keepalive_connections=GATEWAY_POOL_SIZE),
+        # Retries connection failures only, never a request that was sent
+        transport=httpx.AsyncHTTPTransport(retries=GATEWAY_MAX_RETRIES),
+    )
+
+
+def get_async_client(base_url):
+    """
+    Pooled async client for ``base_url`` on the running event loop.
+    httpx connections belong to the loop that opened them, so each loop
+    (one per ASGI worker) gets its own client.
+    """
+    clients = _async_clients.setdefault(asyncio.get_running_loop(), {})
+    client = clients.get(base_url)
+    if client is None:
+        client = clients[base_url] = AsyncGatewayClient(base_url)
+    return client
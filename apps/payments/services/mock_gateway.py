@@ -0,0 +1,98 @@
+"""
+Local stand-in for the Paymob and Sahel APIs.
+
+Answers the endpoints the services call with canned JSON, optionally
+after a fixed delay and over TLS, so the clients can be exercised (and
+benchmarked) without network access or credentials. Paymob routes live
+under ``/paymob`` and Sahel routes under ``/sahel``; point
+PAYMOB_BASE_URL / SAHEL_BASE_URL at ``<server.url>/paymob`` and
+``<server.url>/sahel``.
+
+    with MockGatewayServer(latency=0.02) as server:
+        PaymobService.BASE_URL = f'{server.url}/paymob'
+"""
+import itertools
+import json
+import ssl
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_ids = itertools.count(1)
+
+ROUTES = {
+    '/paymob/auth/tokens': lambda body: {'token': 'mock-auth-token'},
+    '/paymob/ecommerce/orders': lambda body: {'id': next(_ids), 'amount_cents': body.get('amount_cents')},
+    '/paymob/acceptance/payment_keys': lambda body: {'token': f"mock-payment-key-{body.get('order_id')}"},
+    '/sahel/auth': lambda body: {'token': 'mock-auth-token'},
+    '/sahel/bills/inquiry': lambda body: {
+        'bill_number': f"BILL-{body.get('account_number')}",
+        'amount_due': 150,
+        'due_date': '2026-12-01',
+    },
+    '/sahel/bills/pay': lambda body: {
+        'status': 'paid',
+        'bill_number': body.get('bill_number'),
+        'reference': f'SAHEL-{next(_ids)}',
+    },
+}
+
+
+class MockGatewayHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, like the real gateways
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length) if length else b''
+        route = ROUTES.get(self.path.rstrip('/'))
+        if route is None:
+            self.respond(404, {'detail': 'Not found'})
+            return
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        self.respond(200, route(json.loads(raw or b'{}')))
+
+    def respond(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MockGatewayServer:
+    """
+    Threaded mock gateway on ``host``; port 0 picks a free one. Pass
+    ``certfile``/``keyfile`` to serve HTTPS.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0, certfile=None, keyfile=None):
+        self.httpd = ThreadingHTTPServer((host, port), MockGatewayHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.latency = latency
+        scheme = 'http'
+        if certfile:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(certfile, keyfile)
+            self.httpd.socket = context.wrap_socket(self.httpd.socket, server_side=True)
+            scheme = 'https'
+        self.url = f'{scheme}://{host}:{self.httpd.server_address[1]}'
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -1,34 +1,42 @@
-import requests
+from asgiref.sync import sync_to_async
 from django.conf import settings
 
-class PaymobService:
-    BASE_URL = 'https://accept.paymob.com/api'
+from .gateway import get_async_client, get_client
+from .tokens import TokenAuthMixin
+
+class PaymobService(TokenAuthMixin):
+    BASE_URL = getattr(settings, 'PAYMOB_BASE_URL', 'https://accept.paymob.com/api')
     API_KEY = getattr(settings, 'PAYMOB_API_KEY', '')
     INTEGRATION_ID = getattr(settings, 'PAYMOB_INTEGRATION_ID', '')
+    # Paymob auth tokens are valid for one hour
+    TOKEN_TTL = getattr(settings, 'PAYMOB_TOKEN_TTL', 60 * 50)
+
+    @classmethod
+    def client(cls):
+        return get_client(cls.BASE_URL)
 
     @classmethod
-    def authenticate(cls):
-        url = f"{cls.BASE_URL}/auth/tokens"
+    def async_client(cls):
+        return get_async_client(cls.BASE_URL)
+
+    @classmethod
+    def fetch_token(cls):
         payload = {"api_key": cls.API_KEY}
-        response = requests.post(url, json=payload)
+        response = cls.client().post('auth/tokens', json=payload, idempotent=True)
         return response.json().get('token')
 
     @classmethod
     def create_order(cls, auth_token, amount, currency='EGP'):
-        url = f"{cls.BASE_URL}/ecommerce/orders"
-        headers = {"Authorization": f"Bearer {auth_token}"}
         payload = {
             "amount_cents": int(amount * 100),
             "currency": currency,
             "items": []
         }
-        response = requests.post(url, json=payload, headers=headers)
+        response = cls.post_with_token('ecommerce/orders', payload, auth_token)
         return response.json()
 
     @classmethod
     def create_payment_key(cls, auth_token, order_id, amount, billing_data):
-        url = f"{cls.BASE_URL}/acceptance/payment_keys"
-        headers = {"Authorization": f"Bearer {auth_token}"}
         payload = {
             "amount_cents": int(amount * 100),
             "currency": "EGP",
@@ -36,7 +44,7 @@ class PaymobService:
             "billing_data": billing_data,
             "integration_id": cls.INTEGRATION_ID
         }
-        response = requests.post(url, json=payload, headers=headers)
+        response = cls.post_with_token('acceptance/payment_keys', payload, auth_token)
         return response.json()
 
     @classmethod
@@ -46,3 +54,35 @@ class PaymobService:
         order_id = order.get('id')
         payment_key = cls.create_payment_key(auth_token, order_id, amount, billing_data)
         return payment_key.get('token')
+
+    # Async variants for async views: the same flow without holding a worker
+
+    @classmethod
+    async def acreate_order(cls, auth_token, amount, currency='EGP'):
+        payload = {
+            "amount_cents": int(amount * 100),
+            "currency": currency,
+            "items": []
+        }
+        response = await cls.apost_with_token('ecommerce/orders', payload, auth_token)
+        return response.json()
+
+    @classmethod
+    async def acreate_payment_key(cls, auth_token, order_id, amount, billing_data):
+        payload = {
+            "amount_cents": int(amount * 100),
+            "currency": "EGP",
+            "order_id": order_id,
+            "billing_data": billing_data,
+            "integration_id": cls.INTEGRATION_ID
+        }
+        response = await cls.apost_with_token('acceptance/payment_keys', payload, auth_token)
+        return response.json()
+
+    @classmethod
+    async def aprocess_payment(cls, amount, billing_data):
+        auth_token = await sync_to_async(cls.authenticate, thread_sensitive=False)()
+        order = await cls.acreate_order(auth_token, amount)
+        order_id = order.get('id')
+        payment_key = await cls.acreate_payment_key(auth_token, order_id, amount, billing_data)
+        return payment_key.get('token')
@@ -1,28 +1,42 @@
-import requests
 from django.conf import settings
 
-class SahelService:
+from .bill_cache import cached_inquiry, invalidate_bill
+from .gateway import get_client
+from .tokens import TokenAuthMixin
+
+class SahelService(TokenAuthMixin):
     BASE_URL = getattr(settings, 'SAHEL_BASE_URL', 'https://api.sahel.com')
     API_KEY = getattr(settings, 'SAHEL_API_KEY', '')
     SECRET_KEY = getattr(settings, 'SAHEL_SECRET_KEY', '')
+    TOKEN_TTL = getattr(settings, 'SAHEL_TOKEN_TTL', 60 * 50)
+
+    @classmethod
+    def client(cls):
+        return get_client(cls.BASE_URL)
 
     @classmethod
-    def authenticate(cls):
-        url = f"{cls.BASE_URL}/auth"
+    def fetch_token(cls):
         payload = {"api_key": cls.API_KEY, "secret_key": cls.SECRET_KEY}
-        response = requests.post(url, json=payload)
+        response = cls.client().post('auth', json=payload, idempotent=True)
         return response.json().get('token')
 
     @classmethod
     def inquire_bill(cls, account_number, service_type):
-        url = f"{cls.BASE_URL}/bills/inquiry"
-        headers = {"Authorization": f"Bearer {cls.authenticate()}"}
+        """
+        Bill of an account, served from the bill cache when possible.
+        """
+        return cached_inquiry(
+            service_type, account_number, lambda: cls.fetch_bill(account_number, service_type)
+        )
+
+    @classmethod
+    def fetch_bill(cls, account_number, service_type):
         payload = {
             "api_key": cls.API_KEY,
             "account_number": account_number,
             "service_type": service_type
         }
-        response = requests.post(url, json=payload, headers=headers)
+        response = cls.post_with_token('bills/inquiry', payload)
         response.raise_for_status()
         data = response.json()
         return {
@@ -33,8 +47,10 @@ class SahelService:
 
     @classmethod
     def pay_bill(cls, bill_number, amount):
-        url = f"{cls.BASE_URL}/bills/pay"
-        headers = {"Authorization": f"Bearer {cls.authenticate()}"}
         payload = {"bill_number": bill_number, "amount": amount}
-        response = requests.post(url, json=payload, headers=headers)
+        try:
+            response = cls.post_with_token('bills/pay', payload)
+        finally:
+            # Whatever the outcome, the cached amount can no longer be trusted
+            invalidate_bill(bill_number)
         return response.json()
@@ -0,0 +1,180 @@
+"""
+Cached gateway auth tokens.
+
+A TokenCache keeps one gateway token per process in memory and shares
+it across workers through the Django cache, so payments and bill
+inquiries no longer start with an auth round-trip. Lookups go memory ->
+shared cache -> gateway:
+
+- a token inside its refresh margin is still returned, while one
+  background thread fetches its replacement;
+- an expired or missing token is fetched by a single caller: a thread
+  lock keeps it to one per process and a short ``cache.add`` lock to
+  one per deployment, the others wait for the shared entry;
+- ``invalidate`` drops a token the gateway rejected (401).
+"""
+import logging
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# Seconds a worker that lost the refresh race waits for the winner's token
+TOKEN_WAIT_TIMEOUT = 5
+TOKEN_WAIT_INTERVAL = 0.05
+
+_registry_lock = threading.Lock()
+
+
+class TokenCache:
+    def __init__(self, name, fetch, ttl, refresh_margin=60):
+        self.name = name
+        self.fetch = fetch
+        self.ttl = ttl
+        self.refresh_margin = refresh_margin
+        self.token = None
+        self.expires_at = 0
+        self.lock = threading.Lock()
+        self.refreshing = threading.Event()
+
+    @property
+    def cache_key(self):
+        return f"gateway_token:{self.name}"
+
+    @property
+    def lock_key(self):
+        return f"gateway_token_lock:{self.name}"
+
+    def get(self):
+        now = time.time()
+        token, expires_at = self.token, self.expires_at
+        if token and now < expires_at - self.refresh_margin:
+            return token
+        if token and now < expires_at:
+            self.refresh_in_background()
+            return token
+
+        with self.lock:
+            # Another thread may have refreshed while we waited for the lock
+            if self.token and time.time() < self.expires_at:
+                return self.token
+            return self.load()
+
+    def load(self):
+        """
+        Take the shared token, or fetch one. Called with ``self.lock`` held.
+        """
+        entry = cache.get(self.cache_key)
+        if entry and time.time() < entry['expires_at'] - self.refresh_margin:
+            return self.remember(entry)
+
+        if cache.add(self.lock_key, 1, timeout=TOKEN_WAIT_TIMEOUT):
+            try:
+                return self.refresh()
+            finally:
+                cache.delete(self.lock_key)
+
+        # Another worker is fetching: wait for its token rather than
+        # hitting the gateway too
+        deadline = time.time() + TOKEN_WAIT_TIMEOUT
+        while time.time() < deadline:
+            time.sleep(TOKEN_WAIT_INTERVAL)
+            entry = cache.get(self.cache_key)
+            if entry and time.time() < entry['expires_at'] - self.refresh_margin:
+                return self.remember(entry)
+        logger.warning(f"Timed out waiting for the shared {self.name} token, fetching it directly")
+        return self.refresh()
+
+    def refresh(self):
+        token = self.fetch()
+        if not token:
+            raise RuntimeError(f"{self.name} authentication returned no token")
+        entry = {'token': token, 'expires_at': time.time() + self.ttl}
+        cache.set(self.cache_key, entry, timeout=self.ttl)
+        return self.remember(entry)
+
+    def remember(self, entry):
+        self.token, self.expires_at = entry['token'], entry['expires_at']
+        return self.token
+
+    def refresh_in_background(self):
+        # Never block the caller: it still holds a valid token
+        with _registry_lock:
+            if self.refreshing.is_set():
+                return
+            self.refreshing.set()
+
+        def run():
+            try:
+                with self.lock:
+                    self.load()
+            except Exception as e:
+                logger.error(f"Background refresh of the {self.name} token failed: {e}")
+            finally:
+                self.refreshing.clear()
+
+        threading.Thread(target=run, name=f'{self.name}-token-refresh', daemon=True).start()
+
+    def invalidate(self, token=None):
+        """
+        Forget the cached token (only if it is still ``token`` when given).
+        """
+        with self.lock:
+            if token is None or token == self.token:
+                self.token, self.expires_at = None, 0
+                entry = cache.get(self.cache_key)
+                if entry and (token is None or entry['token'] == token):
+                    cache.delete(self.cache_key)
+
+
+class TokenAuthMixin:
+    """
+    Bearer-token auth for a gateway service class. Subclasses define
+    ``client()`` (and ``async_client()`` for the async helpers),
+    ``fetch_token()`` and ``TOKEN_TTL``; each class gets its own
+    TokenCache named after it.
+    """
+    TOKEN_TTL = 60 * 50
+
+    @classmethod
+    def token_cache(cls):
+        if '_token_cache' not in cls.__dict__:
+            with _registry_lock:
+                if '_token_cache' not in cls.__dict__:
+                    cls._token_cache = TokenCache(cls.__name__.lower(), cls.fetch_token, cls.TOKEN_TTL)
+        return cls._token_cache
+
+    @classmethod
+    def authenticate(cls):
+        return cls.token_cache().get()
+
+    @classmethod
+    def post_with_token(cls, path, payload, auth_token=None):
+        token = auth_token or cls.authenticate()
+        response = cls.client().post(path, json=payload, headers={"Authorization": f"Bearer {token}"})
+        if response.status_code == 401:
+            # Token revoked or expired early: drop it and retry once with a fresh one
+            cls.token_cache().invalidate(token)
+            response = cls.client().post(
+                path, json=payload, headers={"Authorization": f"Bearer {cls.authenticate()}"}
+            )
+        return response
+
+    @classmethod
+    async def apost_with_token(cls, path, payload, auth_token=None):
+        """
+        Async ``post_with_token`` through ``async_client()``. The token
+        comes from the same cache; the rare fetch runs in a worker thread.
+        """
+        authenticate = sync_to_async(cls.authenticate, thread_sensitive=False)
+        token = auth_token or await authenticate()
+        response = await cls.async_client().post(path, json=payload, headers={"Authorization": f"Bearer {token}"})
+        if response.status_code == 401:
+            await sync_to_async(cls.token_cache().invalidate, thread_sensitive=False)(token)
+            response = await cls.async_client().post(
+                path, json=payload, headers={"Authorization": f"Bearer {await authenticate()}"}
+            )
+        return response
@@ -0,0 +1,42 @@
+import logging
+
+from celery import shared_task
+
+from .idempotency import purge_idempotency_keys
+from .ledger import take_snapshots
+from .webhooks import process_pending, schedule_processing
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def take_wallet_snapshots():
+    """
+    Snapshot the balances of wallets with new ledger entries so balance
+    reads only sum a short tail.
+    """
+    written = take_snapshots()
+    logger.info(f"Wrote {written} wallet snapshots")
+    return written
+
+
+@shared_task
+def purge_idempotency_keys_task():
+    deleted = purge_idempotency_keys()
+    logger.info(f"Purged {deleted} idempotency keys")
+    return deleted
+
+
+@shared_task(ignore_result=True)
+def process_webhook_events():
+    """
+    Apply pending gateway webhooks in batches. A run is capped at
+    WEBHOOK_MAX_BATCHES_PER_RUN batches and schedules the next one when
+    events are left.
+    """
+    handled, more = process_pending()
+    if handled:
+        logger.info(f"Processed {handled} webhook events")
+    if more:
+        schedule_processing()
+    return handled
@@ -0,0 +1,344 @@
+import hashlib
+import hmac
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+import requests
+
+from django.db import IntegrityError
+from django.db.models import ProtectedError
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.accounts.models import ResidentProfile
+from apps.accounts.factories import make_user
+from apps.buildings.models import Building, Unit
+from apps.packages.models import Package, PackageInvoice
+from .ledger import clearing_wallet, post_transfer, take_snapshots, wallet_balance, wallet_balances
+from . import webhooks
+from .debits import debit_invoices
+from .models import IdempotencyKey, LedgerEntry, Transaction, Wallet, WalletSnapshot, WebhookEvent
+from .services.breaker import GatewayGuard, GatewayOutcomeUnknown, GatewayUnavailable
+from .services.gateway import transport_error
+from .services.sahel_service import SahelService
+
+
+class WalletOwnerTests(TestCase):
+    def test_owner_with_a_wallet_cannot_be_deleted(self):
+        user = make_user()
+        wallet = Wallet.objects.create(user=user)
+        with self.assertRaises(ProtectedError):
+            user.delete()
+        self.assertTrue(Wallet.objects.filter(pk=wallet.pk).exists())
+
+
+class ClearingWalletTests(TestCase):
+    def test_clearing_wallet_exists_once(self):
+        self.assertEqual(clearing_wallet(), clearing_wallet())
+        with self.assertRaises(IntegrityError):
+            Wallet.objects.create(owner_type='system', owner_id='clearing')
+
+
+class LedgerBalanceTests(TestCase):
+    def setUp(self):
+        self.clearing = clearing_wallet()
+        self.wallet = Wallet.objects.create(user=make_user())
+        self.other = Wallet.objects.create(user=make_user())
+
+    def fund(self, wallet, amount, key):
+        post_transfer(self.clearing, wallet, Decimal(amount), key, 'topup')
+
+    def test_balance_is_snapshot_plus_tail(self):
+        self.fund(self.wallet, '100', 'topup:1')
+        self.fund(self.other, '40', 'topup:2')
+        self.assertEqual(take_snapshots(), 3)
+        self.assertEqual(WalletSnapshot.objects.get(wallet=self.wallet).balance, Decimal('100'))
+
+        post_transfer(self.wallet, self.other, Decimal('30'), 'rent:1', 'rent')
+        self.assertEqual(
+            wallet_balances([self.wallet.pk, self.other.pk]),
+            {self.wallet.pk: Decimal('70'), self.other.pk: Decimal('70')},
+        )
+
+        # The next run builds on the previous snapshot
+        self.assertEqual(take_snapshots(), 2)
+        self.assertEqual(take_snapshots(), 0)
+        latest = WalletSnapshot.objects.filter(wallet=self.wallet).order_by('-last_entry_id').first()
+        self.assertEqual(latest.balance, Decimal('70'))
+        self.assertEqual(latest.last_entry_id, LedgerEntry.objects.order_by('-id').first().id)
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.current_balance, Decimal('70'))
+        self.assertEqual(wallet_balance(self.clearing), Decimal('-140'))
+
+    def test_wallet_without_entries_has_zero_balance(self):
+        self.assertEqual(wallet_balance(self.wallet), Decimal('0'))
+
+
+class PayRentFundsTests(TestCase):
+    def setUp(self):
+        self.tenant, self.landlord = make_user(), make_user()
+        self.profile = ResidentProfile.objects.create(
+            user=self.tenant, owner=self.landlord, resident_type='tenant', status='approved',
+        )
+        self.tenant_wallet = Wallet.objects.create(user=self.tenant)
+        # Part of the balance sits in a snapshot, part in the tail after it
+        post_transfer(clearing_wallet(), self.tenant_wallet, Decimal('60'), 'topup:1', 'topup')
+        take_snapshots()
+        post_transfer(clearing_wallet(), self.tenant_wallet, Decimal('40'), 'topup:2', 'topup')
+        self.client = APIClient()
+        self.client.force_authenticate(self.tenant)
+
+    def pay(self, amount, **headers):
+        return self.client.post('/api/payments/rent/pay/', {
+            'landlord_id': str(self.landlord.pk), 'apartment_id': str(self.profile.pk), 'amount': amount,
+        }, format='json', headers=headers)
+
+    def test_rent_beyond_balance_is_refused(self):
+        response = self.pay('100.01')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(wallet_balance(self.tenant_wallet), Decimal('100'))
+
+    def test_rent_within_balance_moves_money_once(self):
+        self.assertEqual(self.pay('80').status_code, 200)
+        self.assertEqual(wallet_balance(self.tenant_wallet), Decimal('20'))
+        landlord_wallet = Wallet.objects.get(user=self.landlord)
+        self.assertEqual(wallet_balance(landlord_wallet), Decimal('80'))
+
+        self.assertEqual(self.pay('30').status_code, 400)
+        self.assertEqual(wallet_balance(self.tenant_wallet), Decimal('20'))
+
+
+class PayRentIdempotencyTests(PayRentFundsTests):
+    def test_retry_replays_the_stored_response(self):
+        first = self.pay('80', **{'Idempotency-Key': 'rent-oct'})
+        retry = self.pay('80', **{'Idempotency-Key': 'rent-oct'})
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(retry.status_code, 200)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(wallet_balance(self.tenant_wallet), Decimal('20'))
+
+    def test_key_reused_for_another_request_is_refused(self):
+        self.pay('80', **{'Idempotency-Key': 'rent-oct'})
+        response = self.pay('10', **{'Idempotency-Key': 'rent-oct'})
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(wallet_balance(self.tenant_wallet), Decimal('20'))
+
+    def test_pending_key_is_never_run_again(self):
+        self.pay('80', **{'Idempotency-Key': 'rent-oct'})
+        # As if the first attempt were still running, long after it started
+        IdempotencyKey.objects.filter(key='rent-oct').update(
+            status='pending', created_at=timezone.now() - timedelta(hours=1),
+        )
+        response = self.pay('80', **{'Idempotency-Key': 'rent-oct'})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(wallet_balance(self.tenant_wallet), Decimal('20'))
+
+
+class GatewayOutcomeTests(TestCase):
+    def setUp(self):
+        self.guard = GatewayGuard('sahel.test')
+
+    def test_timeout_after_sending_a_post_is_ambiguous(self):
+        error = transport_error(self.guard, 'POST', False, requests.ReadTimeout())
+        self.assertIsInstance(error, GatewayOutcomeUnknown)
+        self.assertEqual(error.status_code, 504)
+
+    def test_failures_before_sending_are_plain_unavailable(self):
+        for method, idempotent, exc in [
+            ('POST', False, requests.ConnectTimeout()),
+            ('POST', True, requests.ReadTimeout()),
+            ('GET', False, requests.ReadTimeout()),
+        ]:
+            error = transport_error(self.guard, method, idempotent, exc)
+            self.assertNotIsInstance(error, GatewayOutcomeUnknown)
+            self.assertIsInstance(error, GatewayUnavailable)
+
+
+class BillPaymentIdempotencyTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(make_user())
+
+    def pay(self):
+        return self.client.post('/api/payments/sahel/pay/', {'bill_number': '123', 'amount': '50'},
+                                format='json', headers={'Idempotency-Key': 'bill-oct'})
+
+    @mock.patch.object(SahelService, 'post_with_token', side_effect=GatewayOutcomeUnknown('sahel.test'))
+    def test_unknown_outcome_keeps_the_key(self, post_with_token):
+        self.assertEqual(self.pay().status_code, 504)
+        self.assertEqual(IdempotencyKey.objects.get(key='bill-oct').status, 'unknown')
+
+        retry = self.pay()
+        self.assertEqual(retry.status_code, 504)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(post_with_token.call_count, 1)
+
+    @mock.patch.object(SahelService, 'post_with_token', side_effect=GatewayUnavailable('sahel.test', 'open', 5))
+    def test_unsent_payment_releases_the_key(self, post_with_token):
+        self.assertEqual(self.pay().status_code, 503)
+        self.assertFalse(IdempotencyKey.objects.filter(key='bill-oct').exists())
+        self.assertEqual(self.pay().status_code, 503)
+        self.assertEqual(post_with_token.call_count, 2)
+
+
+class GatewayHealthTests(TestCase):
+    url = '/api/payments/gateways/health/'
+
+    def test_only_staff_can_read_gateway_state(self):
+        client = APIClient()
+        self.assertEqual(client.get(self.url).status_code, 401)
+        user = make_user()
+        client.force_authenticate(user)
+        self.assertEqual(client.get(self.url).status_code, 403)
+
+        user.is_staff = True
+        user.save(update_fields=['is_staff'])
+        response = client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], 'ok')
+
+
+def paymob_callback(order_id, success=True, pending=False):
+    """
+    A Paymob transaction callback for ``order_id`` and its HMAC.
+    """
+    payload = {'type': 'TRANSACTION', 'obj': {
+        'id': int(order_id) * 10, 'success': success, 'pending': pending,
+        'amount_cents': 5000, 'order': {'id': int(order_id)},
+    }}
+    message = ''.join(webhooks._field(payload['obj'], path) for path in webhooks.PAYMOB_HMAC_FIELDS)
+    return payload, hmac.new(b'test-hmac', message.encode(), hashlib.sha512).hexdigest()
+
+
+def paymob_topup(order_id):
+    return Transaction.objects.create(
+        wallet=Wallet.objects.create(user=make_user()), amount=Decimal('50'), method='paymob',
+        status='pending', transaction_reference=order_id,
+    )
+
+
+@mock.patch.object(webhooks, 'PAYMOB_HMAC_SECRET', 'test-hmac')
+class PaymobWebhookTests(TestCase):
+    def deliver(self, payload, signature):
+        return APIClient().post(f'/api/payments/webhook/paymob/?hmac={signature}', payload, format='json')
+
+    def test_forged_callback_does_not_shadow_the_genuine_one(self):
+        transaction = paymob_topup('201')
+        payload, signature = paymob_callback('201')
+        self.assertEqual(self.deliver(payload, 'f' * 128).status_code, 403)
+        self.assertEqual(self.deliver(payload, signature).status_code, 200)
+        # A retried delivery of the same event is stored once
+        self.assertEqual(self.deliver(payload, signature).status_code, 200)
+        self.assertEqual(WebhookEvent.objects.count(), 1)
+
+        webhooks.process_batch()
+        transaction.refresh_from_db()
+        self.assertEqual(transaction.status, 'completed')
+        self.assertEqual(wallet_balance(transaction.wallet), Decimal('50'))
+
+    def test_success_after_pending_is_applied(self):
+        transaction = paymob_topup('202')
+        self.assertEqual(self.deliver(*paymob_callback('202', success=False, pending=True)).status_code, 200)
+        self.assertEqual(self.deliver(*paymob_callback('202')).status_code, 200)
+
+        self.assertEqual(webhooks.process_batch(), 2)
+        self.assertEqual(
+            sorted(WebhookEvent.objects.values_list('status', flat=True)), ['ignored', 'processed'],
+        )
+        self.assertEqual(wallet_balance(transaction.wallet), Decimal('50'))
+
+    def test_unknown_event_type_is_refused(self):
+        payload, signature = paymob_callback('203')
+        payload['type'] = 'X' * 200
+        self.assertEqual(self.deliver(payload, signature).status_code, 400)
+        self.assertFalse(WebhookEvent.objects.exists())
+
+
+@mock.patch.object(webhooks, 'PAYMOB_HMAC_SECRET', 'test-hmac')
+class WebhookBatchTests(TestCase):
+    def topup(self, order_id):
+        transaction = paymob_topup(order_id)
+        payload, signature = paymob_callback(order_id)
+        webhooks.receive_webhook('paymob', webhooks.paymob_dedup_key(payload), payload, signature)
+        return transaction
+
+    def test_event_that_raises_does_not_block_the_batch(self):
+        broken, fine = self.topup('101'), self.topup('102')
+        post_transfers = webhooks.post_transfers
+
+        def fail_for_broken(transfers):
+            if transfers[0].transaction == broken:
+                raise ValueError('ledger unavailable')
+            post_transfers(transfers)
+
+        with mock.patch.object(webhooks, 'post_transfers', side_effect=fail_for_broken), \
+                self.assertLogs(webhooks.logger, 'WARNING'):
+            self.assertEqual(webhooks.process_batch(), 2)
+
+        events = {event.payload['obj']['order']['id']: event for event in WebhookEvent.objects.all()}
+        self.assertEqual(events[101].status, 'failed')
+        self.assertIn('ledger unavailable', events[101].error)
+        self.assertEqual(events[102].status, 'processed')
+
+        broken.refresh_from_db()
+        fine.refresh_from_db()
+        self.assertEqual(broken.status, 'pending')
+        self.assertEqual(fine.status, 'completed')
+        self.assertEqual(wallet_balance(broken.wallet), Decimal('0'))
+        self.assertEqual(wallet_balance(fine.wallet), Decimal('50'))
+
+
+class DebitInvoicesTests(TestCase):
+    def setUp(self):
+        union_head = make_user()
+        building = Building.objects.create(
+            union_head=union_head, name='Building', address='Cairo', total_units=3, total_floors=1, units_per_floor=3,
+        )
+        self.package = Package.objects.create(
+            package_type='fixed', name='Maintenance', created_by=union_head, start_date=timezone.localdate(),
+        )
+        self.wallets = {}
+        self.residents = {}
+        for number, (name, balance) in enumerate([('rich', '150'), ('poor', '20'), ('walletless', None)]):
+            unit = Unit.objects.create(building=building, floor_number=1, apartment_number=str(number + 1))
+            resident = ResidentProfile.objects.create(user=make_user(), unit=unit, status='approved')
+            self.residents[name] = resident
+            if balance is not None:
+                wallet = self.wallets[name] = Wallet.objects.create(user=resident.user)
+                post_transfer(clearing_wallet(), wallet, Decimal(balance), f'topup:{name}', 'topup')
+
+    def invoice(self, name, month):
+        return PackageInvoice.objects.create(
+            package=self.package, building=self.residents[name].unit.building, resident=self.residents[name],
+            amount=Decimal('100'), due_date=timezone.localdate().replace(month=month, day=1), status='pending',
+        )
+
+    def debit(self, invoices):
+        invoices = PackageInvoice.objects.filter(pk__in=[invoice.pk for invoice in invoices]).select_related('resident')
+        return {invoice.pk: outcome for invoice, outcome in debit_invoices(list(invoices.order_by('due_date')))}
+
+    def test_only_funded_invoices_are_paid(self):
+        first, second = self.invoice('rich', 1), self.invoice('rich', 2)
+        poor, walletless = self.invoice('poor', 1), self.invoice('walletless', 1)
+
+        outcomes = self.debit([first, second, poor, walletless])
+        # The balance left after the first debit does not cover the second
+        self.assertEqual(outcomes, {
+            first.pk: 'paid', second.pk: 'insufficient', poor.pk: 'insufficient', walletless.pk: 'no_wallet',
+        })
+        self.assertEqual(wallet_balance(self.wallets['rich']), Decimal('50'))
+        self.assertEqual(wallet_balance(self.wallets['poor']), Decimal('20'))
+        for invoice, status in [(first, 'paid'), (second, 'pending'), (poor, 'pending'), (walletless, 'pending')]:
+            invoice.refresh_from_db()
+            self.assertEqual(invoice.status, status)
+        self.assertIsNotNone(first.transaction_id)
+        self.assertIsNone(poor.transaction_id)
+
+    def test_paid_invoices_are_not_debited_again(self):
+        invoice = self.invoice('rich', 1)
+        self.assertEqual(self.debit([invoice]), {invoice.pk: 'paid'})
+        self.assertEqual(self.debit([invoice]), {})
+        self.assertEqual(wallet_balance(self.wallets['rich']), Decimal('50'))
@@ -3,7 +3,7 @@ from rest_framework.routers import DefaultRouter
 from .views import (
     WalletViewSet, WalletTransactionViewSet, SubscriptionPlanViewSet,
     UserSubscriptionViewSet, InvoiceViewSet, TransactionViewSet,
-    paymob_webhook, sahel_bill_inquiry, sahel_bill_payment, pay_rent
+    initiate_topup, gateway_health, paymob_webhook, sahel_bill_inquiry, sahel_bill_payment, pay_rent
 )
 
 router = DefaultRouter()
@@ -14,9 +14,13 @@ router.register(r'user-subscriptions', UserSubscriptionViewSet)
 router.register(r'invoices', InvoiceViewSet)
 router.register(r'transactions', TransactionViewSet)
 
-urlpatterns = router.urls + [
+urlpatterns = [
+    # Async view, listed before the router so it owns the former action URL
+    path('transactions/<int:pk>/initiate_topup/', initiate_topup, name='initiate_topup'),
+] + router.urls + [
     path('webhook/paymob/', paymob_webhook, name='paymob_webhook'),
     path('sahel/inquire/', sahel_bill_inquiry, name='sahel_inquire'),
     path('sahel/pay/', sahel_bill_payment, name='sahel_pay'),
     path('rent/pay/', pay_rent, name='pay_rent'),
+    path('gateways/health/', gateway_health, name='gateway_health'),
 ]
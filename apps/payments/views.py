@@ -1,35 +1,43 @@
 from django_filters.rest_framework import DjangoFilterBackend
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 from rest_framework import viewsets, filters, status
-from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.decorators import action, api_view, authentication_classes, permission_classes
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from .models import Wallet, WalletTransaction, SubscriptionPlan, UserSubscription, Invoice, Transaction
 from .serializers import WalletSerializer, WalletTransactionSerializer, SubscriptionPlanSerializer, UserSubscriptionSerializer, InvoiceSerializer, TransactionSerializer
+from .idempotency import idempotent
+from .services.breaker import GatewayUnavailable, gateway_metrics
 from .services.paymob_service import PaymobService
+from .webhooks import paymob_dedup_key, receive_webhook, verify_paymob_hmac
 from .services.sahel_service import SahelService
+from apps.accounts.authentication import async_jwt_required
 from apps.core.permissions import DynamicRolePermission
 from apps.accounts.models import ResidentProfile
 
 class WalletViewSet(viewsets.ModelViewSet):
     permission_classes = [DynamicRolePermission]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-    filterset_fields = ['owner_type', 'owner_id']
+    filterset_fields = ['owner_type', 'user', 'building']
     search_fields = ['owner_type']
-    ordering_fields = ['current_balance', 'updated_at']
+    # Not current_balance: it is the snapshot balance, not the live one shown
+    ordering_fields = ['updated_at']
 
-    queryset = Wallet.objects.all()
+    queryset = Wallet.objects.select_related('user')
     serializer_class = WalletSerializer
 
     def get_queryset(self):
         user = self.request.user
         # Filter wallets based on user roles
-        return self.queryset.filter(owner_type='user', owner_id=user.id)
+        return self.queryset.filter(user=user)
 
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
     def me(self, request):
         wallet, created = Wallet.objects.get_or_create(
-            owner_type='user',
-            owner_id=request.user.id,
+            user=request.user,
             defaults={'current_balance': 0.00}
         )
         serializer = self.get_serializer(wallet)
@@ -70,34 +78,89 @@ class TransactionViewSet(viewsets.ModelViewSet):
     queryset = Transaction.objects.all()
     serializer_class = TransactionSerializer
 
-    @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
-    def initiate_topup(self, request, pk=None):
-        transaction = self.get_object()
-        billing_data = {
-            "first_name": request.user.first_name,
-            "last_name": request.user.last_name,
-            "email": request.user.email,
-            "phone_number": getattr(request.user, 'phone', ''),
-        }
-        payment_token = PaymobService.process_payment(transaction.amount, billing_data)
-        return Response({"payment_token": payment_token}, status=status.HTTP_200_OK)
+
+@csrf_exempt
+@require_POST
+@async_jwt_required
+@idempotent('initiate_topup')
+async def initiate_topup(request, pk):
+    """
+    Start a Paymob top-up for one of the user's transactions. Async, so the
+    three gateway round-trips wait on the event loop instead of holding a
+    worker; served at the former TransactionViewSet action URL.
+    """
+    transactions = Transaction.objects.all()
+    if not request.user.is_staff:
+        transactions = transactions.filter(wallet__user=request.user)
+    try:
+        transaction = await transactions.aget(pk=pk)
+    except Transaction.DoesNotExist:
+        return JsonResponse({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+
+    billing_data = {
+        "first_name": request.user.first_name,
+        "last_name": request.user.last_name,
+        "email": request.user.email,
+        "phone_number": getattr(request.user, 'phone', ''),
+    }
+    try:
+        auth_token = await sync_to_async(PaymobService.authenticate, thread_sensitive=False)()
+        order = await PaymobService.acreate_order(auth_token, transaction.amount)
+        # The webhook finds the transaction by its Paymob order id
+        transaction.transaction_reference = str(order.get('id'))
+        await transaction.asave(update_fields=['transaction_reference', 'updated_at'])
+        payment_key = await PaymobService.acreate_payment_key(auth_token, order.get('id'), transaction.amount, billing_data)
+        payment_token = payment_key.get('token')
+    except GatewayUnavailable as e:
+        response = JsonResponse({"detail": str(e.detail)}, status=e.status_code)
+        if e.wait:
+            response['Retry-After'] = str(e.wait)
+        return response
+    return JsonResponse({"payment_token": payment_token}, status=status.HTTP_200_OK)
 
 @api_view(['POST'])
+@authentication_classes([])
+@permission_classes([AllowAny])
 def paymob_webhook(request):
-    # Handle Paymob webhook for payment status updates
+    """
+    Store a signed Paymob callback in the webhook inbox and acknowledge it;
+    the webhook worker applies it.
+    """
     data = request.data
-    # Process webhook data
+    dedup_key = paymob_dedup_key(data)
+    if dedup_key is None:
+        return Response({"error": "Unknown event or missing transaction id"}, status=status.HTTP_400_BAD_REQUEST)
+    signature = request.query_params.get('hmac', '')
+    if not verify_paymob_hmac(data, signature):
+        return Response({"error": "Invalid HMAC signature"}, status=status.HTTP_403_FORBIDDEN)
+    receive_webhook('paymob', dedup_key, data, signature)
     return Response({"status": "received"}, status=status.HTTP_200_OK)
 
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def gateway_health(request):
+    """
+    Circuit breaker and bulkhead state of the payment gateways, as seen by
+    the worker answering the request.
+    """
+    metrics = gateway_metrics()
+    degraded = any(gateway['state'] != 'closed' for gateway in metrics['gateways'].values())
+    metrics['status'] = 'degraded' if degraded else 'ok'
+    return Response(metrics, status=status.HTTP_200_OK)
+
 @api_view(['POST'])
 def sahel_bill_inquiry(request):
-    bill_number = request.data.get('bill_number')
-    if not bill_number:
-        return Response({"error": "Bill number required"}, status=status.HTTP_400_BAD_REQUEST)
-    result = SahelService.inquire_bill(bill_number)
+    # Older clients send the account number as bill_number
+    account_number = request.data.get('account_number') or request.data.get('bill_number')
+    service_type = request.data.get('service_type')
+    if not account_number or not service_type:
+        return Response({"error": "Account number and service type required"}, status=status.HTTP_400_BAD_REQUEST)
+    result = SahelService.inquire_bill(account_number, service_type)
     return Response(result, status=status.HTTP_200_OK)
 
 @api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@idempotent('sahel_bill_payment')
 def sahel_bill_payment(request):
     bill_number = request.data.get('bill_number')
     amount = request.data.get('amount')
@@ -107,12 +170,18 @@ def sahel_bill_payment(request):
     return Response(result, status=status.HTTP_200_OK)
 
 
+import logging
 from django.db import transaction
+from django.utils import timezone
 from apps.accounts.models import User
 from decimal import Decimal
+from .ledger import post_transfer, wallet_balance
+
+logger = logging.getLogger(__name__)
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@idempotent('pay_rent')
 def pay_rent(request):
     """
     Handles a rent payment from a tenant to a landlord.
@@ -142,50 +211,54 @@ def pay_rent(request):
 
     try:
         landlord = User.objects.get(id=landlord_id)
-        tenant_wallet, _ = Wallet.objects.get_or_create(owner_id=tenant.id, owner_type='user')
-        landlord_wallet, _ = Wallet.objects.get_or_create(owner_id=landlord.id, owner_type='user')
+        tenant_wallet, _ = Wallet.objects.get_or_create(user=tenant, defaults={'current_balance': 0})
+        landlord_wallet, _ = Wallet.objects.get_or_create(user=landlord, defaults={'current_balance': 0})
     except User.DoesNotExist:
         return Response({"error": "Could not find landlord user."}, status=status.HTTP_404_NOT_FOUND)
 
-    if tenant_wallet.current_balance < amount:
-        return Response({"error": "Insufficient balance."}, status=status.HTTP_400_BAD_REQUEST)
-
     try:
         with transaction.atomic():
-            # Debit tenant's wallet
-            tenant_wallet.current_balance -= amount
-            tenant_wallet.save()
-            Transaction.objects.create(
+            # Lock both wallets in id order so payments in opposite
+            # directions cannot deadlock and see each other's transfers
+            list(
+                Wallet.objects.select_for_update()
+                .filter(pk__in=[tenant_wallet.pk, landlord_wallet.pk])
+                .order_by('id')
+            )
+            if wallet_balance(tenant_wallet) < amount:
+                return Response({"error": "Insufficient balance."}, status=status.HTTP_400_BAD_REQUEST)
+
+            payment = Transaction.objects.create(
                 wallet=tenant_wallet,
-                amount=-amount,
-                transaction_type='rent_payment',
+                amount=amount,
+                method='wallet',
                 status='completed',
                 description=f'Rent payment to {landlord.full_name} for unit {resident_profile.unit}.'
             )
 
-            # Credit landlord's wallet
-            landlord_wallet.current_balance += amount
-            landlord_wallet.save()
-            Transaction.objects.create(
-                wallet=landlord_wallet,
-                amount=amount,
-                transaction_type='rent_received',
-                status='completed',
-                description=f'Rent received from {tenant.full_name} for unit {resident_profile.unit}.'
+            # Debit tenant's wallet and credit landlord's wallet in one ledger transfer
+            post_transfer(
+                tenant_wallet, landlord_wallet, amount,
+                key=f'rent:{payment.id}',
+                entry_type='rent',
+                description=f'Rent for {resident_profile.unit}',
+                transaction=payment,
             )
-            
+
             # Optionally create an Invoice
             Invoice.objects.create(
                 user=tenant,
                 amount=amount,
                 status='paid',
-                source_id=resident_profile.id,
+                method='wallet',
+                paid_at=timezone.now(),
+                due_date=timezone.localdate(),
+                source_id=resident_profile.unit_id or 0,
                 source_type='rent',
-                description=f'Rent for {resident_profile.unit}'
             )
 
     except Exception as e:
-        # Log the exception e
+        logger.error(f"Rent payment failed for tenant {tenant.id}: {e}")
         return Response({"error": "An error occurred during the transaction."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
     return Response({"message": "Rent paid successfully."}, status=status.HTTP_200_OK)
@@ -0,0 +1,225 @@
+"""
+Inbox for gateway webhooks.
+
+``paymob_webhook`` checks the callback's HMAC, stores it as a
+WebhookEvent (ignoring duplicates of the same gateway event) and answers
+200, so retry storms cost one insert each. Only signed callbacks reach
+the inbox, so a forged one cannot take the slot of the genuine event,
+and the key includes the transaction state, so a pending callback does
+not shadow the success that follows it. The worker (``process_webhook_events``) then
+claims pending events in batches with SKIP LOCKED and, per batch:
+
+1. verifies each event's HMAC and drops unsuccessful transactions,
+2. loads the matching top-up Transactions in one query (the Paymob
+   order id is stored in ``transaction_reference`` by initiate_topup),
+3. locks the affected wallets ordered by id, like the debit path,
+4. credits them through the ledger from the clearing wallet under the
+   key ``topup:<transaction id>``, so a transaction is credited once
+   however many callbacks report it. Each event is applied in its own
+   savepoint: one that raises is marked failed with the error and the
+   rest of the batch still goes through.
+"""
+import hashlib
+import hmac
+import logging
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction as db_transaction
+from django.utils import timezone
+
+from .ledger import Transfer, clearing_wallet, post_transfers
+from .models import Transaction, Wallet, WebhookEvent
+
+logger = logging.getLogger(__name__)
+
+PAYMOB_HMAC_SECRET = getattr(settings, 'PAYMOB_HMAC_SECRET', '')
+WEBHOOK_BATCH_SIZE = getattr(settings, 'WEBHOOK_BATCH_SIZE', 100)
+# Batches handled per worker run, so a burst is applied at a bounded rate
+WEBHOOK_MAX_BATCHES_PER_RUN = getattr(settings, 'WEBHOOK_MAX_BATCHES_PER_RUN', 20)
+
+WEBHOOK_SCHEDULED_KEY = 'webhook_processing_scheduled'
+WEBHOOK_SCHEDULED_TIMEOUT = 60
+
+PAYMOB_EVENT_TYPES = frozenset(['TRANSACTION', 'TOKEN', 'DELIVERY_STATUS'])
+
+# Fields of a Paymob transaction callback signed by its HMAC, in order
+PAYMOB_HMAC_FIELDS = (
+    'amount_cents', 'created_at', 'currency', 'error_occured', 'has_parent_transaction', 'id',
+    'integration_id', 'is_3d_secure', 'is_auth', 'is_capture', 'is_refunded',
+    'is_standalone_payment', 'is_voided', 'order.id', 'owner', 'pending',
+    'source_data.pan', 'source_data.sub_type', 'source_data.type', 'success',
+)
+
+
+def paymob_dedup_key(payload):
+    """
+    Key of the gateway event behind a callback: its type, transaction id
+    and state. None when the callback is not a known Paymob event.
+    """
+    if not isinstance(payload, dict) or not isinstance(payload.get('obj'), dict):
+        return None
+    obj = payload['obj']
+    event_type = payload.get('type', 'TRANSACTION')
+    if event_type not in PAYMOB_EVENT_TYPES or obj.get('id') is None:
+        return None
+    if obj.get('pending'):
+        state = 'pending'
+    else:
+        state = 'success' if obj.get('success') else 'failed'
+    return f"{event_type}:{obj['id']}:{state}"
+
+
+def receive_webhook(provider, dedup_key, payload, signature=''):
+    """
+    Store a callback unless the same event is already in the inbox, and
+    schedule the worker once the row is committed.
+    """
+    WebhookEvent.objects.bulk_create(
+        [WebhookEvent(provider=provider, dedup_key=dedup_key, payload=payload, signature=signature)],
+        ignore_conflicts=True,
+    )
+    db_transaction.on_commit(schedule_processing)
+
+
+def schedule_processing():
+    if not cache.add(WEBHOOK_SCHEDULED_KEY, 1, WEBHOOK_SCHEDULED_TIMEOUT):
+        return
+    from .tasks import process_webhook_events
+    try:
+        process_webhook_events.delay()
+    except Exception as e:
+        # The periodic run picks the events up if the broker is down
+        cache.delete(WEBHOOK_SCHEDULED_KEY)
+        logger.error(f"Failed to schedule webhook processing: {e}")
+
+
+def _field(obj, path):
+    for part in path.split('.'):
+        obj = obj.get(part) if isinstance(obj, dict) else None
+    if isinstance(obj, bool):
+        return 'true' if obj else 'false'
+    return '' if obj is None else str(obj)
+
+
+def verify_paymob_hmac(payload, signature):
+    if not PAYMOB_HMAC_SECRET or not signature:
+        return False
+    obj = payload.get('obj') or {}
+    message = ''.join(_field(obj, path) for path in PAYMOB_HMAC_FIELDS)
+    expected = hmac.new(PAYMOB_HMAC_SECRET.encode(), message.encode(), hashlib.sha512).hexdigest()
+    return hmac.compare_digest(expected, signature.lower())
+
+
+def classify(event):
+    """
+    Settle an event that credits nothing (bad signature, unsuccessful or
+    other event types), or return the Paymob order id it credits.
+    """
+    obj = event.payload.get('obj') or {}
+    if not verify_paymob_hmac(event.payload, event.signature):
+        event.status, event.error = 'failed', 'Invalid HMAC signature'
+    elif event.payload.get('type', 'TRANSACTION') != 'TRANSACTION' or not obj.get('success') or obj.get('pending'):
+        event.status = 'ignored'
+    else:
+        return str((obj.get('order') or {}).get('id'))
+    return None
+
+
+def apply_credit(event, transaction, order_id, clearing):
+    """
+    Credit the top-up ``event`` reports, once per transaction.
+    """
+    amount = Decimal(str(event.payload['obj'].get('amount_cents') or 0)) / 100
+    if transaction is None:
+        event.status, event.error = 'failed', f'No transaction for Paymob order {order_id}'
+        return
+    if amount != transaction.amount:
+        event.status, event.error = 'failed', f'Amount {amount} does not match transaction {transaction.amount}'
+        return
+    post_transfers([Transfer(
+        clearing, transaction.wallet, transaction.amount, f'topup:{transaction.id}', 'topup',
+        description='Paymob top-up', transaction=transaction,
+    )])
+    if transaction.status != 'completed':
+        transaction.status = 'completed'
+        # Saved rather than updated so the payment receivers (stats, activity feed) run
+        transaction.save(update_fields=['status', 'updated_at'])
+    event.status = 'processed'
+
+
+def process_batch(batch_size=WEBHOOK_BATCH_SIZE):
+    """
+    Apply one batch of pending events. Return the number of events handled.
+    """
+    now = timezone.now()
+    with db_transaction.atomic():
+        events = list(
+            WebhookEvent.objects.select_for_update(skip_locked=True)
+            .filter(status='pending')
+            .order_by('id')[:batch_size]
+        )
+        if not events:
+            return 0
+
+        credits = {}
+        for event in events:
+            event.processed_at = now
+            try:
+                order_id = classify(event)
+            except Exception as e:
+                event.status, event.error = 'failed', f'Malformed payload: {e!r}'
+                continue
+            if order_id is not None:
+                credits[event] = order_id
+
+        transactions = {
+            transaction.transaction_reference: transaction
+            for transaction in Transaction.objects.select_related('wallet').filter(
+                transaction_reference__in=set(credits.values())
+            )
+        }
+        # Same lock order as every other wallet writer
+        list(
+            Wallet.objects.select_for_update()
+            .filter(pk__in={transaction.wallet_id for transaction in transactions.values()})
+            .order_by('id')
+        )
+
+        clearing = clearing_wallet()
+        for event, order_id in credits.items():
+            transaction = transactions.get(order_id)
+            previous_status = transaction.status if transaction is not None else None
+            # One savepoint per event: an event that raises is rolled back
+            # and marked failed, and the rest of the batch still applies
+            try:
+                with db_transaction.atomic():
+                    apply_credit(event, transaction, order_id, clearing)
+            except Exception as e:
+                logger.exception(f"Failed to apply webhook {event.provider} {event.dedup_key}")
+                if transaction is not None:
+                    transaction.status = previous_status
+                event.status, event.error = 'failed', repr(e)
+
+        WebhookEvent.objects.bulk_update(events, ['status', 'error', 'processed_at'])
+
+    for event in events:
+        if event.status == 'failed':
+            logger.warning(f"Webhook {event.provider} {event.dedup_key} failed: {event.error}")
+    return len(events)
+
+
+def process_pending(batch_size=WEBHOOK_BATCH_SIZE, max_batches=WEBHOOK_MAX_BATCHES_PER_RUN):
+    """
+    Apply up to ``max_batches`` batches. Return ``(handled, more)`` where
+    ``more`` tells whether events are likely left.
+    """
+    cache.delete(WEBHOOK_SCHEDULED_KEY)
+    handled = 0
+    for _ in range(max_batches):
+        count = process_batch(batch_size)
+        handled += count
+        if count < batch_size:
+            return handled, False
+    return handled, True
@@ -6,7 +6,7 @@ from rest_framework.response import Response
 from django.db.models import Q
 from .models import RentalListing
 from .serializers import RentalListingSerializer, RentalListingCreateSerializer, RentalRequestSerializer, RentalApprovalSerializer
-from apps.core.permissions import DynamicRolePermission
+from apps.core.permissions import DynamicRolePermission, get_user_roles
 
 
 class RentalListingViewSet(viewsets.ModelViewSet):
@@ -24,18 +24,8 @@ class RentalListingViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         user = self.request.user
-        # Get roles from database
-        roles = [ur.role.name for ur in user.userrole_set.all()]
-
-        # Add implied roles based on profiles
+        roles = get_user_roles(user)
         from apps.accounts.models import ResidentProfile
-        is_resident = ResidentProfile.objects.filter(user=user).exists()
-        is_union_head = RentalListing.objects.filter(building__union_head=user).exists()
-
-        if is_resident and 'resident' not in roles:
-            roles.append('resident')
-        if is_union_head and 'union_head' not in roles:
-            roles.append('union_head')
 
         # Superusers and staff should see all listings
         if user.is_superuser or user.is_staff:
@@ -8,12 +8,14 @@ sys.path.insert(0, str(Path(__file__).resolve().parent))
 from channels.auth import AuthMiddlewareStack
 from channels.routing import ProtocolTypeRouter, URLRouter
 from django.core.asgi import get_asgi_application
-import apps.notifications.routing as notifications_routing
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "settings.prod")
 
+# Load the app registry before importing anything that touches models
 django_asgi_app = get_asgi_application()
 
+import apps.notifications.routing as notifications_routing  # noqa: E402
+
 application = ProtocolTypeRouter({
     "http": django_asgi_app,
     "websocket": AuthMiddlewareStack(
@@ -10,7 +10,32 @@ app.autodiscover_tasks()
 # جدولة المهام (تعمل في اليوم الأول من كل شهر الساعة 3 صباحًا)
 app.conf.beat_schedule = {
     'generate-monthly-invoices': {
-        'task': 'mkani.apps.core.tasks.generate_monthly_invoices',
+        'task': 'apps.packages.tasks.generate_monthly_invoices',
         'schedule': crontab(hour=3, minute=0, day_of_month='1'),
     },
+    # إعادة حساب إحصائيات العمارات للشهر الحالي يوميًا الساعة 2 صباحًا
+    'refresh-building-stats': {
+        'task': 'apps.buildings.tasks.refresh_building_stats_task',
+        'schedule': crontab(hour=2, minute=0),
+    },
+    # احتياطي: إرسال الإشعارات المتبقية في الـ outbox كل دقيقة
+    'dispatch-notification-outbox': {
+        'task': 'apps.notifications.tasks.dispatch_notification_outbox',
+        'schedule': crontab(),
+    },
+    # لقطة لأرصدة المحافظ كل 15 دقيقة حتى يبقى حساب الرصيد قصيرًا
+    'take-wallet-snapshots': {
+        'task': 'apps.payments.tasks.take_wallet_snapshots',
+        'schedule': crontab(minute='*/15'),
+    },
+    # حذف مفاتيح Idempotency المنتهية يوميًا الساعة 4 صباحًا
+    'purge-idempotency-keys': {
+        'task': 'apps.payments.tasks.purge_idempotency_keys_task',
+        'schedule': crontab(hour=4, minute=0),
+    },
+    # احتياطي: معالجة الـ webhooks المتبقية كل دقيقة
+    'process-webhook-events': {
+        'task': 'apps.payments.tasks.process_webhook_events',
+        'schedule': crontab(),
+    },
 }
@@ -1,4 +1,5 @@
 from rest_framework import permissions
+from apps.core.permissions import get_user_roles
 
 class DynamicRolePermission(permissions.BasePermission):
     '''
@@ -17,18 +18,7 @@ class DynamicRolePermission(permissions.BasePermission):
         if user.is_superuser or user.is_staff:
             return True
 
-        # Get roles from database
-        roles = [ur.role.name for ur in user.userrole_set.all()]
-
-        # Add implied roles based on profiles
-        from apps.accounts.models import ResidentProfile
-        from apps.buildings.models import Building
-        if ResidentProfile.objects.filter(user=user).exists():
-            if 'resident' not in roles:
-                roles.append('resident')
-        if Building.objects.filter(union_head=user).exists():
-            if 'union_head' not in roles:
-                roles.append('union_head')
+        roles = get_user_roles(user)
 
         # Allow authenticated users to read and update notifications since queryset is filtered by user
         if view.basename == "notification" and request.method in ["GET", "POST"] and user.is_authenticated:
@@ -48,18 +38,7 @@ class DynamicRolePermission(permissions.BasePermission):
         if user.is_superuser or user.is_staff:
             return True
 
-        # Get roles from database
-        roles = [ur.role.name for ur in user.userrole_set.all()]
-
-        # Add implied roles based on profiles
-        from apps.accounts.models import ResidentProfile
-        from apps.buildings.models import Building
-        if ResidentProfile.objects.filter(user=user).exists():
-            if 'resident' not in roles:
-                roles.append('resident')
-        if Building.objects.filter(union_head=user).exists():
-            if 'union_head' not in roles:
-                roles.append('union_head')
+        roles = get_user_roles(user)
 
         if "resident" in roles and hasattr(obj, "resident"):
             return obj.resident.user == user
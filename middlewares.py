@@ -3,12 +3,6 @@ from django.utils.deprecation import MiddlewareMixin
 
 logger = logging.getLogger(__name__)
 
-class JWTAuthFromCookieMiddleware(MiddlewareMixin):
-    def process_request(self, request):
-        access_token = request.COOKIES.get('access_token')
-        if access_token and 'HTTP_AUTHORIZATION' not in request.META:
-            request.META['HTTP_AUTHORIZATION'] = f'Bearer {access_token}'
-
 class CORSDebugMiddleware(MiddlewareMixin):
     """Debug middleware to log CORS-related information"""
     def process_request(self, request):
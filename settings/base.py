@@ -50,8 +50,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'apps.accounts.middleware.AutoRefreshTokenMiddleware',
-    'middlewares.JWTAuthFromCookieMiddleware',
+    'apps.accounts.middleware.JWTAuthMiddleware',
     'middlewares.CORSDebugMiddleware',
 ]
 
@@ -147,9 +146,40 @@ CHANNEL_LAYERS = {
     },
 }
 
+# Cache (shared across workers when Redis is configured, per-process otherwise)
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ.get('REDIS_URL'),
+            'KEY_PREFIX': 'mkani',
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+    }
+
+# Seconds a user's resolved roles stay in the shared cache
+ROLE_CACHE_TIMEOUT = int(os.environ.get('ROLE_CACHE_TIMEOUT', 60 * 15))
+# Seconds an authenticated user stays in the shared cache (changes bump it earlier)
+USER_CACHE_TIMEOUT = int(os.environ.get('USER_CACHE_TIMEOUT', 60 * 5))
+
 # Celery
 CELERY_BROKER_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
 CELERY_RESULT_BACKEND = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+# Number of building-id shards the monthly invoice run is split into
+INVOICE_SHARD_COUNT = int(os.environ.get('INVOICE_SHARD_COUNT', 8))
+# Notifications pushed over the channel layer per outbox batch
+NOTIFICATION_DISPATCH_BATCH_SIZE = int(os.environ.get('NOTIFICATION_DISPATCH_BATCH_SIZE', 500))
+# Failed real-time sends of one notification before it is dropped from the outbox
+NOTIFICATION_DISPATCH_MAX_ATTEMPTS = int(os.environ.get('NOTIFICATION_DISPATCH_MAX_ATTEMPTS', 8))
+# Seconds a per-user unread notification counter lives before it is rebuilt
+UNREAD_COUNTER_TIMEOUT = int(os.environ.get('UNREAD_COUNTER_TIMEOUT', 60 * 10))
+# Seconds Idempotency-Key records are kept for replay (pending ones too)
+IDEMPOTENCY_KEY_TTL = int(os.environ.get('IDEMPOTENCY_KEY_TTL', 60 * 60 * 24))
 
 # Email settings
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
@@ -165,8 +195,33 @@ PAYMOB_API_KEY = os.environ.get('PAYMOB_API_KEY', '')
 PAYMOB_INTEGRATION_ID = os.environ.get('PAYMOB_INTEGRATION_ID', '')
 PAYMOB_IFRAME_ID = os.environ.get('PAYMOB_IFRAME_ID', '')
 PAYMOB_MODE = os.environ.get('PAYMOB_MODE', 'mock')
+# Secret Paymob signs transaction callbacks with (HMAC-SHA512)
+PAYMOB_HMAC_SECRET = os.environ.get('PAYMOB_HMAC_SECRET', '')
 SAHEL_API_KEY = os.environ.get('SAHEL_API_KEY', '')
 SAHEL_MODE = os.environ.get('SAHEL_MODE', 'mock')
+PAYMOB_BASE_URL = os.environ.get('PAYMOB_BASE_URL', 'https://accept.paymob.com/api')
+SAHEL_BASE_URL = os.environ.get('SAHEL_BASE_URL', 'https://api.sahel.com')
+# Gateway HTTP client: timeouts in seconds, retries with exponential backoff
+# and kept-alive connections per gateway host
+GATEWAY_CONNECT_TIMEOUT = float(os.environ.get('GATEWAY_CONNECT_TIMEOUT', 3.05))
+GATEWAY_READ_TIMEOUT = float(os.environ.get('GATEWAY_READ_TIMEOUT', 15))
+GATEWAY_MAX_RETRIES = int(os.environ.get('GATEWAY_MAX_RETRIES', 3))
+GATEWAY_RETRY_BACKOFF = float(os.environ.get('GATEWAY_RETRY_BACKOFF', 0.3))
+GATEWAY_POOL_SIZE = int(os.environ.get('GATEWAY_POOL_SIZE', 10))
+GATEWAY_ASYNC_POOL_SIZE = int(os.environ.get('GATEWAY_ASYNC_POOL_SIZE', 100))
+# Circuit breaker: consecutive failures that open it and seconds it stays
+# open; bulkhead: concurrent calls per gateway and process
+GATEWAY_BREAKER_FAILURE_THRESHOLD = int(os.environ.get('GATEWAY_BREAKER_FAILURE_THRESHOLD', 5))
+GATEWAY_BREAKER_RECOVERY_TIMEOUT = int(os.environ.get('GATEWAY_BREAKER_RECOVERY_TIMEOUT', 30))
+GATEWAY_MAX_CONCURRENT = int(os.environ.get('GATEWAY_MAX_CONCURRENT', 8))
+# Seconds a gateway auth token is reused before it is fetched again
+PAYMOB_TOKEN_TTL = int(os.environ.get('PAYMOB_TOKEN_TTL', 60 * 50))
+SAHEL_TOKEN_TTL = int(os.environ.get('SAHEL_TOKEN_TTL', 60 * 50))
+# Seconds a Sahel bill inquiry is served from cache (paying the bill clears it)
+SAHEL_BILL_CACHE_TTL = int(os.environ.get('SAHEL_BILL_CACHE_TTL', 60 * 30))
+# Gateway webhooks applied per batch, and batches per worker run
+WEBHOOK_BATCH_SIZE = int(os.environ.get('WEBHOOK_BATCH_SIZE', 100))
+WEBHOOK_MAX_BATCHES_PER_RUN = int(os.environ.get('WEBHOOK_MAX_BATCHES_PER_RUN', 20))
 GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY', '')
 
 # Google OAuth settings
@@ -218,6 +273,7 @@ CORS_ALLOW_HEADERS = [
     'x-forwarded-proto',
     'cache-control',
     'pragma',
+    'idempotency-key',
 ]
 
 # Allow all necessary methods
@@ -236,6 +292,7 @@ CORS_EXPOSE_HEADERS = [
     'content-type',
     'x-csrftoken',
     'access-control-allow-credentials',
+    'idempotent-replayed',
 ]
 
 # Preflight cache time
@@ -13,6 +13,6 @@ python manage.py migrate --noinput
 echo "Collecting static files..."
 python manage.py collectstatic --noinput --clear
 
-# Start gunicorn
+# Start gunicorn with ASGI workers (async views, websockets)
 echo "Starting gunicorn..."
-gunicorn wsgi:application --bind 0.0.0.0:${PORT:-8000} --workers 2 --worker-class sync
+gunicorn asgi:application --bind 0.0.0.0:${PORT:-8000} --workers 2 --worker-class uvicorn_worker.UvicornWorker